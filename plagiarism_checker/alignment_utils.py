@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+疑似抄袭作业对的共同段落对齐
+
+对一份作业构建后缀自动机，再让另一份作业在自动机上走一遍，
+线性时间内得到另一份作业每个位置结尾的最长公共子串，从中取出长度不低于阈值的
+全部共同段落，并换算回两份Markdown原文中的字符偏移。
+"""
+
+from typing import Dict, List, Tuple
+
+
+def normalize_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """小写并把连续空白合并为一个空格，同时记录每个字符在原文中的位置"""
+    chars = []
+    offsets = []
+    in_space = False
+    for position, char in enumerate(text):
+        if char.isspace():
+            if not in_space and chars:
+                chars.append(' ')
+                offsets.append(position)
+            in_space = True
+        else:
+            chars.append(char.lower())
+            offsets.append(position)
+            in_space = False
+    return ''.join(chars), offsets
+
+
+class SuffixAutomaton:
+    """后缀自动机（每个状态记录首次出现的结束位置）"""
+
+    def __init__(self, text: str):
+        self.transitions: List[Dict[str, int]] = [{}]
+        self.link = [-1]
+        self.length = [0]
+        self.first_end = [-1]
+        last = 0
+        for position, char in enumerate(text):
+            current = self._new_state(self.length[last] + 1, position)
+            state = last
+            while state != -1 and char not in self.transitions[state]:
+                self.transitions[state][char] = current
+                state = self.link[state]
+            if state == -1:
+                self.link[current] = 0
+            else:
+                target = self.transitions[state][char]
+                if self.length[state] + 1 == self.length[target]:
+                    self.link[current] = target
+                else:
+                    clone = self._new_state(self.length[state] + 1, self.first_end[target])
+                    self.transitions[clone] = dict(self.transitions[target])
+                    self.link[clone] = self.link[target]
+                    while state != -1 and self.transitions[state].get(char) == target:
+                        self.transitions[state][char] = clone
+                        state = self.link[state]
+                    self.link[target] = clone
+                    self.link[current] = clone
+            last = current
+
+    def _new_state(self, length: int, first_end: int) -> int:
+        self.transitions.append({})
+        self.link.append(-1)
+        self.length.append(length)
+        self.first_end.append(first_end)
+        return len(self.length) - 1
+
+    def maximal_matches(self, other: str, min_length: int) -> List[Tuple[int, int, int]]:
+        """other中不能再向右延伸的公共子串 [(本文结束位置, other结束位置, 长度)]，长度不低于min_length"""
+        matches = []
+        state, length = 0, 0
+        previous = None
+        for position, char in enumerate(other):
+            while state and char not in self.transitions[state]:
+                state = self.link[state]
+                length = self.length[state]
+            if char in self.transitions[state]:
+                state = self.transitions[state][char]
+                length += 1
+            else:
+                state, length = 0, 0
+            # 上一位置的匹配没有延续到当前位置，说明它已经是极大匹配
+            if previous is not None and length != previous[2] + 1:
+                matches.append(previous)
+            previous = (self.first_end[state], position, length) if length >= min_length else None
+        if previous is not None:
+            matches.append(previous)
+        return matches
+
+
+def shared_passages(automaton: SuffixAutomaton, text1: str, offsets1: List[int],
+                    text2: str, offsets2: List[int], min_length: int = 40,
+                    max_passages: int = None) -> List[Dict[str, int]]:
+    """两份文本的共同段落（在text2中互不重叠，按长度降序），偏移换算回原文
+
+    automaton为text1（已标准化）的后缀自动机；offsets1/offsets2为标准化文本到原文的位置映射。
+    """
+    candidates = automaton.maximal_matches(text2, min_length)
+    candidates.sort(key=lambda match: match[2], reverse=True)
+
+    taken: List[Tuple[int, int]] = []
+    passages = []
+    for end1, end2, length in candidates:
+        start2 = end2 - length + 1
+        if any(start2 <= taken_end and taken_start <= end2 for taken_start, taken_end in taken):
+            continue
+        taken.append((start2, end2))
+        start1 = end1 - length + 1
+        passages.append({
+            'offset1': [offsets1[start1], offsets1[end1] + 1],
+            'offset2': [offsets2[start2], offsets2[end2] + 1],
+            'length': length
+        })
+        if max_passages is not None and len(passages) >= max_passages:
+            break
+    return passages
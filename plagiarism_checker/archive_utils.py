@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+往届作业归档索引
+
+把往届提交的MinHash签名和LSH分带哈希保存为紧凑的 .npy 文件，查询时以内存映射方式打开。
+每个分带的哈希已排序，查询一份作业只需对每个分带做一次二分查找，
+耗时与归档规模基本无关，不必与每份归档作业逐一比较。
+"""
+
+import sys
+import json
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from config import CANDIDATE_CONFIG, ARCHIVE_CONFIG
+from lsh_utils import MinHasher, shingle_hashes, choose_band_params, normalize_for_shingles
+
+logger = logging.getLogger(__name__)
+
+
+def band_hashes(signatures: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    """计算每个签名在每个分带上的64位哈希，返回 (bands, N) 数组"""
+    signatures = np.ascontiguousarray(signatures, dtype=np.uint32)
+    result = np.empty((bands, signatures.shape[0]), dtype=np.uint64)
+    for band in range(bands):
+        band_slice = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for idx in range(signatures.shape[0]):
+            digest = hashlib.blake2b(band_slice[idx].tobytes(), digest_size=8).digest()
+            result[band, idx] = int.from_bytes(digest, 'little')
+    return result
+
+
+def document_key(document: Dict[str, str]) -> Tuple[str, str, str]:
+    """归档作业的唯一键：(学期, 学生, 作业类型)"""
+    return document['term'], document['student'], document.get('homework_type')
+
+
+class ArchiveIndex:
+    """往届作业归档索引"""
+
+    def __init__(self, archive_dir: str):
+        self.path = Path(archive_dir)
+        self.num_perm = CANDIDATE_CONFIG['num_perm']
+        self.shingle_size = CANDIDATE_CONFIG['shingle_size']
+        self.seed = CANDIDATE_CONFIG['seed']
+        self.bands, self.rows = choose_band_params(
+            self.num_perm, ARCHIVE_CONFIG['jaccard_threshold'], ARCHIVE_CONFIG['recall']
+        )
+        self.documents: List[Dict[str, str]] = []
+        self.signatures = None
+        self.band_keys = None
+        self.band_docs = None
+        self.hasher = MinHasher(self.num_perm, self.seed)
+
+    @property
+    def meta_file(self) -> Path:
+        return self.path / 'meta.json'
+
+    def exists(self) -> bool:
+        return self.meta_file.exists()
+
+    def signature(self, content: str) -> np.ndarray:
+        """计算一份作业的MinHash签名（与候选对生成使用相同的shingle）"""
+        return self.hasher.signature(shingle_hashes(content, self.shingle_size)).astype(np.uint32)
+
+    def load(self) -> 'ArchiveIndex':
+        """以内存映射方式打开归档索引"""
+        meta = json.loads(self.meta_file.read_text(encoding='utf-8'))
+        # 以构建时的参数为准，保证签名可比
+        self.num_perm = meta['num_perm']
+        self.shingle_size = meta['shingle_size']
+        self.seed = meta['seed']
+        self.bands, self.rows = meta['bands'], meta['rows']
+        self.hasher = MinHasher(self.num_perm, self.seed)
+        self.documents = meta['documents']
+        self.signatures = np.load(self.path / 'signatures.npy', mmap_mode='r')
+        self.band_keys = np.load(self.path / 'band_keys.npy', mmap_mode='r')
+        self.band_docs = np.load(self.path / 'band_docs.npy', mmap_mode='r')
+        return self
+
+    def add(self, documents: List[Dict[str, str]], contents: List[str]):
+        """向归档中追加作业并重建分带索引
+
+        同一学期、同一学生、同一作业类型只保留一份（重复归档时以新提交替换旧的）。
+        """
+        latest = {document_key(document): k for k, document in enumerate(documents)}
+        new_ids = sorted(latest.values())
+        keep = [k for k, document in enumerate(self.documents) if document_key(document) not in latest]
+        replaced = len(self.documents) - len(keep)
+        if replaced:
+            logger.info(f"归档中已有 {replaced} 份相同学期、学生与作业类型的作业，以新提交替换")
+
+        old_signatures = np.asarray(self.signatures)[keep] if self.signatures is not None else \
+            np.empty((0, self.num_perm), dtype=np.uint32)
+        new_signatures = np.vstack([self.signature(contents[k]) for k in new_ids]) if new_ids else \
+            np.empty((0, self.num_perm), dtype=np.uint32)
+        signatures = np.vstack([old_signatures, new_signatures])
+        self.documents = [self.documents[k] for k in keep] + [documents[k] for k in new_ids]
+
+        keys = band_hashes(signatures, self.bands, self.rows)
+        order = np.argsort(keys, axis=1, kind='stable')
+        self.band_keys = np.take_along_axis(keys, order, axis=1)
+        self.band_docs = order.astype(np.int32)
+        self.signatures = signatures
+
+    def save(self):
+        """写出归档索引"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        np.save(self.path / 'signatures.npy', np.asarray(self.signatures, dtype=np.uint32))
+        np.save(self.path / 'band_keys.npy', np.asarray(self.band_keys))
+        np.save(self.path / 'band_docs.npy', np.asarray(self.band_docs))
+        meta = {
+            'num_perm': self.num_perm,
+            'shingle_size': self.shingle_size,
+            'seed': self.seed,
+            'bands': self.bands,
+            'rows': self.rows,
+            'documents': self.documents
+        }
+        self.meta_file.write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+        logger.info(f"归档索引已保存: {self.path} ({len(self.documents)} 份作业)")
+
+    def query(self, content: str, homework_type: str = None, threshold: float = None) -> List[Dict[str, Any]]:
+        """查询与一份作业相似的归档作业（按估计相似度降序）
+
+        指定homework_type时只返回同一作业类型的归档作业。
+        """
+        threshold = ARCHIVE_CONFIG['similarity_threshold'] if threshold is None else threshold
+        if not self.documents or not normalize_for_shingles(content):
+            return []
+        signature = self.signature(content)
+        keys = band_hashes(signature[None, :], self.bands, self.rows)[:, 0]
+
+        candidates = set()
+        for band in range(self.bands):
+            row = self.band_keys[band]
+            left = np.searchsorted(row, keys[band], side='left')
+            right = np.searchsorted(row, keys[band], side='right')
+            if right > left:
+                candidates.update(self.band_docs[band, left:right].tolist())
+
+        matches = []
+        for doc_id in candidates:
+            if homework_type is not None and self.documents[doc_id].get('homework_type') != homework_type:
+                continue
+            estimate = float(np.mean(self.signatures[doc_id] == signature))
+            if estimate >= threshold:
+                match = dict(self.documents[doc_id])
+                match['estimated_similarity'] = estimate
+                matches.append(match)
+        matches.sort(key=lambda match: match['estimated_similarity'], reverse=True)
+        return matches
+
+
+def main():
+    """构建或追加往届作业归档"""
+    parser = argparse.ArgumentParser(description='构建往届作业归档索引')
+    parser.add_argument('homework_type', help='作业类型，如H3')
+    parser.add_argument('--term', type=str, required=True, help='学期标识，如2024-spring')
+    parser.add_argument('--base-path', type=str, default='homework', help='往届作业根目录')
+    parser.add_argument('--archive-dir', type=str, default=ARCHIVE_CONFIG['archive_dir'],
+                        help='归档索引目录')
+    args = parser.parse_args()
+
+    from homework_similarity_checker import HomeworkSimilarityChecker
+
+    checker = HomeworkSimilarityChecker(args.base_path)
+    homework_files = checker.extract_homework_files(args.homework_type)
+    documents, contents = [], []
+    for student, files in homework_files.items():
+        content = checker.extract_content(files['md_file'])
+        if content:
+            documents.append({
+                'term': args.term,
+                'student': student,
+                'homework_type': args.homework_type,
+                'md_file': str(files['md_file'])
+            })
+            contents.append(content['raw_content'])
+
+    if not documents:
+        logger.error("没有可归档的作业")
+        sys.exit(1)
+
+    archive = ArchiveIndex(args.archive_dir)
+    if archive.exists():
+        archive.load()
+    archive.add(documents, contents)
+    archive.save()
+    print(f"已归档 {len(documents)} 份 {args.term} {args.homework_type} 作业，共 {len(archive.documents)} 份")
+
+
+if __name__ == "__main__":
+    main()
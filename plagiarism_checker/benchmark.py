@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查重性能基准测试
+
+生成合成的中英文实验报告（可控制抄袭比例、代码块、命令与截图），
+在不同规模的班级上运行完整的批量检查，记录其运行指标（各阶段与各维度耗时、计数），
+并统计预设抄袭对的召回率，用于确认更快的算法没有降低检出效果。
+
+用法:
+    python benchmark.py --sizes 100 1000 5000 --copy-rate 0.1 --output benchmark_results.json
+"""
+
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+from config import BASE_CONFIG, BATCH_CONFIG, SCORE_ARCHIVE_CONFIG, TEXT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_CHINESE_WORDS = [
+    '配置', '磁盘', '分区', '挂载', '用户', '权限', '服务', '网络', '日志', '进程',
+    '文件系统', '逻辑卷', '物理卷', '卷组', '虚拟机', '内核', '模块', '防火墙', '端口', '脚本',
+    '实验', '结果', '发现', '需要', '修改', '检查', '成功', '失败', '原因', '解决',
+    '首先', '然后', '最后', '通过', '使用', '命令', '参数', '目录', '备份', '恢复',
+    '启动', '重启', '状态', '输出', '错误', '提示', '安装', '软件包', '依赖', '版本'
+]
+
+_ENGLISH_WORDS = [
+    'configure', 'disk', 'partition', 'mount', 'user', 'permission', 'service', 'network',
+    'log', 'process', 'filesystem', 'volume', 'group', 'kernel', 'module', 'firewall',
+    'port', 'script', 'experiment', 'result', 'found', 'need', 'modify', 'check',
+    'success', 'failure', 'reason', 'solve', 'first', 'then', 'finally', 'using',
+    'command', 'option', 'directory', 'backup', 'restore', 'start', 'restart', 'status',
+    'output', 'error', 'install', 'package', 'dependency', 'version', 'the', 'a', 'we', 'it'
+]
+
+_COMMAND_TEMPLATES = [
+    'sudo apt install {name}', 'ls -l /home/{name}', 'mkdir -p /data/{name}',
+    'chmod {mode} /srv/{name}', 'chown {name}:{name} /srv/{name}', 'systemctl restart {name}',
+    'sudo adduser {name}', 'usermod -aG sudo {name}', 'pvcreate /dev/sd{disk}',
+    'vgcreate vg_{name} /dev/sd{disk}', 'lvcreate -L {size}G -n lv_{name} vg_{name}',
+    'lvextend -L +{size}G /dev/vg_{name}/lv_{name}', 'grep -r {name} /etc', 'df -h', 'du -sh /var/{name}',
+    'find / -name {name}', 'ps aux', 'mount /dev/sd{disk}1 /mnt/{name}'
+]
+
+_SECTION_TITLES = ['实验环境', '实验步骤', '用户管理', '磁盘分区', '逻辑卷管理', '服务配置', '问题与解决', '实验总结',
+                   'Environment', 'Steps', 'User Management', 'Disk Partitioning', 'LVM', 'Services',
+                   'Troubleshooting', 'Summary']
+
+# 组合生成大词表用的汉字与英文音节（只用少量固定词语时，所有报告彼此都很相似）
+_CHINESE_CHARS = ('的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说'
+                  '产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点'
+                  '从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又')
+_ENGLISH_SYLLABLES = ['con', 'fig', 'dis', 'par', 'ti', 'tion', 'mo', 'unt', 'ser', 'vice', 'net', 'work', 'pro',
+                      'cess', 'vol', 'ume', 'ker', 'nel', 'mod', 'ule', 'ex', 'per', 'ment', 're', 'sult', 'ing']
+
+
+class ReportGenerator:
+    """合成实验报告生成器"""
+
+    def __init__(self, seed: int = 42, english_ratio: float = 0.3, image_count: int = 3,
+                 image_size: Tuple[int, int] = (160, 100)):
+        self.rng = random.Random(seed)
+        self.chinese_words = _CHINESE_WORDS + [
+            ''.join(self.rng.choice(_CHINESE_CHARS) for _ in range(2)) for _ in range(3000)
+        ]
+        self.english_words = _ENGLISH_WORDS + [
+            ''.join(self.rng.choice(_ENGLISH_SYLLABLES) for _ in range(self.rng.randint(2, 3)))
+            for _ in range(3000)
+        ]
+        self.english_ratio = english_ratio
+        self.image_count = image_count
+        self.image_size = image_size
+
+    def sentence(self, english: bool) -> str:
+        words = [self.rng.choice(self.english_words if english else self.chinese_words)
+                 for _ in range(self.rng.randint(8, 20))]
+        if english:
+            return ' '.join(words).capitalize() + '.'
+        return ''.join(words) + '。'
+
+    def command(self) -> str:
+        return self.rng.choice(_COMMAND_TEMPLATES).format(
+            name=''.join(self.rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(5)),
+            mode=self.rng.choice(['755', '644', '700', '600']),
+            disk=self.rng.choice('bcdef'),
+            size=self.rng.randint(1, 20)
+        )
+
+    def report(self) -> List[Dict[str, Any]]:
+        """生成一份报告的章节列表"""
+        english = self.rng.random() < self.english_ratio
+        sections = []
+        for title in self.rng.sample(_SECTION_TITLES, self.rng.randint(5, 8)):
+            sections.append({
+                'title': title,
+                'paragraphs': [' '.join(self.sentence(english) for _ in range(self.rng.randint(3, 6)))
+                               for _ in range(self.rng.randint(1, 3))],
+                'commands': [self.command() for _ in range(self.rng.randint(0, 5))]
+            })
+        return sections
+
+    def copy_report(self, source: List[Dict[str, Any]], copy_fraction: float,
+                    rewrite_rate: float = 0.05) -> List[Dict[str, Any]]:
+        """在源报告基础上抄袭：保留一部分段落并少量改写，其余部分重新撰写"""
+        copied = []
+        for section in source:
+            paragraphs = []
+            for paragraph in section['paragraphs']:
+                if self.rng.random() < copy_fraction:
+                    paragraphs.append(self.rewrite(paragraph, rewrite_rate))
+                else:
+                    paragraphs.append(' '.join(self.sentence(False) for _ in range(self.rng.randint(3, 6))))
+            commands = [cmd for cmd in section['commands'] if self.rng.random() < copy_fraction]
+            copied.append({'title': section['title'], 'paragraphs': paragraphs, 'commands': commands})
+        return copied
+
+    def rewrite(self, paragraph: str, rate: float) -> str:
+        """以rate的概率替换词语（模拟轻度改写）"""
+        tokens = paragraph.split(' ')
+        if len(tokens) > 1:
+            return ' '.join(self.rng.choice(self.english_words) if self.rng.random() < rate else token
+                            for token in tokens)
+        chars = list(paragraph)
+        for k in range(len(chars)):
+            if self.rng.random() < rate / 2:
+                chars[k] = self.rng.choice(_CHINESE_CHARS)
+        return ''.join(chars)
+
+    @staticmethod
+    def render(sections: List[Dict[str, Any]], image_names: List[str]) -> str:
+        lines = ['# Linux 实验报告', '']
+        for k, section in enumerate(sections):
+            lines.extend([f"## {section['title']}", ''])
+            for paragraph in section['paragraphs']:
+                lines.extend([paragraph, ''])
+            if section['commands']:
+                lines.extend(['```bash'] + section['commands'] + ['```', ''])
+            if k < len(image_names):
+                lines.extend([f"![截图{k}]({image_names[k]})", ''])
+        return '\n'.join(lines)
+
+    def screenshot(self, seed: int, brightness: int = 0):
+        from PIL import Image, ImageDraw
+
+        rng = random.Random(seed)
+        width, height = self.image_size
+        image = Image.new('RGB', self.image_size, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x, y = rng.randrange(width), rng.randrange(height)
+            draw.rectangle([x, y, x + rng.randint(5, width // 2), y + rng.randint(3, height // 4)],
+                           fill=tuple(rng.randrange(256) for _ in range(3)))
+        if brightness:
+            image = image.point(lambda value: min(255, value + brightness))
+        return image
+
+
+def generate_cohort(root: Path, students: int, homework_type: str = 'H3', copy_rate: float = 0.1,
+                    copy_fraction: float = 0.8, seed: int = 42, english_ratio: float = 0.3,
+                    image_count: int = 3) -> List[Tuple[str, str]]:
+    """生成一个合成班级，返回预设的抄袭对 [(抄袭者, 来源)]"""
+    generator = ReportGenerator(seed, english_ratio, image_count)
+    names = [f"student{k:05d}" for k in range(students)]
+    reports = {}
+    planted = []
+    copiers = set(generator.rng.sample(range(1, students), int(students * copy_rate))) if students > 1 else set()
+
+    for k, name in enumerate(names):
+        if k in copiers:
+            source = generator.rng.randrange(k)
+            reports[name] = (generator.copy_report(reports[names[source]][0], copy_fraction), names[source])
+            planted.append((name, names[source]))
+        else:
+            reports[name] = (generator.report(), None)
+
+    for k, name in enumerate(names):
+        sections, source = reports[name]
+        homework_dir = root / name / homework_type / 'repo' / homework_type
+        homework_dir.mkdir(parents=True, exist_ok=True)
+        image_names = []
+        for m in range(image_count):
+            image_name = f"shot{m}.png"
+            if source is not None and m == 0:
+                # 抄袭者复用来源的第一张截图（轻微调亮）
+                generator.screenshot(names.index(source) * 100, brightness=6).save(homework_dir / image_name)
+            else:
+                generator.screenshot(k * 100 + m).save(homework_dir / image_name)
+            image_names.append(image_name)
+        (homework_dir / 'report.md').write_text(generator.render(sections, image_names), encoding='utf-8')
+    return planted
+
+
+def _pair_key(student1: str, student2: str) -> Tuple[str, str]:
+    return (student1, student2) if student1 < student2 else (student2, student1)
+
+
+def run_benchmark(root: Path, threshold: float, workers: int,
+                  planted: List[Tuple[str, str]], homework_type: str = 'H3') -> Dict[str, Any]:
+    """在已生成的班级上运行完整的批量检查与报告生成，汇总其运行指标并统计预设抄袭对的召回率"""
+    from homework_similarity_checker import HomeworkSimilarityChecker
+    from segment_utils import SegmentCache
+
+    checker = HomeworkSimilarityChecker(str(root))
+    # 冷启动计时：不使用磁盘分词缓存与截图哈希缓存
+    checker.segment_cache = SegmentCache(None, TEXT_CONFIG.get('segment_workers', 1))
+    checker.image_hash_cache.cache_dir = None
+    checker.image_hash_cache.hashes = {}
+
+    # 记录批量检查准备的批次（学生顺序与候选对），用于统计候选召回率
+    batches: List[Dict[str, Any]] = []
+    prepare_features = checker.prepare_features
+
+    def recording_prepare(*args, **kwargs):
+        batch = prepare_features(*args, **kwargs)
+        batches.append(batch)
+        return batch
+    checker.prepare_features = recording_prepare
+
+    output_dir = Path(tempfile.mkdtemp(prefix='benchmark_output_'))
+    archive_dir = SCORE_ARCHIVE_CONFIG['archive_dir']
+    SCORE_ARCHIVE_CONFIG['archive_dir'] = str(output_dir / 'scores')
+    try:
+        results = checker.check_similarity_batch(homework_type, threshold, max_workers=workers,
+                                                 comparisons_file=str(output_dir / 'comparisons.jsonl'))
+        with checker.metrics.stage('report'):
+            checker.generate_report(str(output_dir / 'report.html'))
+    finally:
+        SCORE_ARCHIVE_CONFIG['archive_dir'] = archive_dir
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    logger.info(f"耗时最多的阶段: {checker.metrics.summary()}")
+    metrics = checker.metrics.to_dict()
+    counters = metrics['counters']
+    names, candidates = batches[0]['students'], batches[0]['candidate_pairs']
+    planted_keys = {_pair_key(*pair) for pair in planted}
+    candidate_keys = {_pair_key(names[i], names[j]) for i, j in candidates}
+    flagged_keys = {_pair_key(pair['student1'], pair['student2']) for pair in results['high_similarity_pairs']}
+    return {
+        'students': counters['students'],
+        'total_pairs': counters['total_pairs'],
+        'candidate_pairs': counters['candidate_pairs'],
+        'scored_pairs': counters.get('pairs_scored', 0),
+        'pruned_pairs': {name.split('.', 1)[1]: count for name, count in counters.items()
+                         if name.startswith('pairs_pruned.')},
+        'planted_pairs': len(planted_keys),
+        'candidate_recall': _recall(planted_keys, candidate_keys),
+        'flagged_recall': _recall(planted_keys, flagged_keys),
+        'flagged_pairs': len(flagged_keys),
+        'flagged_unplanted': len(flagged_keys - planted_keys),
+        'stages': metrics['stages'],
+        'dimensions': metrics['dimensions'],
+        'counters': counters,
+        'total_wall_seconds': round(metrics['total_wall_seconds'], 4),
+        'total_cpu_seconds': round(metrics['total_cpu_seconds'], 4)
+    }
+
+
+def _recall(expected: Set, found: Set) -> float:
+    return len(expected & found) / len(expected) if expected else 1.0
+
+
+def main():
+    """生成合成班级并运行基准测试"""
+    parser = argparse.ArgumentParser(description='作业查重性能基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000], help='班级规模')
+    parser.add_argument('--copy-rate', type=float, default=0.1, help='抄袭者占比')
+    parser.add_argument('--copy-fraction', type=float, default=0.8, help='抄袭者复制的段落比例')
+    parser.add_argument('--english-ratio', type=float, default=0.3, help='英文报告占比')
+    parser.add_argument('--images', type=int, default=3, help='每份报告的截图数')
+    parser.add_argument('--threshold', type=float, default=BASE_CONFIG['similarity_threshold'],
+                        help='相似度阈值')
+    parser.add_argument('-w', '--workers', type=int, default=BATCH_CONFIG['max_workers'], help='评分进程数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--workdir', type=str, default=None, help='合成班级目录（默认使用临时目录并在结束后删除）')
+    parser.add_argument('--output', type=str, default='benchmark_results.json', help='结果文件')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = []
+    for size in args.sizes:
+        workdir = Path(args.workdir) / f"cohort_{size}" if args.workdir else \
+            Path(tempfile.mkdtemp(prefix=f"benchmark_{size}_"))
+        try:
+            if workdir.exists():
+                shutil.rmtree(workdir)
+            start = time.perf_counter()
+            planted = generate_cohort(workdir, size, copy_rate=args.copy_rate, copy_fraction=args.copy_fraction,
+                                      seed=args.seed, english_ratio=args.english_ratio, image_count=args.images)
+            logger.info(f"已生成 {size} 份合成报告（{len(planted)} 对抄袭），耗时 {time.perf_counter() - start:.1f}s")
+            result = run_benchmark(workdir, args.threshold, args.workers, planted)
+            result['config'] = {'copy_rate': args.copy_rate, 'copy_fraction': args.copy_fraction,
+                                'threshold': args.threshold, 'workers': args.workers, 'seed': args.seed}
+            results.append(result)
+        finally:
+            if not args.workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print(f"\n{'规模':>8} {'候选对':>10} {'候选召回':>8} {'检出召回':>8} {'误报':>6} {'总耗时(s)':>10}")
+    for result in results:
+        print(f"{result['students']:>8} {result['candidate_pairs']:>10} {result['candidate_recall']:>8.3f} "
+              f"{result['flagged_recall']:>8.3f} {result['flagged_unplanted']:>6} {result['total_wall_seconds']:>10.2f}")
+    print(f"\n详细结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
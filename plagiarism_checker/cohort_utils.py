@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批次级（全体作业）相似度维度
+
+每个维度在整个批次上只构建一次，之后对任意一批作业对 (rows, cols)
+用矩阵/数组运算一次性算出相似度，不再逐对在Python中循环。
+"""
+
+import time
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# 结构相似度比较的文档元素
+STRUCTURE_ELEMENTS = ['list_items', 'code_block_count', 'image_count', 'link_count']
+
+# 上界比较的容差（避免加权求和顺序不同带来的浮点误差误剪阈值上的作业对）
+BOUND_TOLERANCE = 1e-9
+
+
+def normalize_command_set(commands: Iterable[str]) -> Set[str]:
+    """标准化命令集合（只保留命令主体，去除参数）"""
+    normalized = set()
+    for cmd in commands:
+        parts = cmd.split()
+        main_cmd = parts[0] if parts else cmd
+        normalized.add(main_cmd.lower())
+    return normalized
+
+
+def heading_set(structure: Dict[str, Any]) -> Set[str]:
+    """文档标题集合（小写）"""
+    return {heading[1].lower() for heading in structure['headings']}
+
+
+def build_binary_matrix(sets: List[Set[str]]) -> sparse.csr_matrix:
+    """将每个集合编码为稀疏二值矩阵的一行"""
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    for items in sets:
+        for item in items:
+            indices.append(vocabulary.setdefault(item, len(vocabulary)))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float32)
+    matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(sets), len(vocabulary)))
+    matrix.sum_duplicates()
+    return matrix
+
+
+def rowwise_dot(matrix: sparse.csr_matrix, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """逐对计算 matrix[rows[k]] · matrix[cols[k]]"""
+    if len(rows) == 0:
+        return np.zeros(0, dtype=np.float64)
+    return np.asarray(matrix[rows].multiply(matrix[cols]).sum(axis=1), dtype=np.float64).ravel()
+
+
+class MatrixDimension:
+    """已预先算好的两两相似度矩阵（稠密或稀疏）"""
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def values(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        return np.asarray(self.matrix[rows, cols], dtype=np.float64).ravel()
+
+
+class CosineDimension:
+    """行向量已L2归一化的稀疏特征矩阵，按需逐对计算余弦相似度（不构建n×n矩阵）"""
+
+    def __init__(self, matrix: sparse.csr_matrix):
+        self.matrix = sparse.csr_matrix(matrix)
+        self.nonempty = np.diff(self.matrix.indptr) > 0
+
+    def values(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        return np.clip(rowwise_dot(self.matrix, rows, cols), 0.0, 1.0)
+
+    def upper_bound(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """任一方没有词项时余弦为0，否则上界为1"""
+        return (self.nonempty[rows] & self.nonempty[cols]).astype(np.float64)
+
+
+class JaccardDimension:
+    """集合Jaccard相似度（任一集合为空时为0）"""
+
+    def __init__(self, sets: List[Set[str]]):
+        self.matrix = build_binary_matrix(sets)
+        self.sizes = np.asarray(self.matrix.sum(axis=1), dtype=np.float64).ravel()
+
+    def values(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        intersection = rowwise_dot(self.matrix, rows, cols)
+        union = self.sizes[rows] + self.sizes[cols] - intersection
+        valid = (self.sizes[rows] > 0) & (self.sizes[cols] > 0) & (union > 0)
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=valid)
+
+    def upper_bound(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """集合大小之比：|A∩B|/|A∪B| <= min(|A|,|B|)/max(|A|,|B|)"""
+        low = np.minimum(self.sizes[rows], self.sizes[cols])
+        high = np.maximum(self.sizes[rows], self.sizes[cols])
+        return np.divide(low, high, out=np.zeros_like(low), where=high > 0)
+
+    def full_matrix(self) -> np.ndarray:
+        """全体两两Jaccard矩阵（一次稀疏矩阵乘积）"""
+        intersection = (self.matrix @ self.matrix.T).toarray().astype(np.float64)
+        union = self.sizes[:, None] + self.sizes[None, :] - intersection
+        valid = (self.sizes[:, None] > 0) & (self.sizes[None, :] > 0) & (union > 0)
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=valid)
+
+
+class StructureDimension:
+    """文档结构相似度：标题集合Jaccard与四类元素数量比值的平均"""
+
+    def __init__(self, structures: List[Dict[str, Any]]):
+        self.headings = JaccardDimension([heading_set(structure) for structure in structures])
+        self.counts = np.array(
+            [[structure[key] for key in STRUCTURE_ELEMENTS] for structure in structures],
+            dtype=np.float64
+        ).reshape(len(structures), len(STRUCTURE_ELEMENTS))
+
+    def values(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        counts1 = self.counts[rows]
+        counts2 = self.counts[cols]
+        low = np.minimum(counts1, counts2)
+        high = np.maximum(counts1, counts2)
+        # 都为0视为相同(1.0)，只有一方为0视为不同(0.0)
+        ratios = np.divide(low, high, out=np.ones_like(low), where=high > 0)
+        element_sum = ratios.sum(axis=1)
+
+        # 只有双方都有标题时才计入标题相似度
+        has_headings = (self.headings.sizes[rows] > 0) & (self.headings.sizes[cols] > 0)
+        heading_sim = self.headings.values(rows, cols)
+        total = element_sum + np.where(has_headings, heading_sim, 0.0)
+        count = len(STRUCTURE_ELEMENTS) + has_headings.astype(np.float64)
+        return total / count
+
+
+def score_pair_block(dimensions: Dict[str, Any], weights: Dict[str, float],
+                     pairs: List[tuple], timings: Dict[str, List[float]] = None) -> List[Dict[str, float]]:
+    """一次性计算一个作业对分块在各维度上的相似度及加权总分
+
+    timings不为None时，各维度取值的 [墙钟时间, CPU时间] 累加到timings[维度]中。
+    """
+    if not pairs:
+        return []
+    pair_array = np.asarray(pairs, dtype=np.int64).reshape(len(pairs), 2)
+    rows, cols = pair_array[:, 0], pair_array[:, 1]
+
+    values = {}
+    for dim, dimension in dimensions.items():
+        wall, cpu = time.perf_counter(), time.process_time()
+        values[dim] = dimension.values(rows, cols)
+        if timings is not None:
+            elapsed = timings.setdefault(dim, [0.0, 0.0])
+            elapsed[0] += time.perf_counter() - wall
+            elapsed[1] += time.process_time() - cpu
+    overall = np.zeros(len(pairs), dtype=np.float64)
+    for dim, weight in weights.items():
+        overall += values[dim] * weight
+    values['overall'] = overall
+
+    names = list(values.keys())
+    columns = [values[name].tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def cascade_levels(dimensions: Dict[str, Any], levels: List[List[str]]) -> List[List[str]]:
+    """整理级联的各级维度：去掉不存在的维度，未列出的维度作为最后一级"""
+    listed = []
+    result = []
+    for level in levels:
+        level = [dim for dim in level if dim in dimensions and dim not in listed]
+        if level:
+            listed.extend(level)
+            result.append(level)
+    rest = [dim for dim in dimensions if dim not in listed]
+    if rest:
+        result.append(rest)
+    return result
+
+
+def remaining_weights(levels: List[List[str]], weights: Dict[str, float]) -> List[float]:
+    """每个非最后一级算完后尚未计算的维度的权重和
+
+    这些维度的上界一般为1，综合相似度上界不低于该值，阈值不高于它时该级不会剪枝。
+    """
+    remaining = []
+    for k in range(len(levels) - 1):
+        remaining.append(sum(weights.get(dim, 0.0) for level in levels[k + 1:] for dim in level))
+    return remaining
+
+
+def _upper_bound(dimension: Any, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """维度的逐对上界（维度未提供上界时为1）"""
+    if hasattr(dimension, 'upper_bound'):
+        return dimension.upper_bound(rows, cols)
+    return np.ones(len(rows), dtype=np.float64)
+
+
+def cascade_pair_block(dimensions: Dict[str, Any], weights: Dict[str, float], pairs: List[tuple],
+                       threshold: float, levels: List[List[str]],
+                       timings: Dict[str, List[float]] = None) -> Tuple[List[int], List[Dict[str, float]], List[int]]:
+    """按代价由低到高逐级计算维度，综合相似度上界低于threshold的作业对不再计算后续维度
+
+    除最后一级外，每一级计算完成后，已算维度取实际值、其余维度取上界（默认为1），
+    加权得到该作业对还可能达到的最大综合相似度。算完全部维度的作业对都会保留。
+    levels中未列出的维度作为最后一级计算。
+    返回 (保留的作业对在pairs中的位置, 保留作业对的得分, 除最后一级外每一级剪去的作业对数)。
+    """
+    levels = cascade_levels(dimensions, levels)
+    if not pairs:
+        return [], [], [0] * (len(levels) - 1)
+    pair_array = np.asarray(pairs, dtype=np.int64).reshape(len(pairs), 2)
+    positions = np.arange(len(pairs))
+    rows, cols = pair_array[:, 0], pair_array[:, 1]
+
+    # 尚未计算的维度按上界计入
+    pending_bound = {
+        dim: _upper_bound(dimensions[dim], rows, cols) * weights.get(dim, 0.0)
+        for level in levels for dim in level
+    }
+    known = np.zeros(len(pairs), dtype=np.float64)
+    remaining = np.zeros(len(pairs), dtype=np.float64)
+    for bound in pending_bound.values():
+        remaining += bound
+
+    values = {}
+    pruned = []
+    for index, level in enumerate(levels):
+        for dim in level:
+            wall, cpu = time.perf_counter(), time.process_time()
+            values[dim] = dimensions[dim].values(rows, cols)
+            if timings is not None:
+                elapsed = timings.setdefault(dim, [0.0, 0.0])
+                elapsed[0] += time.perf_counter() - wall
+                elapsed[1] += time.process_time() - cpu
+            known += values[dim] * weights.get(dim, 0.0)
+            remaining -= pending_bound.pop(dim)
+        if index == len(levels) - 1:
+            break
+        keep = known + remaining >= threshold - BOUND_TOLERANCE
+        pruned.append(int(len(keep) - keep.sum()))
+        if not keep.all():
+            positions, rows, cols = positions[keep], rows[keep], cols[keep]
+            known, remaining = known[keep], remaining[keep]
+            values = {dim: column[keep] for dim, column in values.items()}
+            pending_bound = {dim: bound[keep] for dim, bound in pending_bound.items()}
+
+    overall = np.zeros(len(positions), dtype=np.float64)
+    for dim, weight in weights.items():
+        overall += values[dim] * weight
+    values['overall'] = overall
+
+    names = list(dimensions.keys()) + ['overall']
+    columns = [values[name].tolist() for name in names]
+    return positions.tolist(), [dict(zip(names, row)) for row in zip(*columns)], pruned
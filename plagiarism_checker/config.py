@@ -28,7 +28,8 @@ SIMILARITY_WEIGHTS = {
     'text': 0.4,      # 文本内容权重
     'code': 0.2,      # 代码块权重  
     'command': 0.2,   # 命令权重
-    'structure': 0.2  # 结构权重
+    'structure': 0.2, # 结构权重
+    'image': 0.0      # 截图权重（默认不计入总分，共享截图在报告中单独列出）
 }
 
 # 文本处理配置
@@ -46,7 +47,19 @@ TEXT_CONFIG = {
     # TF-IDF参数
     'tfidf_max_features': 5000,
     'tfidf_min_df': 1,
-    'tfidf_max_df': 0.8
+    'tfidf_max_df': 0.8,
+    
+    # 文本向量化方式：'tfidf' 保留词表；'hashing' 用固定维度的特征哈希，不保存词表
+    'vectorizer': 'tfidf',
+    
+    # hashing模式的特征维度
+    'hashing_n_features': 2 ** 18,
+    
+    # 分词缓存目录（按文本哈希+词典版本持久化，设为None则只在内存中缓存）
+    'segment_cache_dir': '.segment_cache',
+    
+    # 分词并行进程数
+    'segment_workers': 1
 }
 
 # 代码分析配置  
@@ -73,7 +86,172 @@ CODE_CONFIG = {
     'ignore_prefixes': ['#', '//', '/*'],
     
     # 最小命令长度
-    'min_command_length': 3
+    'min_command_length': 3,
+    
+    # winnowing指纹参数（长度不少于 kgram + window - 1 的相同片段必定被检出）
+    'winnow_kgram': 10,
+    'winnow_window': 10,
+    
+    # 出现在超过该比例学生中的指纹视为模板代码，不参与比较（None表示不过滤）
+    'fingerprint_max_df': 0.5,
+    
+    # 每对高相似度作业在报告中展示的匹配代码片段数
+    'max_matched_spans': 5
+}
+
+# 候选对生成配置（MinHash/LSH）
+CANDIDATE_CONFIG = {
+    # 候选模式: 'auto' 小批次全量比较、大批次使用LSH; 'exact' 全量比较; 'lsh' 仅比较LSH候选对
+    'mode': 'auto',
+    
+    # auto模式下使用全量比较的最大学生数
+    'exact_max_students': 200,
+    
+    # MinHash签名长度
+    'num_perm': 128,
+    
+    # 字符shingle长度
+    'shingle_size': 5,
+    
+    # 候选对的shingle Jaccard相似度下限
+    'jaccard_threshold': 0.3,
+    
+    # 在jaccard_threshold处的期望召回率（越高候选对越多）
+    'recall': 0.95,
+    
+    # 随机种子（保证结果可复现）
+    'seed': 42
+}
+
+# 上界剪枝配置
+PRUNING_CONFIG = {
+    # 是否剪枝（命令行 --prune / --no-prune 可覆盖）：综合相似度的最大可能值低于阈值的作业对
+    # 不再计算高代价维度，也不写出。默认关闭：被剪去的作业对不计入统计信息、直方图、结果数据库、
+    # 得分存档和相似度矩阵，开启后平均相似度等统计只反映完整计算的作业对（疑似对不受影响）
+    'enabled': False,
+    
+    # 级联顺序（按代价由低到高），每一级算完后以已算维度的实际值和其余维度的上界判断是否剪枝；
+    # 未列出的维度作为最后一级。某一级之后尚未计算的维度上界一般为1，其权重和就是上界的下限，
+    # 阈值不高于它时该级不会剪枝：默认权重下第一级之后剩余代码+文本0.6，第二级之后剩余文本0.4，
+    # 即阈值≤0.6时只有代码一级可能剪枝，阈值≤0.4时不会剪去任何作业对
+    'levels': [['structure', 'command', 'image'], ['code'], ['text']]
+}
+
+# 增量查重配置
+INCREMENTAL_CONFIG = {
+    # 特征与作业对得分的索引目录（按作业类型分子目录）
+    'index_dir': '.plagiarism_index',
+    
+    # 增量模式总能省去未变化作业的读取、特征提取与分词，以及复用作业对的命令、结构、截图相似度；
+    # 只要有作业新增或修改，仍需为整个批次构建文本与代码维度（新作业对要用）。
+    # 文本、代码相似度依赖整个批次，批次成员相对已存得分所依据批次的变化比例超过该值时，
+    # 复用的作业对也按新批次重算这两个维度（0表示有任何变化都重算，结果与全量运行一致）；
+    # 不超过该值时沿用已存得分，偏差随变化比例增大，累计变化超过该值后再统一重算
+    'cohort_drift_tolerance': 0.0
+}
+
+# 作业对得分存档配置（调整权重或阈值时无需重新计算各维度相似度）
+SCORE_ARCHIVE_CONFIG = {
+    # 是否在检查完成后保存各维度的作业对得分
+    'enabled': True,
+    
+    # 存档目录（按作业类型分子目录）
+    'archive_dir': '.plagiarism_scores'
+}
+
+# 相似度矩阵输出配置（每个维度一个内存映射的 n×n 矩阵，由作业对得分存档生成）
+MATRIX_CONFIG = {
+    # 是否默认输出（命令行 --matrices 同样开启）
+    'enabled': False,
+    
+    # 矩阵元素类型（float16时5000名学生每个维度约50MB）
+    'dtype': 'float16'
+}
+
+# 分片查重配置（多台机器通过共享文件系统分担作业对计算）
+SHARD_CONFIG = {
+    # 特征快照与各分片输出所在的共享目录
+    'snapshot_dir': 'plagiarism_shards',
+    
+    # 每个分片分到的作业对块数（块越多各分片负载越均衡，块内作业对越少）
+    'tiles_per_shard': 4,
+    
+    # 等待其他分片生成特征快照的最长时间（秒）
+    'lock_timeout': 3600
+}
+
+# 往届作业归档配置
+ARCHIVE_CONFIG = {
+    # 归档索引目录
+    'archive_dir': 'archive_index',
+    
+    # LSH分带参数：在该shingle Jaccard相似度处达到recall的召回率
+    'jaccard_threshold': 0.3,
+    'recall': 0.95,
+    
+    # 报告中列出的归档匹配的最低估计相似度
+    'similarity_threshold': 0.5
+}
+
+# 句子级近重复检测配置
+SENTENCE_CONFIG = {
+    # 去掉标点和空白后少于该字符数的短句不参与检测
+    'min_sentence_chars': 15,
+    
+    # SimHash汉明距离不超过该值的两个句子视为近重复
+    'hamming_threshold': 6,
+    
+    # 置换表的分块数（须大于汉明距离阈值；表数为 C(分块数, 分块数-阈值)）
+    'index_blocks': 8,
+    
+    # 与超过该比例的学生近重复的句子视为作业模板（如题目原文），不计入统计
+    'max_share': 0.5,
+    
+    # 报告中每个学生列出的主要来源数
+    'top_sources': 3
+}
+
+# 共同段落对齐配置（只对疑似抄袭的作业对执行）
+ALIGNMENT_CONFIG = {
+    # 报告的共同段落最短长度（标准化后的字符数）
+    'min_passage_length': 40,
+    
+    # 每对作业最多报告的段落数
+    'max_passages': 10,
+    
+    # 报告中每个段落展示的最多字符数
+    'excerpt_chars': 300
+}
+
+# 截图相似度配置
+IMAGE_CONFIG = {
+    # 感知哈希方法（phash 或 dhash）及哈希边长（哈希位数为其平方）
+    'hash_method': 'phash',
+    'hash_size': 8,
+    
+    # 汉明距离不超过该值的两张截图视为近重复
+    'hamming_threshold': 8,
+    
+    # 并行计算哈希的进程数
+    'hash_workers': 4,
+    
+    # 哈希缓存目录（按图片内容哈希索引），设为None则不持久化
+    'cache_dir': '.image_hash_cache'
+}
+
+# 结果数据库配置（SQLite，按学生、作业类型和综合相似度建索引）
+DATABASE_CONFIG = {
+    # 是否在检查完成后写入数据库
+    'enabled': True,
+    
+    # 数据库文件路径
+    'path': 'plagiarism_results.db',
+    
+    # 每个作业类型保留的最近运行数（更早运行的作业对得分被删除）
+    'keep_runs': 1,
+    
+    # 每次批量写入的作业对行数
+    'batch_size': 5000
 }
 
 # 报告生成配置
@@ -94,10 +272,23 @@ REPORT_CONFIG = {
         'low': {'threshold': 0.3, 'color': '#e8f5e8', 'label': '✅ 正常'}
     },
     
+    # 内存中保留并在报告中展示的最相似作业对数量
+    'top_k_comparisons': 500,
+    
+    # HTML报告中内联展示的最相似作业对数量（其余按分块分页加载）
+    'inline_top_n': 100,
+    
+    # 分页加载时每个数据分块的行数
+    'chunk_size': 2000,
+    
+    # 生成分块时内存中排序的最大行数（每行约60字节），作业对更多时分段排序后归并
+    'sort_run_rows': 1000000,
+    
     # 图表配置
     'plot_config': {
         'figure_size': (12, 8),
         'dpi': 300,
+        'preview_dpi': 72,
         'style': 'seaborn',
         'chinese_font': 'SimHei'
     }
@@ -114,6 +305,12 @@ BATCH_CONFIG = {
     # 超时设置（秒）
     'timeout': 300,
     
+    # 比较进度日志的百分比间隔（其余进度只记DEBUG日志）
+    'progress_step': 10,
+    
+    # 扫描目录和预取文件的I/O线程数
+    'io_workers': 8,
+    
     # 重试次数
     'max_retries': 3
 }
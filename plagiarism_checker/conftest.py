@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试共用的fixture
+"""
+
+import pytest
+
+from homework_similarity_checker import HomeworkSimilarityChecker
+
+
+@pytest.fixture
+def checker(tmp_path, monkeypatch):
+    # 日志与缓存写到临时目录
+    monkeypatch.chdir(tmp_path)
+    return HomeworkSimilarityChecker(str(tmp_path))
+
+
+REPORTS = [
+    "# 实验三\n\n创建逻辑卷并挂载。\n\n```\npvcreate /dev/sdb1\nvgcreate vg /dev/sdb1\nlvcreate -L 1G -n lv vg\n```\n",
+    "# 实验三\n\n扩容逻辑卷后检查空间。\n\n```\nlvextend -L +1G /dev/vg/lv\nresize2fs /dev/vg/lv\ndf -h\n```\n",
+    "# 实验三\n\n配置开机自动挂载。\n\n```\nmkdir /data\nmount /dev/vg/lv /data\n```\n",
+]
+
+
+@pytest.fixture
+def write_report():
+    """按 学生/H3/仓库/H3/report.md 的布局写入一份报告"""
+    def write(base, student, content):
+        report_dir = base / student / 'H3' / 'repo' / 'H3'
+        report_dir.mkdir(parents=True, exist_ok=True)
+        (report_dir / 'report.md').write_text(content, encoding='utf-8')
+    return write
+
+
+@pytest.fixture
+def homework(tmp_path, write_report):
+    """三名学生的H3作业目录"""
+    base = tmp_path / 'homework'
+    for k, content in enumerate(REPORTS):
+        write_report(base, f'stu{k}', content)
+    return base
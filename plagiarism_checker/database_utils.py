@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查重结果数据库
+
+把每次运行的元数据（作业类型、阈值、权重、统计、运行指标）和全部作业对的各维度得分
+写入SQLite，按学生、作业类型和综合相似度建索引。
+查询某个学生在各次作业中与谁最相似时只需走索引，不必加载整个结果JSON或重新运行查重。
+
+用法:
+    python database_utils.py student stu001 --type H3 --type H4 --type H5
+    python database_utils.py pair stu001 stu002
+    python database_utils.py top --type H3 --limit 20
+    python database_utils.py runs
+"""
+
+import json
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import DATABASE_CONFIG
+from index_utils import PAIR_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+# 数据库结构版本（写入 PRAGMA user_version）
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    homework_type TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    threshold REAL,
+    weights TEXT,
+    statistics TEXT,
+    metrics TEXT,
+    pair_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_runs_type ON runs(homework_type, id);
+"""
+
+# 每次运行的作业对单独成表：先无索引批量写入再建索引（排序建索引比逐行维护快数倍），
+# 删除旧运行时直接删表
+_PAIR_TABLE = """
+CREATE TABLE {table} (
+    student1 TEXT NOT NULL,
+    student2 TEXT NOT NULL,
+    text REAL,
+    code REAL,
+    command REAL,
+    structure REAL,
+    image REAL,
+    overall REAL NOT NULL,
+    is_suspicious INTEGER NOT NULL
+)
+"""
+
+_PAIR_INDEXES = [
+    "CREATE INDEX {table}_student1 ON {table}(student1, overall)",
+    "CREATE INDEX {table}_student2 ON {table}(student2, overall)",
+    "CREATE INDEX {table}_overall ON {table}(overall)"
+]
+
+
+def _pair_table(run_id: int) -> str:
+    return f"pairs_{int(run_id)}"
+
+
+class ResultsDatabase:
+    """查重结果数据库
+
+    runs表按 (作业类型, 运行编号) 建索引；每次运行的作业对存于各自的表中，
+    按学生（student1/student2两个方向）和综合相似度建索引。查询默认只使用每个作业类型最近一次运行。
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or DATABASE_CONFIG['path']
+        self.connection = sqlite3.connect(self.path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise RuntimeError(f"数据库结构版本不符: {self.path} (版本 {version}，需要 {SCHEMA_VERSION})")
+        self.connection.executescript(_SCHEMA)
+        self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self) -> 'ResultsDatabase':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_run(self, homework_type: str, comparisons: Iterable[Dict[str, Any]], threshold: float = None,
+                weights: Dict[str, float] = None, statistics: Dict[str, Any] = None,
+                metrics: Dict[str, Any] = None, keep_runs: int = None, batch_size: int = None) -> int:
+        """写入一次运行及其全部作业对（单个事务），返回运行编号
+
+        只保留该作业类型最近keep_runs次运行，更早的运行及其作业对一并删除。
+        """
+        keep_runs = keep_runs if keep_runs is not None else DATABASE_CONFIG['keep_runs']
+        batch_size = batch_size or DATABASE_CONFIG['batch_size']
+        columns = ['student1', 'student2'] + PAIR_DIMENSIONS + ['is_suspicious']
+
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (homework_type, created_at, threshold, weights, statistics, metrics) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (homework_type, datetime.now().isoformat(), threshold,
+                 json.dumps(weights, ensure_ascii=False) if weights is not None else None,
+                 json.dumps(statistics, ensure_ascii=False) if statistics is not None else None,
+                 json.dumps(metrics, ensure_ascii=False) if metrics is not None else None)
+            )
+            run_id = cursor.lastrowid
+            table = _pair_table(run_id)
+            self.connection.execute(_PAIR_TABLE.format(table=table))
+            insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            rows = (
+                (comparison['student1'], comparison['student2'])
+                + tuple(comparison['similarities'].get(dim) for dim in PAIR_DIMENSIONS)
+                + (int(comparison['is_suspicious']),)
+                for comparison in comparisons
+            )
+            count = 0
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                self.connection.executemany(insert, batch)
+                count += len(batch)
+            for statement in _PAIR_INDEXES:
+                self.connection.execute(statement.format(table=table))
+            self.connection.execute("UPDATE runs SET pair_count = ? WHERE id = ?", (count, run_id))
+
+            if keep_runs and keep_runs > 0:
+                stale = [row[0] for row in self.connection.execute(
+                    "SELECT id FROM runs WHERE homework_type = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+                    (homework_type, keep_runs)
+                )]
+                for stale_id in stale:
+                    self.connection.execute(f"DROP TABLE IF EXISTS {_pair_table(stale_id)}")
+                    self.connection.execute("DELETE FROM runs WHERE id = ?", (stale_id,))
+        logger.info(f"已写入数据库 {self.path}: {homework_type} 运行 {run_id}，{count} 对作业")
+        return run_id
+
+    def runs(self) -> List[Dict[str, Any]]:
+        """全部运行（按时间倒序）"""
+        result = []
+        for row in self.connection.execute(
+            "SELECT id, homework_type, created_at, threshold, weights, pair_count FROM runs ORDER BY id DESC"
+        ):
+            item = dict(row)
+            item['weights'] = json.loads(item['weights']) if item['weights'] else None
+            result.append(item)
+        return result
+
+    def run_details(self, run_id: int) -> Optional[Dict[str, Any]]:
+        """单次运行的统计信息与运行指标"""
+        row = self.connection.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        item = dict(row)
+        for key in ('weights', 'statistics', 'metrics'):
+            item[key] = json.loads(item[key]) if item[key] else None
+        return item
+
+    def latest_runs(self, homework_types: List[str] = None) -> List[Tuple[str, int]]:
+        """每个作业类型最近一次运行 [(作业类型, 运行编号)]"""
+        query = "SELECT homework_type, MAX(id) FROM runs"
+        args: List[Any] = []
+        if homework_types:
+            query += f" WHERE homework_type IN ({', '.join('?' * len(homework_types))})"
+            args = list(homework_types)
+        query += " GROUP BY homework_type ORDER BY homework_type"
+        return [(row[0], row[1]) for row in self.connection.execute(query, args)]
+
+    def _union(self, select: str, homework_types: List[str] = None,
+               args: List[Any] = None) -> Tuple[str, List[Any]]:
+        """把同一查询套用到各作业类型最近一次运行的作业对表上（UNION ALL）
+
+        select中以 {table} 表示作业对表；每个子查询额外带上homework_type列。
+        """
+        parts, all_args = [], []
+        for homework_type, run_id in self.latest_runs(homework_types):
+            parts.append(f"SELECT ? AS homework_type, * FROM ({select.format(table=_pair_table(run_id))})")
+            all_args.extend([homework_type] + list(args or []))
+        if not parts:
+            return '', []
+        return ' UNION ALL '.join(parts), all_args
+
+    def student_pairs(self, student: str, homework_types: List[str] = None, limit: int = 10,
+                      min_overall: float = 0.0) -> Dict[str, List[Dict[str, Any]]]:
+        """学生在各作业类型中最相似的作业对，返回 {作业类型: [{'other', 各维度得分, 'is_suspicious'}]}"""
+        scores = ', '.join(PAIR_DIMENSIONS)
+        # student1/student2两个方向分别走各自的索引
+        select = (
+            f"SELECT * FROM ("
+            f" SELECT student2 AS other, {scores}, is_suspicious FROM {{table}} WHERE student1 = ? AND overall >= ?"
+            f" UNION ALL"
+            f" SELECT student1 AS other, {scores}, is_suspicious FROM {{table}} WHERE student2 = ? AND overall >= ?"
+            f") ORDER BY overall DESC LIMIT ?"
+        )
+        query, args = self._union(select, homework_types, [student, min_overall, student, min_overall, limit])
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        if not query:
+            return result
+        for row in self.connection.execute(query, args):
+            item = dict(row)
+            homework_type = item.pop('homework_type')
+            item['is_suspicious'] = bool(item['is_suspicious'])
+            result.setdefault(homework_type, []).append(item)
+        return result
+
+    def most_similar(self, student: str, homework_types: List[str] = None,
+                     limit: int = 10) -> List[Dict[str, Any]]:
+        """跨作业类型汇总：与该学生相似度最高的其他学生
+
+        按疑似抄袭次数和各作业类型综合相似度的平均值排序，同时给出最大值和涉及的作业类型。
+        """
+        select = (
+            "SELECT student2 AS other, overall, is_suspicious FROM {table} WHERE student1 = ?"
+            " UNION ALL"
+            " SELECT student1 AS other, overall, is_suspicious FROM {table} WHERE student2 = ?"
+        )
+        union, args = self._union(select, homework_types, [student, student])
+        if not union:
+            return []
+        query = (
+            "SELECT other, AVG(overall) AS mean_overall, MAX(overall) AS max_overall,"
+            " COUNT(DISTINCT homework_type) AS homework_types, SUM(is_suspicious) AS suspicious_count,"
+            f" GROUP_CONCAT(homework_type) AS types FROM ({union})"
+            " GROUP BY other ORDER BY suspicious_count DESC, mean_overall DESC LIMIT ?"
+        )
+        result = []
+        for row in self.connection.execute(query, args + [limit]):
+            item = dict(row)
+            item['types'] = sorted(set(item['types'].split(','))) if item['types'] else []
+            result.append(item)
+        return result
+
+    def pair(self, student1: str, student2: str, homework_types: List[str] = None) -> List[Dict[str, Any]]:
+        """两名学生在各作业类型中的得分"""
+        scores = ', '.join(PAIR_DIMENSIONS)
+        select = (
+            f"SELECT {scores}, is_suspicious FROM {{table}}"
+            f" WHERE (student1 = ? AND student2 = ?) OR (student1 = ? AND student2 = ?)"
+        )
+        query, args = self._union(select, homework_types, [student1, student2, student2, student1])
+        if not query:
+            return []
+        rows = self.connection.execute(query, args)
+        return [dict(row, is_suspicious=bool(row['is_suspicious'])) for row in rows]
+
+    def top_pairs(self, homework_types: List[str] = None, limit: int = 20,
+                  suspicious_only: bool = False) -> List[Dict[str, Any]]:
+        """综合相似度最高的作业对"""
+        suspicious_sql = " WHERE is_suspicious = 1" if suspicious_only else ""
+        scores = ', '.join(PAIR_DIMENSIONS)
+        select = (
+            f"SELECT student1, student2, {scores}, is_suspicious FROM {{table}}{suspicious_sql}"
+            f" ORDER BY overall DESC LIMIT ?"
+        )
+        union, args = self._union(select, homework_types, [limit])
+        if not union:
+            return []
+        rows = self.connection.execute(f"SELECT * FROM ({union}) ORDER BY overall DESC LIMIT ?", args + [limit])
+        return [dict(row, is_suspicious=bool(row['is_suspicious'])) for row in rows]
+
+
+def _print_rows(rows: List[Dict[str, Any]], columns: List[str]):
+    """以对齐的文本表格输出"""
+    if not rows:
+        print("（无结果）")
+        return
+
+    def cell(value):
+        if isinstance(value, float):
+            return f"{value:.3f}"
+        if isinstance(value, list):
+            return ','.join(str(item) for item in value)
+        return str(value)
+
+    table = [[cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[k]) for line in table)) for k, column in enumerate(columns)]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for line in table:
+        print('  '.join(value.ljust(width) for value, width in zip(line, widths)))
+
+
+def main():
+    """查询查重结果数据库"""
+    parser = argparse.ArgumentParser(description='查询查重结果数据库')
+    parser.add_argument('--db', type=str, default=DATABASE_CONFIG['path'], help='数据库文件路径')
+    parser.add_argument('--json', action='store_true', default=False, help='以JSON输出')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    student_parser = subparsers.add_parser('student', help='某个学生在各次作业中最相似的同学')
+    student_parser.add_argument('student', help='学生目录名')
+    student_parser.add_argument('--type', dest='types', action='append', help='作业类型（可重复指定）')
+    student_parser.add_argument('--limit', type=int, default=10, help='每个作业类型列出的作业对数')
+    student_parser.add_argument('--min-overall', type=float, default=0.0, help='综合相似度下限')
+
+    pair_parser = subparsers.add_parser('pair', help='两名学生在各次作业中的得分')
+    pair_parser.add_argument('student1')
+    pair_parser.add_argument('student2')
+    pair_parser.add_argument('--type', dest='types', action='append', help='作业类型（可重复指定）')
+
+    top_parser = subparsers.add_parser('top', help='综合相似度最高的作业对')
+    top_parser.add_argument('--type', dest='types', action='append', help='作业类型（可重复指定）')
+    top_parser.add_argument('--limit', type=int, default=20, help='列出的作业对数')
+    top_parser.add_argument('--suspicious', action='store_true', default=False, help='只列出疑似抄袭的作业对')
+
+    runs_parser = subparsers.add_parser('runs', help='已写入的运行')
+    runs_parser.add_argument('--run', type=int, default=None, help='查看单次运行的统计信息与运行指标')
+    args = parser.parse_args()
+
+    with ResultsDatabase(args.db) as database:
+        if args.command == 'student':
+            result = {
+                'pairs': database.student_pairs(args.student, args.types, args.limit, args.min_overall),
+                'most_similar': database.most_similar(args.student, args.types, args.limit)
+            }
+            if args.json:
+                print(json.dumps(result, ensure_ascii=False, indent=2))
+                return
+            for homework_type, rows in result['pairs'].items():
+                print(f"\n=== {args.student} @ {homework_type} ===")
+                _print_rows(rows, ['other'] + PAIR_DIMENSIONS + ['is_suspicious'])
+            print(f"\n=== {args.student} 跨作业汇总 ===")
+            _print_rows(result['most_similar'],
+                        ['other', 'mean_overall', 'max_overall', 'homework_types', 'suspicious_count', 'types'])
+        elif args.command == 'pair':
+            rows = database.pair(args.student1, args.student2, args.types)
+            if args.json:
+                print(json.dumps(rows, ensure_ascii=False, indent=2))
+                return
+            _print_rows(rows, ['homework_type'] + PAIR_DIMENSIONS + ['is_suspicious'])
+        elif args.command == 'top':
+            rows = database.top_pairs(args.types, args.limit, args.suspicious)
+            if args.json:
+                print(json.dumps(rows, ensure_ascii=False, indent=2))
+                return
+            _print_rows(rows, ['homework_type', 'student1', 'student2'] + PAIR_DIMENSIONS + ['is_suspicious'])
+        elif args.command == 'runs':
+            if args.run is not None:
+                print(json.dumps(database.run_details(args.run), ensure_ascii=False, indent=2))
+                return
+            rows = database.runs()
+            if args.json:
+                print(json.dumps(rows, ensure_ascii=False, indent=2))
+                return
+            _print_rows(rows, ['id', 'homework_type', 'created_at', 'threshold', 'pair_count'])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+代码块winnowing指纹（MOSS风格）
+
+对每个学生标准化后的代码计算一次k-gram哈希并用winnowing选取指纹，
+再建立“指纹 → 学生”倒排索引，两两共享指纹数由一次稀疏矩阵乘积得到。
+"""
+
+import re
+import zlib
+from collections import deque, defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+
+def normalize_code(code_blocks: List[str]) -> str:
+    """合并并标准化代码（小写、合并空白）"""
+    code_text = '\n'.join(code_blocks).lower()
+    return re.sub(r'\s+', ' ', code_text).strip()
+
+
+def kgram_hashes(text: str, k: int) -> List[int]:
+    """计算全部k-gram的哈希"""
+    if len(text) < k:
+        return [zlib.crc32(text.encode('utf-8'))] if text else []
+    return [zlib.crc32(text[p:p + k].encode('utf-8')) for p in range(len(text) - k + 1)]
+
+
+def winnow(text: str, k: int = 10, window: int = 10) -> List[Tuple[int, int]]:
+    """winnowing选取指纹，返回 (哈希, 起始位置) 列表
+
+    每个长度为window的哈希窗口中选取最右侧的最小值，
+    因此长度不少于 window + k - 1 的相同片段一定能被检测到。
+    """
+    hashes = kgram_hashes(text, k)
+    if not hashes:
+        return []
+    if len(hashes) <= window:
+        pos = min(range(len(hashes)), key=lambda p: (hashes[p], -p))
+        return [(hashes[pos], pos)]
+
+    fingerprints = []
+    candidates = deque()  # 窗口内哈希值单调递增的位置队列
+    last_selected = -1
+    for pos, value in enumerate(hashes):
+        while candidates and hashes[candidates[-1]] >= value:
+            candidates.pop()
+        candidates.append(pos)
+        if candidates[0] <= pos - window:
+            candidates.popleft()
+        if pos >= window - 1 and candidates[0] != last_selected:
+            last_selected = candidates[0]
+            fingerprints.append((hashes[last_selected], last_selected))
+    return fingerprints
+
+
+def fingerprint_similarity(fp1: List[Tuple[int, int]], fp2: List[Tuple[int, int]]) -> float:
+    """两组指纹的Dice相似度"""
+    set1 = {h for h, _ in fp1}
+    set2 = {h for h, _ in fp2}
+    if not set1 or not set2:
+        return 0.0
+    return 2 * len(set1 & set2) / (len(set1) + len(set2))
+
+
+def matched_spans(fp1: List[Tuple[int, int]], fp2: List[Tuple[int, int]], k: int = 10,
+                  common: set = None) -> List[Tuple[int, int, int, int]]:
+    """根据共享指纹还原匹配片段，返回 (起点1, 终点1, 起点2, 终点2) 列表（按片段长度降序）"""
+    positions2 = defaultdict(list)
+    for h, pos in fp2:
+        positions2[h].append(pos)
+
+    # 同一匹配片段内的命中位于同一“对角线”（两侧位置差相同）
+    diagonals = defaultdict(list)
+    for h, pos1 in fp1:
+        if common and h in common:
+            continue
+        for pos2 in positions2.get(h, ()):
+            diagonals[pos2 - pos1].append(pos1)
+
+    spans = []
+    for offset, starts in diagonals.items():
+        starts.sort()
+        span_start, span_end = starts[0], starts[0] + k
+        for pos1 in starts[1:]:
+            # 相邻指纹间距不超过k时视为同一片段
+            if pos1 <= span_end:
+                span_end = max(span_end, pos1 + k)
+                continue
+            spans.append((span_start, span_end, span_start + offset, span_end + offset))
+            span_start, span_end = pos1, pos1 + k
+        spans.append((span_start, span_end, span_start + offset, span_end + offset))
+    spans.sort(key=lambda span: (span[0] - span[1], span[0], span[2]))
+    return spans
+
+
+class FingerprintIndex:
+    """指纹倒排索引（指纹 → 学生）"""
+
+    def __init__(self, fingerprints: List[List[Tuple[int, int]]], max_df: float = None):
+        self.fingerprints = fingerprints
+        self.postings: Dict[int, List[int]] = defaultdict(list)
+        for idx, fps in enumerate(fingerprints):
+            for h in {h for h, _ in fps}:
+                self.postings[h].append(idx)
+
+        # 出现在过多学生中的指纹视为模板内容（如课程给定命令），不参与比较
+        n = len(fingerprints)
+        limit = max(2, max_df * n) if max_df else None
+        self.common = {
+            h for h, students in self.postings.items()
+            if limit is not None and len(students) > limit
+        }
+
+        vocabulary = [h for h in self.postings if h not in self.common]
+        columns = {h: col for col, h in enumerate(vocabulary)}
+        rows, cols = [], []
+        for h in vocabulary:
+            for idx in self.postings[h]:
+                rows.append(idx)
+                cols.append(columns[h])
+        data = np.ones(len(rows), dtype=np.float32)
+        self.matrix = sparse.csr_matrix((data, (rows, cols)), shape=(n, len(vocabulary)))
+        self.sizes = np.asarray(self.matrix.sum(axis=1)).ravel()
+
+    def shared_counts(self) -> sparse.csr_matrix:
+        """两两共享指纹数（稀疏矩阵）"""
+        return (self.matrix @ self.matrix.T).tocsr()
+
+    def similarity_matrix(self) -> sparse.csr_matrix:
+        """两两Dice相似度（稀疏矩阵，只保存有共享指纹的作业对）"""
+        shared = self.shared_counts().tocoo()
+        denominator = self.sizes[shared.row] + self.sizes[shared.col]
+        values = np.divide(2 * shared.data, denominator,
+                           out=np.zeros_like(shared.data), where=denominator > 0)
+        return sparse.csr_matrix((values, (shared.row, shared.col)), shape=shared.shape)
+
+    def pair_spans(self, i: int, j: int, k: int = 10) -> List[Tuple[int, int, int, int]]:
+        """两名学生之间的匹配片段"""
+        return matched_spans(self.fingerprints[i], self.fingerprints[j], k, self.common)
@@ -5,29 +5,77 @@ Linux作业相似度分析工具
 """
 
 import os
-import re
 import sys
+import math
 import json
+import argparse
 import logging
 from pathlib import Path
-from typing import Dict, List, Tuple, Any
-from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple, Any
 import hashlib
 from difflib import SequenceMatcher
 from datetime import datetime
+from html import escape as html_escape
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from functools import partial
+from contextlib import contextmanager
 
-import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import jieba
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib import rcParams
+from scipy import sparse
+
+from config import (BASE_CONFIG, SIMILARITY_WEIGHTS, TEXT_CONFIG, CODE_CONFIG,
+                    CANDIDATE_CONFIG, PRUNING_CONFIG, BATCH_CONFIG, INCREMENTAL_CONFIG, DATABASE_CONFIG, SHARD_CONFIG,
+                    SCORE_ARCHIVE_CONFIG, MATRIX_CONFIG, SENTENCE_CONFIG,
+                    ALIGNMENT_CONFIG, IMAGE_CONFIG, REPORT_CONFIG)
+from segment_utils import SegmentCache
+from markdown_utils import MarkdownFeatureExtractor
+from index_utils import FeatureStore, content_hash, settings_hash, PAIR_DIMENSIONS, COHORT_DIMENSIONS
+from loader_utils import decode_bytes, discover_submissions, iter_file_bytes
+from stream_utils import ComparisonStream, iter_comparisons
+from report_utils import write_report_chunks, paginated_table_html
+from archive_utils import ArchiveIndex
+from lsh_utils import all_pairs, generate_candidate_pairs
+from fingerprint_utils import normalize_code, winnow, fingerprint_similarity, FingerprintIndex
+from sentence_utils import split_sentences, simhash, sentence_overlap
+from alignment_utils import SuffixAutomaton, normalize_with_offsets, shared_passages
+from image_utils import ImageHashCache, ImageIndex, image_similarity
+from metrics_utils import RunMetrics, ProgressLog
+from database_utils import ResultsDatabase
+from shard_utils import ShardSpec, ShardWorkspace, snapshot_id
+from rescore_utils import ScoreArchive, ScoreArchiveWriter, rescore, threshold_sweep, parse_weights
+from matrix_utils import write_similarity_matrices
+from cohort_utils import (MatrixDimension, CosineDimension, JaccardDimension,
+                          StructureDimension, normalize_command_set, heading_set,
+                          score_pair_block, cascade_pair_block, cascade_levels, remaining_weights,
+                          BOUND_TOLERANCE)
+
+# 工作进程共享的特征（每个进程只传递一次，不随每个作业对序列化）
+_SCORING_STATE = {}
+
+
+def _init_scoring_worker(dimensions: Dict[str, Any]):
+    """初始化评分工作进程（整个运行只传递一次全部维度，权重、阈值等随每个分块传递）"""
+    _SCORING_STATE['dimensions'] = dimensions
+
+
+def _score_block(dimensions: Dict[str, Any], weights: Dict[str, float], pairs: List[Tuple[int, int]],
+                 threshold: float = None, levels: List[List[str]] = None):
+    """计算一个作业对分块，返回 (保留的位置, 得分, 各级剪枝数, 各维度耗时)；threshold为None时不剪枝"""
+    timings = {}
+    if threshold is None:
+        scores = score_pair_block(dimensions, weights, pairs, timings)
+        return list(range(len(pairs))), scores, [], timings
+    positions, scores, pruned = cascade_pair_block(dimensions, weights, pairs, threshold, levels, timings)
+    return positions, scores, pruned, timings
+
+
+def _score_pair_block(pairs: List[Tuple[int, int]], names: List[str], weights: Dict[str, float],
+                      threshold: float = None, levels: List[List[str]] = None):
+    """在工作进程中按names中的维度计算一个作业对分块的相似度，同时返回各维度在工作进程中的耗时"""
+    dimensions = {dim: _SCORING_STATE['dimensions'][dim] for dim in names}
+    return _score_block(dimensions, weights, pairs, threshold, levels)
 
-# 设置中文字体
-rcParams['font.sans-serif'] = ['SimHei']
-rcParams['axes.unicode_minus'] = False
 
 class HomeworkSimilarityChecker:
     """作业相似度检查器"""
@@ -36,6 +84,18 @@ class HomeworkSimilarityChecker:
         self.base_path = Path(base_path)
         self.homework_data = {}
         self.similarity_results = {}
+        self.score_archive = None
+        self.markdown_extractor = MarkdownFeatureExtractor(
+            CODE_CONFIG['command_patterns'], CODE_CONFIG['ignore_prefixes']
+        )
+        self.segment_cache = SegmentCache(
+            TEXT_CONFIG.get('segment_cache_dir'),
+            TEXT_CONFIG.get('segment_workers', 1)
+        )
+        self.image_hash_cache = ImageHashCache(
+            IMAGE_CONFIG.get('cache_dir'), IMAGE_CONFIG['hash_method'], IMAGE_CONFIG['hash_size']
+        )
+        self.metrics = RunMetrics()
         self.setup_logging()
         
     def setup_logging(self):
@@ -52,181 +112,76 @@ class HomeworkSimilarityChecker:
 
     def extract_homework_files(self, homework_type: str = "H3") -> Dict[str, Dict]:
         """提取指定类型的作业文件"""
-        homework_files = {}
-        
         if not self.base_path.exists():
             self.logger.error(f"路径不存在: {self.base_path}")
-            return homework_files
-            
-        for student_dir in self.base_path.iterdir():
-            if not student_dir.is_dir():
-                continue
-                
-            student_name = student_dir.name
-            homework_dir = student_dir / homework_type
-            
-            if not homework_dir.exists():
-                continue
-                
-            # 查找作业文件
-            for subdir in homework_dir.iterdir():
-                if subdir.is_dir():
-                    actual_homework_dir = subdir / homework_type
-                    if actual_homework_dir.exists():
-                        md_files = list(actual_homework_dir.glob("*.md"))
-                        if md_files:
-                            homework_files[student_name] = {
-                                'md_file': md_files[0],
-                                'image_files': list(actual_homework_dir.glob("*.png")),
-                                'other_files': list(actual_homework_dir.glob("*")),
-                                'dir_path': actual_homework_dir
-                            }
-                            
+            return {}
+        
+        # 并发扫描各学生目录
+        homework_files = discover_submissions(self.base_path, homework_type, BATCH_CONFIG['io_workers'])
         self.logger.info(f"找到 {len(homework_files)} 份 {homework_type} 作业")
         return homework_files
 
     def extract_content(self, file_path: Path) -> Dict[str, Any]:
         """提取Markdown文件内容"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except:
-            try:
-                with open(file_path, 'r', encoding='gbk') as f:
-                    content = f.read()
-            except Exception as e:
-                self.logger.error(f"无法读取文件 {file_path}: {e}")
-                return {}
-        
-        # 提取各种内容
-        extracted = {
-            'raw_content': content,
-            'text_content': self.extract_text_content(content),
-            'code_blocks': self.extract_code_blocks(content),
-            'commands': self.extract_commands(content),
-            'urls': self.extract_urls(content),
-            'structure': self.extract_structure(content),
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            self.logger.error(f"无法读取文件 {file_path}: {e}")
+            return {}
+        return self.parse_content(data, file_path)
+
+    def parse_content(self, data: bytes, file_path: Path = None) -> Dict[str, Any]:
+        """从已读入的字节内容提取Markdown特征（编码由内容判断）"""
+        content, encoding = decode_bytes(data)
+        if encoding == 'utf-8-replace':
+            self.logger.warning(f"无法识别文件编码，已替换非法字节: {file_path}")
+        
+        # 单次扫描提取各种内容
+        extracted = {'raw_content': content}
+        extracted.update(self.markdown_extractor.extract(content))
+        extracted.update({
             'word_count': len(content.split()),
             'char_count': len(content),
-            'line_count': len(content.split('\n'))
-        }
+            'line_count': content.count('\n') + 1
+        })
         
         return extracted
 
     def extract_text_content(self, content: str) -> str:
         """提取纯文本内容（去除代码块、链接等）"""
-        # 去除代码块
-        content = re.sub(r'```[\s\S]*?```', '', content)
-        content = re.sub(r'`[^`]*`', '', content)
-        
-        # 去除链接
-        content = re.sub(r'https?://[^\s\)]+', '', content)
-        content = re.sub(r'\[.*?\]\(.*?\)', '', content)
-        
-        # 去除Markdown标记
-        content = re.sub(r'#+\s*', '', content)
-        content = re.sub(r'\*+([^*]+)\*+', r'\1', content)
-        content = re.sub(r'_+([^_]+)_+', r'\1', content)
-        
-        # 去除图片引用
-        content = re.sub(r'!\[.*?\]\(.*?\)', '', content)
-        
-        # 清理多余空白
-        content = re.sub(r'\s+', ' ', content).strip()
-        
-        return content
+        return self.markdown_extractor.extract(content)['text_content']
 
     def extract_code_blocks(self, content: str) -> List[str]:
-        """提取代码块"""
-        code_blocks = []
-        
-        # 提取代码块
-        blocks = re.findall(r'```[\s\S]*?```', content)
-        for block in blocks:
-            # 去除```标记
-            code = re.sub(r'^```.*?\n|```$', '', block, flags=re.MULTILINE).strip()
-            if code:
-                code_blocks.append(code)
-        
-        # 提取行内代码
-        inline_codes = re.findall(r'`([^`]+)`', content)
-        code_blocks.extend(inline_codes)
-        
-        return code_blocks
+        """提取代码块（围栏代码块及行内代码）"""
+        return self.markdown_extractor.extract(content)['code_blocks']
 
     def extract_commands(self, content: str) -> List[str]:
         """提取Linux命令"""
-        commands = []
-        
-        # 常见Linux命令模式
-        command_patterns = [
-            r'sudo\s+\w+[^\n]*',
-            r'(?:ls|cd|mkdir|chmod|chown|grep|find|ps|kill|top|df|du|mount|umount)\s+[^\n]*',
-            r'systemctl\s+[^\n]*',
-            r'adduser\s+[^\n]*',
-            r'usermod\s+[^\n]*',
-            r'fdisk\s+[^\n]*',
-            r'lvm\w*\s+[^\n]*',
-            r'nano\s+[^\n]*',
-            r'vim\s+[^\n]*'
-        ]
-        
-        for pattern in command_patterns:
-            matches = re.findall(pattern, content, re.IGNORECASE)
-            commands.extend(matches)
-        
-        # 从代码块中提取命令
-        code_blocks = self.extract_code_blocks(content)
-        for block in code_blocks:
-            for line in block.split('\n'):
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    commands.append(line)
-        
-        return list(set(commands))  # 去重
+        return self.markdown_extractor.extract(content)['commands']
 
     def extract_urls(self, content: str) -> List[str]:
         """提取URL链接"""
-        urls = re.findall(r'https?://[^\s\)]+', content)
-        return urls
+        return self.markdown_extractor.extract(content)['urls']
 
     def extract_structure(self, content: str) -> Dict[str, Any]:
         """提取文档结构"""
-        structure = {
-            'headings': [],
-            'heading_counts': defaultdict(int),
-            'sections': [],
-            'list_items': 0,
-            'code_block_count': 0,
-            'image_count': 0,
-            'link_count': 0
-        }
-        
-        # 提取标题
-        headings = re.findall(r'^(#+)\s+(.+)$', content, re.MULTILINE)
-        for level, title in headings:
-            structure['headings'].append((len(level), title.strip()))
-            structure['heading_counts'][len(level)] += 1
-        
-        # 统计各种元素
-        structure['list_items'] = len(re.findall(r'^\s*[-*+]\s+', content, re.MULTILINE))
-        structure['code_block_count'] = len(re.findall(r'```', content)) // 2
-        structure['image_count'] = len(re.findall(r'!\[.*?\]', content))
-        structure['link_count'] = len(re.findall(r'\[.*?\]\(.*?\)', content))
-        
-        return structure
+        return self.markdown_extractor.extract(content)['structure']
 
     def calculate_text_similarity(self, text1: str, text2: str) -> float:
         """计算文本相似度（使用TF-IDF + 余弦相似度）"""
         if not text1 or not text2:
             return 0.0
         
-        # 中文分词
-        text1_seg = ' '.join(jieba.cut(text1))
-        text2_seg = ' '.join(jieba.cut(text2))
+        # 中文分词（同一文本只分词一次）
+        text1_seg = self.segment_cache.segment(text1)
+        text2_seg = self.segment_cache.segment(text2)
+        
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.metrics.pairwise import cosine_similarity
         
-        # TF-IDF向量化
-        vectorizer = TfidfVectorizer()
+        # TF-IDF向量化（两份文档上的文档频率限制没有意义，只去除停用词）
+        vectorizer = TfidfVectorizer(stop_words=TEXT_CONFIG['stop_words'])
         try:
             tfidf_matrix = vectorizer.fit_transform([text1_seg, text2_seg])
             similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
@@ -235,41 +190,145 @@ class HomeworkSimilarityChecker:
             # 回退到简单的序列匹配
             return SequenceMatcher(None, text1, text2).ratio()
 
+    def vectorize_texts(self, segmented_texts: List[str]) -> sparse.csr_matrix:
+        """将全体已分词文本向量化为L2归一化的稀疏TF-IDF矩阵（空文本为全零行）
+
+        按TEXT_CONFIG限制词表规模（max_features/min_df/max_df/停用词）；
+        vectorizer为'hashing'时使用固定维度的特征哈希，内存占用与词表大小无关。
+        """
+        n = len(segmented_texts)
+        mode = TEXT_CONFIG.get('vectorizer', 'tfidf')
+        width = TEXT_CONFIG['hashing_n_features'] if mode == 'hashing' else 0
+        empty = sparse.csr_matrix((n, width), dtype=np.float32)
+        non_empty = [idx for idx, text in enumerate(segmented_texts) if text.strip()]
+        if len(non_empty) < 2:
+            return empty
+        
+        segmented = [segmented_texts[idx] for idx in non_empty]
+        try:
+            if mode == 'hashing':
+                tfidf_matrix = self._hashing_tfidf(segmented)
+            elif mode == 'tfidf':
+                from sklearn.feature_extraction.text import TfidfVectorizer
+                
+                # 基于整个批次拟合向量器，IDF权重在全体作业间保持一致
+                min_count, max_count = self.document_frequency_limits(len(segmented))
+                vectorizer = TfidfVectorizer(
+                    max_features=TEXT_CONFIG['tfidf_max_features'],
+                    min_df=min_count,
+                    max_df=max_count,
+                    stop_words=TEXT_CONFIG['stop_words'],
+                    dtype=np.float32
+                )
+                tfidf_matrix = vectorizer.fit_transform(segmented)
+            else:
+                raise ValueError(f"未知的文本向量化方式: {mode}")
+        except ValueError as e:
+            self.logger.warning(f"TF-IDF向量化失败，文本相似度记为0: {e}")
+            return empty
+        
+        # 放回原始行位置（空文本对应全零行）
+        placement = sparse.csr_matrix(
+            (np.ones(len(non_empty), dtype=np.float32), (non_empty, np.arange(len(non_empty)))),
+            shape=(n, len(non_empty))
+        )
+        return (placement @ tfidf_matrix).tocsr()
+
+    def document_frequency_limits(self, n_docs: int) -> Tuple[int, int]:
+        """TEXT_CONFIG中min_df/max_df对应的文档数上下限（浮点数为比例，整数为文档数）
+
+        与FingerprintIndex一样，上限不低于2份文档：小批次中两份作业共有的词不会因
+        “出现在全部文档中”而被滤掉，否则两份相同的作业文本相似度为0。
+        """
+        min_df, max_df = TEXT_CONFIG['tfidf_min_df'], TEXT_CONFIG['tfidf_max_df']
+        min_count = math.ceil(min_df * n_docs) if isinstance(min_df, float) else min_df
+        max_count = math.floor(max_df * n_docs) if isinstance(max_df, float) else max_df
+        max_count = max(2, max_count)
+        return min(min_count, max_count), max_count
+
+    def _hashing_tfidf(self, segmented: List[str]) -> sparse.csr_matrix:
+        """特征哈希 + 文档频率过滤 + TF-IDF加权"""
+        from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+        
+        vectorizer = HashingVectorizer(
+            n_features=TEXT_CONFIG['hashing_n_features'],
+            stop_words=TEXT_CONFIG['stop_words'],
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32
+        )
+        counts = vectorizer.transform(segmented).tocsr()
+        
+        min_count, max_count = self.document_frequency_limits(counts.shape[0])
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        keep = (document_frequency >= min_count) & (document_frequency <= max_count)
+        counts.data *= keep[counts.indices]
+        counts.eliminate_zeros()
+        if counts.nnz == 0:
+            raise ValueError("文档频率过滤后没有剩余特征")
+        
+        return TfidfTransformer().fit_transform(counts).astype(np.float32)
+
+    def calculate_text_similarity_matrix(self, segmented_texts: List[str]) -> np.ndarray:
+        """计算全体文本的两两相似度矩阵（输入为已分词文本，整个批次只拟合一次TF-IDF）"""
+        tfidf_matrix = self.vectorize_texts(segmented_texts)
+        # TF-IDF行向量已L2归一化，一次稀疏矩阵乘积即得全部余弦相似度
+        similarity = (tfidf_matrix @ tfidf_matrix.T).toarray().astype(np.float64)
+        np.clip(similarity, 0.0, 1.0, out=similarity)
+        return similarity
+
+    def code_fingerprints(self, code_text: str) -> List[Tuple[int, int]]:
+        """计算标准化代码的winnowing指纹"""
+        return winnow(code_text, CODE_CONFIG['winnow_kgram'], CODE_CONFIG['winnow_window'])
+
     def calculate_code_similarity(self, codes1: List[str], codes2: List[str]) -> float:
-        """计算代码相似度"""
+        """计算代码相似度（winnowing指纹的Dice系数）"""
         if not codes1 or not codes2:
             return 0.0
         
-        # 将所有代码合并
-        code_text1 = '\n'.join(codes1).lower()
-        code_text2 = '\n'.join(codes2).lower()
-        
-        # 标准化代码（去除空白、注释等）
-        code_text1 = re.sub(r'\s+', ' ', code_text1).strip()
-        code_text2 = re.sub(r'\s+', ' ', code_text2).strip()
+        # 合并并标准化代码
+        code_text1 = normalize_code(codes1)
+        code_text2 = normalize_code(codes2)
         
         if not code_text1 or not code_text2:
             return 0.0
         
-        return SequenceMatcher(None, code_text1, code_text2).ratio()
+        return fingerprint_similarity(
+            self.code_fingerprints(code_text1), self.code_fingerprints(code_text2)
+        )
+
+    def build_code_index(self, contents: List[Dict]) -> FingerprintIndex:
+        """为每份作业计算一次代码指纹并建立倒排索引"""
+        for content in contents:
+            if 'code_fingerprints' not in content:
+                content['normalized_code'] = normalize_code(content['code_blocks'])
+                content['code_fingerprints'] = self.code_fingerprints(content['normalized_code'])
+        return FingerprintIndex(
+            [content['code_fingerprints'] for content in contents],
+            max_df=CODE_CONFIG['fingerprint_max_df']
+        )
+
+    def matched_code_snippets(self, code_index: FingerprintIndex, contents: List[Dict],
+                              i: int, j: int) -> List[Dict[str, Any]]:
+        """提取两份作业之间匹配的代码片段（用于报告）"""
+        snippets = []
+        spans = code_index.pair_spans(i, j, CODE_CONFIG['winnow_kgram'])
+        for start1, end1, start2, end2 in spans[:CODE_CONFIG['max_matched_spans']]:
+            snippets.append({
+                'offset1': [start1, end1],
+                'offset2': [start2, end2],
+                'code': contents[i]['normalized_code'][start1:end1]
+            })
+        return snippets
 
     def calculate_command_similarity(self, commands1: List[str], commands2: List[str]) -> float:
         """计算命令相似度"""
         if not commands1 or not commands2:
             return 0.0
         
-        # 标准化命令
-        norm_commands1 = set()
-        norm_commands2 = set()
-        
-        for cmd in commands1:
-            # 提取命令主体（去除参数）
-            main_cmd = cmd.split()[0] if cmd.split() else cmd
-            norm_commands1.add(main_cmd.lower())
-        
-        for cmd in commands2:
-            main_cmd = cmd.split()[0] if cmd.split() else cmd
-            norm_commands2.add(main_cmd.lower())
+        # 标准化命令（提取命令主体，去除参数）
+        norm_commands1 = normalize_command_set(commands1)
+        norm_commands2 = normalize_command_set(commands2)
         
         # 计算Jaccard相似度
         intersection = len(norm_commands1.intersection(norm_commands2))
@@ -282,11 +341,11 @@ class HomeworkSimilarityChecker:
         similarities = []
         
         # 标题结构相似度
-        headings1 = [h[1].lower() for h in struct1['headings']]
-        headings2 = [h[1].lower() for h in struct2['headings']]
+        headings1 = heading_set(struct1)
+        headings2 = heading_set(struct2)
         
         if headings1 and headings2:
-            heading_sim = len(set(headings1).intersection(set(headings2))) / len(set(headings1).union(set(headings2)))
+            heading_sim = len(headings1.intersection(headings2)) / len(headings1.union(headings2))
             similarities.append(heading_sim)
         
         # 文档元素数量相似度
@@ -306,132 +365,1024 @@ class HomeworkSimilarityChecker:
         
         return np.mean(similarities) if similarities else 0.0
 
-    def calculate_overall_similarity(self, content1: Dict, content2: Dict, weights: Dict = None) -> Dict[str, float]:
-        """计算综合相似度"""
-        if weights is None:
-            weights = {
-                'text': 0.4,
-                'code': 0.2,
-                'command': 0.2,
-                'structure': 0.2
-            }
-        
-        similarities = {}
-        
-        # 文本相似度
-        similarities['text'] = self.calculate_text_similarity(
-            content1['text_content'], content2['text_content']
+    def calculate_image_similarity(self, images1: List[Dict], images2: List[Dict]) -> float:
+        """计算截图相似度（感知哈希近重复）"""
+        return image_similarity(
+            [image['hash'] for image in images1],
+            [image['hash'] for image in images2],
+            IMAGE_CONFIG['hamming_threshold']
         )
-        
-        # 代码相似度
-        similarities['code'] = self.calculate_code_similarity(
-            content1['code_blocks'], content2['code_blocks']
+
+    def hash_images(self, homework_files: Dict[str, Dict], homework_contents: Dict[str, Dict],
+                    changed_students: set):
+        """计算每份作业截图的感知哈希并写入content['images']；截图有变化的作业加入changed_students"""
+        students = list(homework_contents.keys())
+        image_paths = [sorted(homework_files[student]['image_files']) for student in students]
+        hashes = iter(self.image_hash_cache.hash_files(
+            [path for paths in image_paths for path in paths], IMAGE_CONFIG['hash_workers']
+        ))
+        self.image_hash_cache.save()
+        
+        for student, paths in zip(students, image_paths):
+            images = []
+            for path in paths:
+                value = next(hashes)
+                if value is not None:
+                    images.append({'name': path.name, 'hash': value})
+            if homework_contents[student].get('images') != images:
+                changed_students.add(student)
+            homework_contents[student]['images'] = images
+        self.logger.info(
+            f"截图哈希完成: 缓存命中 {self.image_hash_cache.hits}，新计算 {self.image_hash_cache.misses}"
         )
-        
-        # 命令相似度
-        similarities['command'] = self.calculate_command_similarity(
-            content1['commands'], content2['commands']
+
+    def build_image_index(self, contents: List[Dict]) -> ImageIndex:
+        """由BK树找出全体作业间的近重复截图"""
+        return ImageIndex(
+            [[image['hash'] for image in content.get('images', [])] for content in contents],
+            IMAGE_CONFIG['hamming_threshold']
         )
+
+    def shared_screenshots(self, image_index: ImageIndex, contents: List[Dict],
+                           i: int, j: int) -> List[Dict[str, Any]]:
+        """两份作业之间的近重复截图（用于报告）"""
+        return [
+            {
+                'image1': contents[i]['images'][local1]['name'],
+                'image2': contents[j]['images'][local2]['name'],
+                'distance': distance
+            }
+            for local1, local2, distance in image_index.pair_matches(i, j)
+        ]
+
+    def calculate_overall_similarity(self, content1: Dict, content2: Dict, weights: Dict = None,
+                                     precomputed: Dict[str, float] = None,
+                                     threshold: float = None) -> Optional[Dict[str, float]]:
+        """计算综合相似度（precomputed中已有的维度直接使用，不再重复计算）
+
+        给定threshold时按PRUNING_CONFIG的级联顺序由低代价维度开始计算，未算维度按1计入，
+        在算完全部维度之前综合相似度的最大可能值已低于threshold时不再计算剩余维度，返回None。
+        """
+        if weights is None:
+            weights = SIMILARITY_WEIGHTS
+        
+        precomputed = precomputed or {}
+        calculators = {
+            # 文本相似度
+            'text': lambda: float(self.calculate_text_similarity(
+                content1['text_content'], content2['text_content']
+            )),
+            # 代码相似度
+            'code': lambda: self.calculate_code_similarity(
+                content1['code_blocks'], content2['code_blocks']
+            ),
+            # 命令相似度
+            'command': lambda: self.calculate_command_similarity(
+                content1['commands'], content2['commands']
+            ),
+            # 结构相似度
+            'structure': lambda: float(self.calculate_structure_similarity(
+                content1['structure'], content2['structure']
+            )),
+            # 截图相似度
+            'image': lambda: self.calculate_image_similarity(
+                content1.get('images', []), content2.get('images', [])
+            )
+        }
         
-        # 结构相似度
-        similarities['structure'] = self.calculate_structure_similarity(
-            content1['structure'], content2['structure']
-        )
+        computed = {dim: float(value) for dim, value in precomputed.items() if dim in calculators}
+        levels = cascade_levels(calculators, PRUNING_CONFIG['levels']) if threshold is not None else [list(calculators)]
+        for index, level in enumerate(levels):
+            for dim in level:
+                if dim not in computed:
+                    computed[dim] = calculators[dim]()
+            if threshold is not None and index < len(levels) - 1:
+                bound = sum(computed.get(key, 1.0) * weights[key] for key in weights.keys())
+                if bound < threshold - BOUND_TOLERANCE:
+                    return None
+        
+        similarities = {dim: computed[dim] for dim in calculators}
         
         # 计算加权总分
-        similarities['overall'] = sum(
+        similarities['overall'] = float(sum(
             similarities[key] * weights[key] 
             for key in weights.keys()
-        )
+        ))
         
         return similarities
 
-    def check_similarity_batch(self, homework_type: str = "H3", threshold: float = 0.7) -> Dict:
-        """批量检查相似度"""
-        self.logger.info(f"开始批量检查 {homework_type} 作业相似度...")
+    def find_sentence_overlap(self, students: List[str], contents: List[Dict]) -> List[Dict[str, Any]]:
+        """统计每个学生在其他作业中存在近重复的句子数（每份作业的句子SimHash只计算一次）"""
+        for content in contents:
+            if 'sentence_hashes' not in content:
+                sentences = split_sentences(content['text_content'], SENTENCE_CONFIG['min_sentence_chars'])
+                content['sentence_hashes'] = [simhash(sentence) for sentence in sentences]
+        
+        overlap = sentence_overlap(
+            [content['sentence_hashes'] for content in contents],
+            SENTENCE_CONFIG['hamming_threshold'], SENTENCE_CONFIG['index_blocks'],
+            SENTENCE_CONFIG['max_share']
+        )
+        report = []
+        for student, item in zip(students, overlap):
+            if not item['near_duplicates']:
+                continue
+            sources = sorted(item['sources'].items(), key=lambda source: source[1], reverse=True)
+            report.append({
+                'student': student,
+                'sentences': item['sentences'],
+                'near_duplicate_sentences': item['near_duplicates'],
+                'ratio': item['near_duplicates'] / item['sentences'],
+                'sources': [
+                    {'student': students[other], 'sentences': count}
+                    for other, count in sources[:SENTENCE_CONFIG['top_sources']]
+                ]
+            })
+        report.sort(key=lambda item: item['near_duplicate_sentences'], reverse=True)
+        self.logger.info(f"句子级近重复检测完成: {len(report)} 名学生存在与他人近重复的句子")
+        return report
+
+    def align_suspicious_pairs(self, pairs: List[Dict], homework_contents: Dict[str, Dict]):
+        """为疑似抄袭的作业对找出共同段落，写入pair['shared_passages']（偏移为Markdown原文中的字符位置）"""
+        normalized = {}
+        
+        def normalize(student):
+            if student not in normalized:
+                normalized[student] = normalize_with_offsets(homework_contents[student]['raw_content'])
+            return normalized[student]
+        
+        # 按学生1分组，每个学生的后缀自动机只构建一次，且同时只保留一个
+        by_student = {}
+        for pair in pairs:
+            by_student.setdefault(pair['student1'], []).append(pair)
+        for student1, student_pairs in by_student.items():
+            text1, offsets1 = normalize(student1)
+            automaton = SuffixAutomaton(text1)
+            raw1 = homework_contents[student1]['raw_content']
+            for pair in student_pairs:
+                text2, offsets2 = normalize(pair['student2'])
+                passages = shared_passages(
+                    automaton, text1, offsets1, text2, offsets2,
+                    ALIGNMENT_CONFIG['min_passage_length'], ALIGNMENT_CONFIG['max_passages']
+                )
+                for passage in passages:
+                    start, end = passage['offset1']
+                    passage['text'] = raw1[start:min(end, start + ALIGNMENT_CONFIG['excerpt_chars'])]
+                pair['shared_passages'] = passages
+        self.logger.info(f"共同段落对齐完成: {len(pairs)} 对疑似作业")
+
+    def resolve_candidate_mode(self, n: int, mode: str = None) -> str:
+        """确定候选模式（auto按学生数选择exact或lsh）"""
+        mode = mode or CANDIDATE_CONFIG['mode']
+        if mode == 'auto':
+            mode = 'exact' if n <= CANDIDATE_CONFIG['exact_max_students'] else 'lsh'
+        return mode
+
+    def select_candidate_pairs(self, contents: List[str], mode: str = None,
+                               recall: float = None) -> List[Tuple[int, int]]:
+        """选择需要完整比较的作业对（全量或MinHash/LSH候选）"""
+        recall = recall if recall is not None else CANDIDATE_CONFIG['recall']
+        n = len(contents)
+        
+        mode = self.resolve_candidate_mode(n, mode)
+        if mode == 'exact':
+            return list(all_pairs(n))
+        if mode != 'lsh':
+            raise ValueError(f"未知的候选模式: {mode}")
+        
+        candidates = generate_candidate_pairs(
+            contents,
+            num_perm=CANDIDATE_CONFIG['num_perm'],
+            shingle_size=CANDIDATE_CONFIG['shingle_size'],
+            threshold=CANDIDATE_CONFIG['jaccard_threshold'],
+            recall=recall,
+            seed=CANDIDATE_CONFIG['seed']
+        )
+        self.logger.info(f"LSH候选对: {len(candidates)}/{n * (n - 1) // 2} (召回率目标 {recall})")
+        return candidates
+
+    def build_dimensions(self, contents: List[Dict], segmented_texts: List[str],
+                         code_index: FingerprintIndex, image_index: ImageIndex) -> Dict[str, Any]:
+        """为整个批次构建一次各相似度维度，之后按分块批量取值"""
+        builders = {
+            'text': lambda: CosineDimension(self.vectorize_texts(segmented_texts)),
+            'code': lambda: MatrixDimension(code_index.similarity_matrix()),
+            'command': lambda: JaccardDimension(
+                [normalize_command_set(content['commands']) for content in contents]
+            ),
+            'structure': lambda: StructureDimension([content['structure'] for content in contents]),
+            'image': lambda: MatrixDimension(image_index.similarity_matrix())
+        }
+        dimensions = {}
+        for dim, build in builders.items():
+            with self.metrics.dimension(dim, 'build'):
+                dimensions[dim] = build()
+        return dimensions
+
+    def batch_dimensions(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        """整个批次一次性构建各维度（文本TF-IDF、代码指纹、命令集合、文档结构、截图），只在首次需要时构建"""
+        if batch['dimensions'] is None:
+            contents = [batch['homework_contents'][student] for student in batch['students']]
+            with self.metrics.stage('dimensions'):
+                batch['dimensions'] = self.build_dimensions(
+                    contents, [content['segmented_text'] for content in contents],
+                    batch['code_index'], batch['image_index']
+                )
+        return batch['dimensions']
+
+    def pruning_levels(self, dimensions: Dict[str, Any]) -> List[List[str]]:
+        """上界剪枝级联的各级维度（按代价由低到高）"""
+        return cascade_levels(dimensions, PRUNING_CONFIG['levels'])
+
+    def check_pruning_threshold(self, dimensions: Dict[str, Any], threshold: float):
+        """阈值低到各级都不可能剪枝时给出提示（此时剪枝只增加开销）"""
+        levels = self.pruning_levels(dimensions)
+        remaining = remaining_weights(levels, SIMILARITY_WEIGHTS)
+        effective = [level for level, floor in zip(levels, remaining) if threshold > floor]
+        if not effective:
+            self.logger.warning(
+                f"阈值 {threshold} 不高于任何一级剪枝后剩余维度的权重和 "
+                f"({', '.join(f'{weight:g}' for weight in remaining)})，上界剪枝几乎不会剪去作业对"
+            )
+        elif len(effective) < len(remaining):
+            self.logger.info(
+                f"阈值 {threshold} 下只有 {', '.join('+'.join(level) for level in effective)} 之后可能剪枝"
+            )
+
+    @contextmanager
+    def scoring_pool(self, dimensions: Dict[str, Any], max_workers: int = None):
+        """为一次运行创建评分进程池，全部维度只向每个工作进程传递一次；max_workers不大于1或无需计算时产出None
+
+        同一运行中的多次iter_pair_scores（候选对评分、批次维度重算、各分片块）共用这个进程池，
+        各次调用使用的维度须为dimensions的子集。
+        """
+        max_workers = max_workers or BATCH_CONFIG['max_workers']
+        if max_workers <= 1 or not dimensions:
+            yield None
+            return
+        self.logger.info(f"使用 {max_workers} 个进程并行比较")
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_scoring_worker,
+            initargs=(dimensions,)
+        ) as executor:
+            yield executor
+
+    def iter_pair_scores(self, dimensions: Dict[str, Any], pairs: List[Tuple[int, int]],
+                         max_workers: int = None, weights: Dict[str, float] = None,
+                         threshold: float = None, executor: ProcessPoolExecutor = None,
+                         progress: ProgressLog = None):
+        """按分块计算作业对相似度，逐块产出 (作业对, 得分)；多进程并行时仍按输入顺序产出
+
+        threshold不为None时先计算低代价维度，综合相似度上界低于threshold的作业对
+        不再计算高代价维度，也不出现在产出中；各级剪枝数计入self.metrics。
+        executor为scoring_pool创建的进程池时在其中计算，否则按max_workers临时创建；
+        progress为跨多次调用共用的进度日志，未给出时按本次的作业对数记录进度。
+        """
+        weights = weights or SIMILARITY_WEIGHTS
+        max_workers = max_workers or BATCH_CONFIG['max_workers']
+        batch_size = max(1, BATCH_CONFIG['batch_size'])
+        blocks = [pairs[k:k + batch_size] for k in range(0, len(pairs), batch_size)]
+        levels = self.pruning_levels(dimensions) if threshold is not None else None
+        names = list(dimensions)
+        if progress is None:
+            progress = ProgressLog(self.logger, '比较进度', len(pairs), BATCH_CONFIG['progress_step'])
+        
+        def record(block, positions, pruned, timings):
+            for dim, (wall, cpu) in timings.items():
+                self.metrics.add_dimension_time(dim, 'score', wall, cpu)
+            for level, count in zip(levels or [], pruned):
+                self.metrics.count(f"pairs_pruned.{'+'.join(level)}", count)
+            if len(positions) == len(block):
+                return block
+            return [block[position] for position in positions]
+        
+        if len(blocks) <= 1 or (executor is None and max_workers <= 1):
+            for block_index, block in enumerate(blocks, 1):
+                positions, scores, pruned, timings = _score_block(dimensions, weights, block, threshold, levels)
+                kept = record(block, positions, pruned, timings)
+                progress.advance(len(block), f"(分块 {block_index}/{len(blocks)})")
+                yield kept, scores
+            return
+        
+        if executor is None:
+            with self.scoring_pool(dimensions, max_workers) as executor:
+                yield from self.iter_pair_scores(dimensions, pairs, max_workers, weights, threshold,
+                                                 executor, progress)
+            return
+        
+        futures = [executor.submit(_score_pair_block, block, names, weights, threshold, levels)
+                   for block in blocks]
+        for block_index, (block, future) in enumerate(zip(blocks, futures), 1):
+            try:
+                positions, scores, pruned, timings = future.result(timeout=BATCH_CONFIG['timeout'])
+            except Exception as e:
+                self.logger.error(f"分块 {block_index} 计算失败: {e}")
+                for pending in futures:
+                    pending.cancel()
+                raise
+            kept = record(block, positions, pruned, timings)
+            progress.advance(len(block), f"(分块 {block_index}/{len(blocks)})")
+            yield kept, scores
+
+    def score_pairs(self, dimensions: Dict[str, Any], pairs: List[Tuple[int, int]],
+                    max_workers: int = None, weights: Dict[str, float] = None) -> List[Dict[str, float]]:
+        """计算全部作业对的相似度（按输入顺序返回）"""
+        return [
+            score
+            for _, scores in self.iter_pair_scores(dimensions, pairs, max_workers, weights)
+            for score in scores
+        ]
+
+    def prepare_features(self, homework_type: str = "H3", candidate_mode: str = None, recall: float = None,
+                         store: FeatureStore = None, materialize_exact: bool = True) -> Optional[Dict[str, Any]]:
+        """提取全部作业的特征，构建各相似度维度并选出候选对（批量检查与分片快照共用）
+
+        store不为None时内容未变化的作业直接复用已存特征；
+        materialize_exact为False且为全量比较时不生成作业对列表（candidate_pairs为None）。
+        返回批次状态字典，作业数量不足时返回None。
+        """
+        metrics = self.metrics
         
         # 提取作业文件
-        homework_files = self.extract_homework_files(homework_type)
+        with metrics.stage('discovery'):
+            homework_files = self.extract_homework_files(homework_type)
+        metrics.set_count('submissions', len(homework_files))
         if len(homework_files) < 2:
             self.logger.warning("作业文件数量不足，无法进行相似度检查")
-            return {}
+            return None
         
-        # 提取内容
+        # 提取内容（增量模式下内容未变化的作业直接复用已存特征）
         homework_contents = {}
-        for student, files in homework_files.items():
-            content = self.extract_content(files['md_file'])
-            if content:
-                homework_contents[student] = content
-                self.logger.info(f"已提取 {student} 的作业内容")
+        content_hashes = {}
+        changed_students = set()
+        # 文件在线程池中预取，主线程提取特征时后续文件的读取同时进行；每个文件只读取一次
+        students = list(homework_files.keys())
+        with metrics.stage('extraction'):
+            file_stream = iter_file_bytes(
+                [homework_files[student]['md_file'] for student in students], BATCH_CONFIG['io_workers']
+            )
+            for student, (file_path, data) in zip(students, file_stream):
+                if data is None:
+                    changed_students.add(student)
+                    metrics.count('unreadable_files')
+                    continue
+                content = None
+                content_hashes[student] = content_hash(data)
+                if store is not None:
+                    content = store.lookup(student, content_hashes[student])
+                    metrics.count('feature_store_hits' if content is not None else 'feature_store_misses')
+                if content is None:
+                    content = self.parse_content(data, file_path)
+                    changed_students.add(student)
+                    if content:
+                        self.logger.info(f"已提取 {student} 的作业内容")
+                if content:
+                    homework_contents[student] = content
+        # 截图感知哈希（按图片内容缓存；截图有变化的作业同样视为已修改）
+        with metrics.stage('image_hashing'):
+            self.hash_images(homework_files, homework_contents, changed_students)
+        metrics.set_count('image_hash_cache_hits', self.image_hash_cache.hits)
+        metrics.set_count('image_hash_cache_misses', self.image_hash_cache.misses)
+        
+        if store is not None:
+            self.logger.info(
+                f"增量索引: 复用 {len(homework_contents) - len(changed_students & set(homework_contents))} 份，"
+                f"新增或修改 {len(changed_students)} 份"
+            )
         
-        # 两两比较
-        results = {
-            'comparisons': [],
-            'high_similarity_pairs': [],
-            'statistics': {},
-            'timestamp': datetime.now().isoformat()
+        students = list(homework_contents.keys())
+        metrics.set_count('students', len(students))
+        
+        # 每份作业只分词一次（命中磁盘缓存或增量索引的直接复用）
+        with metrics.stage('segmentation'):
+            unsegmented = [student for student in students
+                           if 'segmented_text' not in homework_contents[student]]
+            new_segments = self.segment_cache.segment_many(
+                [homework_contents[student]['text_content'] for student in unsegmented]
+            )
+            for student, segmented in zip(unsegmented, new_segments):
+                homework_contents[student]['segmented_text'] = segmented
+        self.logger.info(
+            f"分词完成: 缓存命中 {self.segment_cache.hits}，新分词 {self.segment_cache.misses}"
+        )
+        metrics.set_count('segment_cache_hits', self.segment_cache.hits)
+        metrics.set_count('segment_cache_misses', self.segment_cache.misses)
+        
+        # 每份作业计算一次代码指纹，由倒排索引得到两两代码相似度
+        content_list = [homework_contents[student] for student in students]
+        with metrics.stage('code_index'):
+            code_index = self.build_code_index(content_list)
+        
+        # 截图近重复索引（BK树检索，覆盖全部作业对，不受候选对筛选影响）
+        with metrics.stage('image_index'):
+            image_index = self.build_image_index(content_list)
+        
+        total_pairs = len(students) * (len(students) - 1) // 2
+        
+        # 候选对生成（小批次全量比较，大批次只比较LSH候选对）
+        candidate_pairs = None
+        with metrics.stage('candidates'):
+            if materialize_exact or self.resolve_candidate_mode(len(students), candidate_mode) != 'exact':
+                candidate_pairs = self.select_candidate_pairs(
+                    [homework_contents[student]['raw_content'] for student in students],
+                    mode=candidate_mode, recall=recall
+                )
+        candidate_count = total_pairs if candidate_pairs is None else len(candidate_pairs)
+        metrics.set_count('total_pairs', total_pairs)
+        metrics.set_count('candidate_pairs', candidate_count)
+        metrics.set_count('pairs_pruned_candidates', total_pairs - candidate_count)
+        
+        return {
+            'homework_type': homework_type,
+            'students': students,
+            'homework_contents': homework_contents,
+            'content_hashes': content_hashes,
+            'changed_students': changed_students,
+            'code_index': code_index,
+            'image_index': image_index,
+            'dimensions': None,
+            'candidate_pairs': candidate_pairs,
+            'candidate_count': candidate_count,
+            'total_pairs': total_pairs
         }
+
+    def check_similarity_batch(self, homework_type: str = "H3", threshold: float = 0.7,
+                               candidate_mode: str = None, recall: float = None,
+                               max_workers: int = None, incremental: bool = False,
+                               archive_dir: str = None, comparisons_file: str = None,
+                               prune: bool = None, shard: ShardSpec = None,
+                               snapshot_dir: str = None) -> Dict:
+        """批量检查相似度
+
+        incremental为True时只提取和比较新增或修改的作业；
+        comparisons_file指定时每一对的比较结果按行写入该文件；
+        prune为True（默认取PRUNING_CONFIG）时综合相似度上界低于阈值的作业对不再完整计算，也不写出；
+        shard指定时只计算作业对矩阵中属于该分片的块（见check_similarity_shard），之后由merge_shards合并。
+        各阶段耗时与计数记录在self.metrics中（见save_metrics）。
+        """
+        if shard is not None:
+            return self.check_similarity_shard(
+                homework_type, shard, snapshot_dir or SHARD_CONFIG['snapshot_dir'], threshold,
+                candidate_mode=candidate_mode, recall=recall, max_workers=max_workers, prune=prune
+            )
         
-        students = list(homework_contents.keys())
-        total_comparisons = len(students) * (len(students) - 1) // 2
-        current_comparison = 0
+        self.logger.info(f"开始批量检查 {homework_type} 作业相似度...")
+        metrics = self.metrics = RunMetrics()
+        
+        # 增量模式下加载已有索引
+        store = None
+        if incremental:
+            with metrics.stage('index_load'):
+                store = FeatureStore(INCREMENTAL_CONFIG['index_dir'], homework_type).load(
+                    SIMILARITY_WEIGHTS, self.feature_settings()
+                )
         
-        for i in range(len(students)):
-            for j in range(i + 1, len(students)):
-                current_comparison += 1
-                student1, student2 = students[i], students[j]
-                
-                self.logger.info(f"比较进度: {current_comparison}/{total_comparisons} - {student1} vs {student2}")
-                
-                similarities = self.calculate_overall_similarity(
-                    homework_contents[student1], 
-                    homework_contents[student2]
+        batch = self.prepare_features(homework_type, candidate_mode, recall, store)
+        if batch is None:
+            return {}
+        students = batch['students']
+        homework_contents = batch['homework_contents']
+        changed_students = batch['changed_students']
+        
+        # 增量模式下两份作业都未变化的作业对直接复用已存得分
+        reused_pairs, reused_scores, pending_pairs = [], [], []
+        for i, j in batch['candidate_pairs']:
+            score = None
+            if store is not None and students[i] not in changed_students and students[j] not in changed_students:
+                score = store.pair(students[i], students[j])
+            if score is None:
+                pending_pairs.append((i, j))
+            else:
+                reused_pairs.append((i, j))
+                reused_scores.append(score)
+        if store is not None:
+            self.logger.info(f"复用 {len(reused_pairs)} 对已有得分，重新计算 {len(pending_pairs)} 对")
+        metrics.set_count('pairs_reused', len(reused_pairs))
+        metrics.set_count('pairs_scored', 0)
+        
+        # 批次成员相对已存得分所依据批次的变化超过容差时，复用得分中依赖整个批次的维度
+        # （文本IDF、代码指纹文档频率）须按新批次重新计算；不超过时沿用，并保留原依据批次以免偏差逐次累积
+        cohort = {student: batch['content_hashes'][student] for student in students}
+        rescore_cohort = False
+        if reused_pairs:
+            drift = store.cohort_drift(cohort)
+            tolerance = INCREMENTAL_CONFIG['cohort_drift_tolerance']
+            rescore_cohort = drift > tolerance
+            if drift and not rescore_cohort:
+                cohort = store.cohort
+                self.logger.info(
+                    f"批次成员变化比例 {drift:.3f} 不超过容差 {tolerance}，"
+                    f"沿用已存的 {'、'.join(COHORT_DIMENSIONS)} 相似度"
                 )
-                
-                comparison_result = {
-                    'student1': student1,
-                    'student2': student2,
-                    'similarities': similarities,
-                    'is_suspicious': similarities['overall'] >= threshold
-                }
-                
-                results['comparisons'].append(comparison_result)
-                
-                if similarities['overall'] >= threshold:
-                    results['high_similarity_pairs'].append(comparison_result)
-                    self.logger.warning(
-                        f"发现高相似度: {student1} vs {student2} = {similarities['overall']:.3f}"
+        
+        if prune is None:
+            prune = PRUNING_CONFIG['enabled']
+        # 只有需要计算的作业对时才构建整个批次的维度（全部得分可复用时省去）
+        dimensions = None
+        if pending_pairs or rescore_cohort or prune:
+            dimensions = self.batch_dimensions(batch)
+        if prune:
+            self.check_pruning_threshold(dimensions, threshold)
+        
+        # 两两比较，边计算边输出：全部比较结果流式写入comparisons_file，内存中只保留疑似对、前k名和统计累加器
+        stream = ComparisonStream(threshold, comparisons_file, REPORT_CONFIG['top_k_comparisons'])
+        stored_pairs = []
+        stored_scores = {dim: array('d') for dim in PAIR_DIMENSIONS}
+        score_archive = ScoreArchiveWriter() if SCORE_ARCHIVE_CONFIG['enabled'] else None
+        
+        def collect(block_pairs, block_scores):
+            self._collect_scores(stream, students, block_pairs, block_scores)
+            if score_archive is not None:
+                score_archive.add(block_pairs, block_scores)
+            if store is not None:
+                for (i, j), similarities in zip(block_pairs, block_scores):
+                    stored_pairs.append((i, j))
+                    for dim in PAIR_DIMENSIONS:
+                        stored_scores[dim].append(similarities[dim])
+        
+        # 批次维度重算与候选对评分共用一个进程池
+        try:
+            with self.scoring_pool(dimensions, max_workers) as executor:
+                if rescore_cohort:
+                    with metrics.stage('cohort_rescoring'):
+                        reused_scores = self.refresh_cohort_scores(
+                            dimensions, reused_pairs, reused_scores, max_workers, executor
+                        )
+                    metrics.set_count('pairs_cohort_rescored', len(reused_pairs))
+                    self.logger.info(
+                        f"批次成员有变化，{len(reused_pairs)} 对复用得分的 "
+                        f"{'、'.join(COHORT_DIMENSIONS)} 相似度已按新批次重新计算"
                     )
+                with metrics.stage('scoring'):
+                    collect(reused_pairs, reused_scores)
+                    for block_pairs, block_scores in (self.iter_pair_scores(
+                        dimensions, pending_pairs, max_workers=max_workers,
+                        threshold=threshold if prune else None, executor=executor
+                    ) if pending_pairs else []):
+                        metrics.count('pairs_scored', len(block_pairs))
+                        collect(block_pairs, block_scores)
+        finally:
+            stream.close()
+        
+        if store is not None:
+            with metrics.stage('index_save'):
+                store.save(
+                    {student: {'hash': batch['content_hashes'][student], 'content': homework_contents[student]}
+                     for student in students},
+                    students, stored_pairs,
+                    {dim: np.frombuffer(values, dtype=np.float64) for dim, values in stored_scores.items()},
+                    SIMILARITY_WEIGHTS, self.feature_settings(), cohort
+                )
         
-        # 统计信息
-        all_similarities = [comp['similarities']['overall'] for comp in results['comparisons']]
-        results['statistics'] = {
-            'total_comparisons': total_comparisons,
-            'high_similarity_count': len(results['high_similarity_pairs']),
-            'avg_similarity': np.mean(all_similarities),
-            'max_similarity': np.max(all_similarities),
-            'min_similarity': np.min(all_similarities),
-            'std_similarity': np.std(all_similarities)
-        }
+        results = self.finalize_results(batch, stream, threshold, prune, comparisons_file, archive_dir,
+                                        reused=len(reused_pairs))
+        if score_archive is not None:
+            self.save_score_archive(homework_type, score_archive.to_archive(students, {}), results, prune)
+        return results
+
+    def save_score_archive(self, homework_type: str, archive: ScoreArchive, results: Dict, prune: bool):
+        """保存本次运行的作业对维度得分及运行参数，供rescore_results调整权重或阈值时使用"""
+        archive.meta.update({
+            'homework_type': homework_type,
+            'weights': dict(SIMILARITY_WEIGHTS),
+            'threshold': results['threshold'],
+            'prune': prune,
+            'total_pairs': results['statistics']['total_pairs'],
+            'pruning': results['statistics']['pruning'],
+            'timestamp': results['timestamp']
+        })
+        with self.metrics.stage('score_archive'):
+            archive.save(ScoreArchive.directory(SCORE_ARCHIVE_CONFIG['archive_dir'], homework_type))
+        self.score_archive = archive
+
+    def rescore_results(self, homework_type: str, weights: Dict[str, float], threshold: float,
+                        thresholds: List[float] = None, archive: ScoreArchive = None,
+                        overall: np.ndarray = None) -> Dict:
+        """按新的权重与阈值从作业对得分存档重新计算综合相似度、疑似对与统计信息（不重新计算各维度）
+
+        thresholds指定时在结果中附加各阈值下疑似对数量的对照表；
+        重新得到的疑似对不含匹配代码、共享截图和共同段落（这些需要作业特征）。
+        """
+        self.metrics = RunMetrics()
+        if archive is None:
+            with self.metrics.stage('score_archive_load'):
+                archive = ScoreArchive.load(ScoreArchive.directory(SCORE_ARCHIVE_CONFIG['archive_dir'], homework_type))
+        self.score_archive = archive
+        meta = archive.meta
+        if meta.get('prune') and (weights != meta['weights'] or threshold < meta['threshold']):
+            # 剪枝时被剪去的作业对（原权重下上界低于原阈值）没有存档，换权重或降低阈值后可能成为疑似对
+            self.logger.warning(
+                "得分存档由剪枝模式生成，被剪去的作业对未存档，新权重或更低阈值下的疑似对可能不完整；"
+                "需要完整结果时请用 --no-prune 重新运行批量检查"
+            )
+        with self.metrics.stage('rescore'):
+            if overall is None:
+                overall = archive.overall(weights)
+            results = rescore(archive, weights, threshold, REPORT_CONFIG['top_k_comparisons'], overall)
+        self.metrics.set_count('pairs_rescored', len(archive))
+        self.metrics.set_count('suspicious_pairs', results['statistics']['high_similarity_count'])
+        if meta.get('pruning'):
+            results['statistics']['pruning'] = meta['pruning']
+        if thresholds:
+            results['statistics']['threshold_sweep'] = threshold_sweep(overall, thresholds)
+        results.update({
+            'comparisons_file': None,
+            'timestamp': datetime.now().isoformat(),
+            'threshold': threshold,
+            'weights': weights,
+            'rescored_from': meta.get('timestamp')
+        })
+        self.logger.info(
+            f"重新加权完成: {len(archive)} 对，阈值 {threshold} 下疑似抄袭 {len(results['high_similarity_pairs'])} 对"
+        )
+        self.similarity_results = results
+        return results
+
+    def refresh_cohort_scores(self, dimensions: Dict[str, Any], pairs: List[Tuple[int, int]],
+                              scores: List[Dict[str, float]], max_workers: int = None,
+                              executor: ProcessPoolExecutor = None) -> List[Dict[str, float]]:
+        """重新计算已存得分中依赖整个批次的维度，其余维度沿用已存值，并按权重重算综合相似度"""
+        cohort_dimensions = {dim: dimensions[dim] for dim in COHORT_DIMENSIONS}
+        cohort_weights = {dim: SIMILARITY_WEIGHTS[dim] for dim in COHORT_DIMENSIONS}
+        progress = ProgressLog(self.logger, '批次维度重算进度', len(pairs), BATCH_CONFIG['progress_step'])
+        refreshed = []
+        stored = iter(scores)
+        for _, block_scores in self.iter_pair_scores(cohort_dimensions, pairs, max_workers=max_workers,
+                                                     weights=cohort_weights, executor=executor,
+                                                     progress=progress):
+            for values in block_scores:
+                score = dict(next(stored))
+                for dim in COHORT_DIMENSIONS:
+                    score[dim] = values[dim]
+                # 与评分时相同的累加顺序
+                overall = 0.0
+                for dim, weight in SIMILARITY_WEIGHTS.items():
+                    overall += score[dim] * weight
+                score['overall'] = overall
+                refreshed.append(score)
+        return refreshed
+
+    def feature_settings(self) -> str:
+        """影响已提取特征（分词、代码指纹、句子哈希、截图哈希等）的配置的哈希，用作增量索引的键"""
+        runtime_keys = {'segment_workers', 'segment_cache_dir', 'hash_workers', 'cache_dir'}
+        return settings_hash({
+            name: {key: value for key, value in config.items() if key not in runtime_keys}
+            for name, config in [('text', TEXT_CONFIG), ('code', CODE_CONFIG),
+                                 ('sentence', SENTENCE_CONFIG), ('image', IMAGE_CONFIG)]
+        })
+
+    def _collect_scores(self, stream: ComparisonStream, students: List[str],
+                        block_pairs: List[Tuple[int, int]], block_scores: List[Dict[str, float]]):
+        """把一个分块的得分写入结果流"""
+        for (i, j), similarities in zip(block_pairs, block_scores):
+            comparison_result = stream.add(students[i], students[j], similarities)
+            if comparison_result['is_suspicious']:
+                self.logger.warning(
+                    f"发现高相似度: {students[i]} vs {students[j]} = {similarities['overall']:.3f}"
+                )
+
+    def finalize_results(self, batch: Dict[str, Any], stream: ComparisonStream, threshold: float, prune: bool,
+                         comparisons_file: str = None, archive_dir: str = None, reused: int = 0) -> Dict:
+        """由全部得分的结果流生成最终结果：疑似对的匹配代码、共享截图与共同段落，句子级近重复和统计信息"""
+        metrics = self.metrics
+        students = batch['students']
+        homework_contents = batch['homework_contents']
+        content_list = [homework_contents[student] for student in students]
+        code_index, image_index = batch['code_index'], batch['image_index']
+        position = {student: k for k, student in enumerate(students)}
+        
+        metrics.set_count('suspicious_pairs', len(stream.suspicious))
+        for pair in stream.suspicious:
+            i, j = position[pair['student1']], position[pair['student2']]
+            pair['matched_code'] = self.matched_code_snippets(code_index, content_list, i, j)
+            pair['shared_images'] = self.shared_screenshots(image_index, content_list, i, j)
+        
+        # 只对疑似抄袭的作业对做段落对齐
+        with metrics.stage('alignment'):
+            self.align_suspicious_pairs(stream.suspicious, homework_contents)
         
+        results = {
+            'high_similarity_pairs': stream.suspicious,
+            'top_comparisons': stream.top.items(),
+            'comparisons_file': comparisons_file,
+            'statistics': {},
+            'timestamp': datetime.now().isoformat(),
+            'threshold': threshold,
+            'score_histograms': stream.histogram_counts()
+        }
+        with metrics.stage('sentences'):
+            results['sentence_overlap'] = self.find_sentence_overlap(students, content_list)
+        results['shared_image_pairs'] = [
+            {
+                'student1': students[i],
+                'student2': students[j],
+                'shared_images': self.shared_screenshots(image_index, content_list, i, j)
+            }
+            for i, j in sorted(image_index.shared, key=lambda pair: -len(image_index.shared[pair]))
+        ]
+        if results['shared_image_pairs']:
+            self.logger.warning(f"发现 {len(results['shared_image_pairs'])} 对作业存在近重复截图")
+        
+        # 与往届作业归档比对
+        if archive_dir:
+            with metrics.stage('archive'):
+                results['archive_matches'] = self.search_archive(archive_dir, batch['homework_type'], homework_contents)
+        
+        # 统计信息（由流式累加器得到）
+        total_pairs, candidate_count = batch['total_pairs'], batch['candidate_count']
+        results['statistics'] = {'total_pairs': total_pairs}
+        results['statistics'].update(stream.statistics())
+        results['statistics']['pruning'] = {
+            'candidate_pruned': total_pairs - candidate_count,
+            'levels': [
+                {'dimensions': level, 'pruned': metrics.counters.get(f"pairs_pruned.{'+'.join(level)}", 0)}
+                for level in (self.pruning_levels(batch['dimensions'])[:-1] if prune else [])
+            ],
+            'reused': reused,
+            'scored': metrics.counters.get('pairs_scored', 0)
+        }
+        cascade_pruned = sum(level['pruned'] for level in results['statistics']['pruning']['levels'])
+        metrics.set_count('pairs_pruned', total_pairs - candidate_count + cascade_pruned)
+        if prune:
+            self.logger.info(
+                f"上界剪枝: {cascade_pruned}/{candidate_count - reused} 对未完整计算 ("
+                + ', '.join(f"{'+'.join(level['dimensions'])}: {level['pruned']}"
+                            for level in results['statistics']['pruning']['levels'])
+                + ")"
+            )
+        
+        self.logger.info(f"批量检查完成，耗时最多的阶段: {metrics.summary()}")
         self.similarity_results = results
         return results
 
-    def generate_report(self, output_file: str = "similarity_report.html"):
-        """生成HTML报告"""
+    def submission_fingerprints(self, homework_type: str) -> Dict[str, str]:
+        """每名学生报告与截图文件内容的哈希，用于判断特征快照是否过期"""
+        homework_files = self.extract_homework_files(homework_type)
+        students = list(homework_files.keys())
+        paths = [[homework_files[student]['md_file']] + sorted(homework_files[student]['image_files'])
+                 for student in students]
+        file_stream = iter_file_bytes([path for student_paths in paths for path in student_paths],
+                                      BATCH_CONFIG['io_workers'])
+        fingerprints = {}
+        for student, student_paths in zip(students, paths):
+            digest = hashlib.sha1()
+            for path in student_paths:
+                _, data = next(file_stream)
+                digest.update(f"{path.name}\0{content_hash(data) if data is not None else ''}\n".encode('utf-8'))
+            fingerprints[student] = digest.hexdigest()
+        return fingerprints
+
+    def prepare_snapshot(self, homework_type: str, snapshot_dir: str, threshold: float,
+                         candidate_mode: str = None, recall: float = None,
+                         fingerprints: Dict[str, str] = None) -> Optional[Dict[str, Any]]:
+        """提取特征并把分片计算所需的全部状态保存为共享目录中的特征快照
+
+        快照中记录作业文件指纹与特征配置，之后的分片据此判断快照是否过期。
+        """
+        self.logger.info(f"生成 {homework_type} 特征快照: {snapshot_dir}")
+        if fingerprints is None:
+            fingerprints = self.submission_fingerprints(homework_type)
+        batch = self.prepare_features(homework_type, candidate_mode, recall, materialize_exact=False)
+        if batch is None:
+            return None
+        self.batch_dimensions(batch)
+        students = batch.pop('students')
+        batch.pop('changed_students')
+        candidate_pairs = batch.pop('candidate_pairs')
+        snapshot = dict(
+            batch,
+            students=students,
+            candidate_pairs=(np.asarray(candidate_pairs, dtype=np.int32).reshape(-1, 2)
+                             if candidate_pairs is not None else None),
+            threshold=threshold,
+            weights=dict(SIMILARITY_WEIGHTS),
+            fingerprints=fingerprints,
+            feature_settings=self.feature_settings(),
+            snapshot_id=snapshot_id(
+                students, [fingerprints[student] for student in students],
+                {'homework_type': homework_type, 'threshold': threshold, 'weights': SIMILARITY_WEIGHTS,
+                 'candidate_mode': candidate_mode, 'recall': recall,
+                 'feature_settings': self.feature_settings()}
+            )
+        )
+        with self.metrics.stage('snapshot_save'):
+            ShardWorkspace(snapshot_dir).save_snapshot(snapshot)
+        return snapshot
+
+    def load_snapshot(self, homework_type: str, snapshot_dir: str) -> Dict[str, Any]:
+        """读取特征快照并检查作业类型与相似度权重"""
+        with self.metrics.stage('snapshot_load'):
+            snapshot = ShardWorkspace(snapshot_dir).load_snapshot()
+        if snapshot['homework_type'] != homework_type:
+            raise ValueError(f"特征快照属于 {snapshot['homework_type']}，与指定的 {homework_type} 不符")
+        if snapshot['weights'] != SIMILARITY_WEIGHTS:
+            raise ValueError("特征快照的相似度权重与当前配置不符，请重新生成快照")
+        return snapshot
+
+    def shared_snapshot(self, homework_type: str, snapshot_dir: str, threshold: float,
+                        candidate_mode: str = None, recall: float = None) -> Optional[Dict[str, Any]]:
+        """取得与当前作业文件和特征配置一致的特征快照
+
+        快照不存在或已过期（作业新增、修改、删除或特征配置变化）时重新生成；
+        生成过程持有快照锁，同时启动的各分片只有一个生成快照，其余等待后直接读取。
+        """
+        workspace = ShardWorkspace(snapshot_dir)
+        with self.metrics.stage('snapshot_check'):
+            fingerprints = self.submission_fingerprints(homework_type)
+        settings = self.feature_settings()
+        
+        def current_snapshot() -> Optional[Dict[str, Any]]:
+            if not workspace.has_snapshot():
+                return None
+            snapshot = self.load_snapshot(homework_type, snapshot_dir)
+            if snapshot.get('fingerprints') != fingerprints or snapshot.get('feature_settings') != settings:
+                return None
+            return snapshot
+        
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            return snapshot
+        with workspace.snapshot_lock(SHARD_CONFIG['lock_timeout']):
+            # 等待锁期间其他分片可能已生成了最新的快照
+            snapshot = current_snapshot()
+            if snapshot is not None:
+                return snapshot
+            if workspace.has_snapshot():
+                self.logger.warning("作业文件或特征配置在快照生成后有变化，重新生成特征快照")
+            return self.prepare_snapshot(homework_type, snapshot_dir, threshold, candidate_mode, recall,
+                                         fingerprints)
+
+    def check_similarity_shard(self, homework_type: str, shard: ShardSpec, snapshot_dir: str,
+                               threshold: float = 0.7, candidate_mode: str = None, recall: float = None,
+                               max_workers: int = None, prune: bool = None) -> Dict:
+        """计算一个分片：从共享的特征快照（不存在或已过期时先生成）读取特征，只比较属于该分片的块
+
+        比较结果与流式统计写入快照目录的shards子目录，全部分片完成后由merge_shards合并。
+        """
+        self.logger.info(f"开始计算 {homework_type} 分片 {shard}...")
+        metrics = self.metrics = RunMetrics()
+        workspace = ShardWorkspace(snapshot_dir)
+        snapshot = self.shared_snapshot(homework_type, snapshot_dir, threshold, candidate_mode, recall)
+        if snapshot is None:
+            return {}
+        if snapshot['threshold'] != threshold:
+            self.logger.warning(f"使用特征快照中的阈值 {snapshot['threshold']}（指定的阈值 {threshold} 被忽略）")
+        threshold = snapshot['threshold']
+        if prune is None:
+            prune = PRUNING_CONFIG['enabled']
+        if prune:
+            self.check_pruning_threshold(snapshot['dimensions'], threshold)
+        
+        students = snapshot['students']
+        comparisons_file = workspace.comparisons_file(shard)
+        comparisons_file.parent.mkdir(parents=True, exist_ok=True)
+        stream = ComparisonStream(threshold, str(comparisons_file), REPORT_CONFIG['top_k_comparisons'])
+        score_archive = ScoreArchiveWriter() if SCORE_ARCHIVE_CONFIG['enabled'] else None
+        metrics.set_count('pairs_scored', 0)
+        # 各块共用一个进程池与一份进度日志
+        progress = ProgressLog(self.logger, f"分片 {shard} 比较进度",
+                               shard.pair_count(len(students), snapshot['candidate_pairs']),
+                               BATCH_CONFIG['progress_step'])
+        try:
+            with metrics.stage('scoring'), self.scoring_pool(snapshot['dimensions'], max_workers) as executor:
+                for tile in shard.tile_pairs(len(students), snapshot['candidate_pairs']):
+                    metrics.count('shard_pairs', len(tile))
+                    for block_pairs, block_scores in self.iter_pair_scores(
+                        snapshot['dimensions'], tile, max_workers=max_workers,
+                        threshold=threshold if prune else None, executor=executor, progress=progress
+                    ):
+                        metrics.count('pairs_scored', len(block_pairs))
+                        self._collect_scores(stream, students, block_pairs, block_scores)
+                        if score_archive is not None:
+                            score_archive.add(block_pairs, block_scores)
+        finally:
+            stream.close()
+        
+        if score_archive is not None:
+            score_archive.to_archive(students, {'snapshot_id': snapshot['snapshot_id']}).save(
+                workspace.scores_dir(shard)
+            )
+        workspace.save_shard(shard, {
+            'snapshot_id': snapshot['snapshot_id'],
+            'prune': prune,
+            'stream': stream,
+            'counters': dict(metrics.counters),
+            'metrics': metrics.to_dict()
+        })
+        self.logger.info(
+            f"分片 {shard} 完成: {metrics.counters.get('shard_pairs', 0)} 对作业，"
+            f"完整计算 {metrics.counters['pairs_scored']} 对，疑似抄袭 {len(stream.suspicious)} 对"
+        )
+        return {
+            'shard': str(shard),
+            'snapshot_dir': str(snapshot_dir),
+            'comparisons_file': str(comparisons_file),
+            'statistics': stream.statistics()
+        }
+
+    def merge_shards(self, homework_type: str, snapshot_dir: str = None, comparisons_file: str = None,
+                     archive_dir: str = None) -> Dict:
+        """合并全部分片的输出，得到与单机运行相同结构的结果（之后可照常生成报告、保存结果）"""
+        snapshot_dir = snapshot_dir or SHARD_CONFIG['snapshot_dir']
+        self.logger.info(f"合并 {homework_type} 分片结果: {snapshot_dir}")
+        metrics = self.metrics = RunMetrics()
+        workspace = ShardWorkspace(snapshot_dir)
+        snapshot = self.load_snapshot(homework_type, snapshot_dir)
+        shards = workspace.load_shards(snapshot['snapshot_id'])
+        prune_flags = {output['prune'] for _, output in shards}
+        if len(prune_flags) > 1:
+            raise RuntimeError("各分片的剪枝设置不一致，请用相同的设置重新计算")
+        
+        stream = ComparisonStream(snapshot['threshold'], comparisons_file, REPORT_CONFIG['top_k_comparisons'])
+        try:
+            with metrics.stage('merge'):
+                for shard, output in shards:
+                    stream.merge(output['stream'], str(workspace.comparisons_file(shard)) if comparisons_file else None)
+                    for name, value in output['counters'].items():
+                        if name == 'pairs_scored' or name.startswith('pairs_pruned.'):
+                            metrics.count(name, value)
+        finally:
+            stream.close()
+        metrics.set_count('shards', len(shards))
+        metrics.set_count('students', len(snapshot['students']))
+        metrics.set_count('total_pairs', snapshot['total_pairs'])
+        metrics.set_count('candidate_pairs', snapshot['candidate_count'])
+        metrics.set_count('pairs_pruned_candidates', snapshot['total_pairs'] - snapshot['candidate_count'])
+        
+        # 各分片的疑似对按单机运行时的作业对顺序排列
+        position = {student: k for k, student in enumerate(snapshot['students'])}
+        stream.suspicious.sort(key=lambda pair: (position[pair['student1']], position[pair['student2']]))
+        prune = prune_flags.pop()
+        results = self.finalize_results(snapshot, stream, snapshot['threshold'], prune,
+                                        comparisons_file, archive_dir)
+        
+        # 各分片的得分存档拼接为整个批次的存档（某个分片未存档时跳过）
+        if SCORE_ARCHIVE_CONFIG['enabled']:
+            if all((workspace.scores_dir(shard) / 'meta.json').exists() for shard, _ in shards):
+                score_archive = ScoreArchiveWriter()
+                for shard, _ in shards:
+                    score_archive.extend(ScoreArchive.load(workspace.scores_dir(shard)))
+                self.save_score_archive(homework_type, score_archive.to_archive(snapshot['students'], {}),
+                                        results, prune)
+            else:
+                self.logger.warning("部分分片没有得分存档，未生成整个批次的得分存档")
+        return results
+
+    def search_archive(self, archive_dir: str, homework_type: str,
+                       homework_contents: Dict[str, Dict]) -> List[Dict]:
+        """在往届作业归档中查找与本批次作业相似的同类型作业提交"""
+        archive = ArchiveIndex(archive_dir)
+        if not archive.exists():
+            self.logger.warning(f"归档索引不存在: {archive_dir}")
+            return []
+        archive.load()
+        
+        archive_matches = []
+        for student, content in homework_contents.items():
+            matches = archive.query(content['raw_content'], homework_type)
+            if matches:
+                archive_matches.append({'student': student, 'matches': matches})
+                best = matches[0]
+                self.logger.warning(
+                    f"发现与往届作业相似: {student} vs {best['term']}/{best['student']} "
+                    f"= {best['estimated_similarity']:.3f}"
+                )
+        self.logger.info(f"归档比对完成: {len(archive_matches)} 份作业与 {len(archive.documents)} 份往届作业存在相似")
+        return archive_matches
+
+    def generate_report(self, output_file: str = "similarity_report.html", paginated: bool = True,
+                        chunk_writer: Callable[[Path, int], Tuple[int, int]] = None):
+        """生成HTML报告
+
+        paginated为True时完整比较表写入报告旁的分块数据目录，由页面按页加载；
+        chunk_writer指定时由它写出分块（如直接由得分存档写出），否则读取比较结果文件。
+        """
         if not self.similarity_results:
             self.logger.error("没有相似度检查结果，请先运行check_similarity_batch")
             return
         
-        html_content = self._generate_html_report()
+        data_dir_name = None
+        comparisons_file = self.similarity_results.get('comparisons_file')
+        if chunk_writer is None and comparisons_file and os.path.exists(comparisons_file):
+            chunk_writer = lambda data_dir, chunk_size: write_report_chunks(
+                iter_comparisons(comparisons_file), data_dir, chunk_size, REPORT_CONFIG['sort_run_rows']
+            )
+        if paginated and chunk_writer is not None:
+            data_dir = Path(output_file).with_name(Path(output_file).stem + '_data')
+            chunk_count, total = chunk_writer(data_dir, REPORT_CONFIG['chunk_size'])
+            data_dir_name = data_dir.name
+            self.logger.info(f"完整比较表已分块写入: {data_dir} ({chunk_count} 个分块, {total} 行)")
+        
+        html_content = self._generate_html_report(data_dir_name)
         
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write(html_content)
         
         self.logger.info(f"报告已生成: {output_file}")
 
-    def _generate_html_report(self) -> str:
-        """生成HTML报告内容"""
+    def _generate_html_report(self, data_dir_name: str = None) -> str:
+        """生成HTML报告内容（只内联摘要、疑似对和前N对）"""
         results = self.similarity_results
         
         html = f"""
@@ -455,6 +1406,10 @@ class HomeworkSimilarityChecker:
         .high-sim {{ background-color: #ffebee; }}
         .medium-sim {{ background-color: #fff3e0; }}
         .low-sim {{ background-color: #e8f5e8; }}
+        .pager {{ margin: 10px 0; }}
+        .pager button, .pager input {{ margin-right: 8px; padding: 4px 8px; }}
+        #all-comparisons th {{ cursor: pointer; }}
+        .matched-code {{ background: #f6f8fa; padding: 8px; white-space: pre-wrap; word-break: break-all; }}
     </style>
 </head>
 <body>
@@ -473,6 +1428,39 @@ class HomeworkSimilarityChecker:
             <li>最低相似度: {results['statistics']['min_similarity']:.3f}</li>
             <li>相似度标准差: {results['statistics']['std_similarity']:.3f}</li>
         </ul>
+"""
+        pruning = results['statistics'].get('pruning')
+        if pruning:
+            html += f"""
+        <p>作业对总数 {results['statistics'].get('total_pairs', 0)}，候选筛选剪去 {pruning['candidate_pruned']} 对，
+        复用已有得分 {pruning['reused']} 对，完整计算 {pruning['scored']} 对。</p>
+"""
+            if pruning['levels']:
+                html += """
+        <p>上界剪枝（算完下列维度后综合相似度最大可能值已低于阈值的作业对不再计算后续维度，也不计入上述统计）:</p>
+        <ul>
+"""
+                for level in pruning['levels']:
+                    html += f"""            <li>{html_escape(' + '.join(level['dimensions']))}: 剪去 {level['pruned']} 对</li>
+"""
+                html += """        </ul>
+"""
+        if results.get('weights'):
+            html += f"""
+        <p>由作业对得分存档重新加权（原运行时间 {html_escape(str(results.get('rescored_from')))}），权重: {html_escape(', '.join(f'{dim}={weight:g}' for dim, weight in results['weights'].items()))}</p>
+"""
+        sweep = results['statistics'].get('threshold_sweep')
+        if sweep:
+            html += """
+        <table>
+            <tr><th>阈值</th><th>疑似对数</th><th>占比</th></tr>
+"""
+            for row in sweep:
+                html += f"""            <tr><td>{row['threshold']:.3f}</td><td>{row['suspicious']}</td><td>{row['fraction']:.2%}</td></tr>
+"""
+            html += """        </table>
+"""
+        html += """
     </div>
 """
         
@@ -485,20 +1473,107 @@ class HomeworkSimilarityChecker:
                 sim = pair['similarities']
                 html += f"""
     <div class="suspicious">
-        <h3>{pair['student1']} vs {pair['student2']}</h3>
+        <h3>{html_escape(pair['student1'])} vs {html_escape(pair['student2'])}</h3>
         <p><strong>综合相似度: {sim['overall']:.3f}</strong></p>
         <ul>
             <li>文本相似度: {sim['text']:.3f}</li>
             <li>代码相似度: {sim['code']:.3f}</li>
             <li>命令相似度: {sim['command']:.3f}</li>
             <li>结构相似度: {sim['structure']:.3f}</li>
+            <li>截图相似度: {sim['image']:.3f}</li>
         </ul>
+"""
+                for snippet in pair.get('matched_code', []):
+                    html += f"""
+        <pre class="matched-code">{html_escape(snippet['code'])}</pre>
+"""
+                for passage in pair.get('shared_passages', []):
+                    html += f"""
+        <p class="passage-offsets">共同段落: {html_escape(pair['student1'])} [{passage['offset1'][0]}, {passage['offset1'][1]}) ↔ {html_escape(pair['student2'])} [{passage['offset2'][0]}, {passage['offset2'][1]})</p>
+        <pre class="matched-code">{html_escape(passage['text'])}</pre>
+"""
+                html += """
     </div>
 """
         
-        # 详细比较表
-        html += """
-    <h2>详细比较结果</h2>
+        # 近重复截图
+        if results.get('shared_image_pairs'):
+            html += """
+    <h2>🖼️ 存在近重复截图的作业对</h2>
+"""
+            for item in results['shared_image_pairs']:
+                html += f"""
+    <div class="suspicious">
+        <h3>{html_escape(item['student1'])} vs {html_escape(item['student2'])}</h3>
+        <ul>
+"""
+                for image in item['shared_images']:
+                    html += f"""
+            <li>{html_escape(image['image1'])} ≈ {html_escape(image['image2'])}（汉明距离 {image['distance']}）</li>
+"""
+                html += """
+        </ul>
+    </div>
+"""
+        
+        # 句子级近重复
+        if results.get('sentence_overlap'):
+            html += """
+    <h2>📝 句子级近重复</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>学生</th>
+                <th>句子数</th>
+                <th>近重复句子数</th>
+                <th>比例</th>
+                <th>主要来源</th>
+            </tr>
+        </thead>
+        <tbody>
+"""
+            for item in results['sentence_overlap']:
+                sources = '，'.join(
+                    f"{html_escape(source['student'])} ({source['sentences']})" for source in item['sources']
+                )
+                html += f"""
+            <tr>
+                <td>{html_escape(item['student'])}</td>
+                <td>{item['sentences']}</td>
+                <td>{item['near_duplicate_sentences']}</td>
+                <td>{item['ratio']:.1%}</td>
+                <td>{sources}</td>
+            </tr>
+"""
+            html += """
+        </tbody>
+    </table>
+"""
+        
+        # 往届作业相似
+        if results.get('archive_matches'):
+            html += """
+    <h2>📚 与往届作业相似</h2>
+"""
+            for item in results['archive_matches']:
+                html += f"""
+    <div class="suspicious">
+        <h3>{html_escape(item['student'])}</h3>
+        <ul>
+"""
+                for match in item['matches']:
+                    html += f"""
+            <li>{html_escape(match['term'])} / {html_escape(match['student'])}: 估计相似度 {match['estimated_similarity']:.3f}</li>
+"""
+                html += """
+        </ul>
+    </div>
+"""
+        
+        # 详细比较表（只内联相似度最高的前N对）
+        top_comparisons = results['top_comparisons'][:REPORT_CONFIG['inline_top_n']]
+        html += f"""
+    <h2>详细比较结果（相似度最高的 {len(top_comparisons)} 对）</h2>
     <table>
         <thead>
             <tr>
@@ -509,33 +1584,28 @@ class HomeworkSimilarityChecker:
                 <th>代码</th>
                 <th>命令</th>
                 <th>结构</th>
+                <th>截图</th>
                 <th>状态</th>
             </tr>
         </thead>
         <tbody>
 """
         
-        # 按相似度排序
-        sorted_comparisons = sorted(
-            results['comparisons'], 
-            key=lambda x: x['similarities']['overall'], 
-            reverse=True
-        )
-        
-        for comp in sorted_comparisons:
+        for comp in top_comparisons:
             sim = comp['similarities']
             css_class = 'high-sim' if sim['overall'] >= 0.7 else 'medium-sim' if sim['overall'] >= 0.5 else 'low-sim'
             status = '🚨 疑似抄袭' if comp['is_suspicious'] else '✅ 正常' if sim['overall'] < 0.3 else '⚠️ 需关注'
             
             html += f"""
             <tr class="{css_class}">
-                <td>{comp['student1']}</td>
-                <td>{comp['student2']}</td>
+                <td>{html_escape(comp['student1'])}</td>
+                <td>{html_escape(comp['student2'])}</td>
                 <td>{sim['overall']:.3f}</td>
                 <td>{sim['text']:.3f}</td>
                 <td>{sim['code']:.3f}</td>
                 <td>{sim['command']:.3f}</td>
                 <td>{sim['structure']:.3f}</td>
+                <td>{sim['image']:.3f}</td>
                 <td>{status}</td>
             </tr>
 """
@@ -543,14 +1613,21 @@ class HomeworkSimilarityChecker:
         html += """
         </tbody>
     </table>
-
+"""
+        
+        # 完整比较表按页加载
+        if data_dir_name:
+            html += paginated_table_html(data_dir_name)
+        
+        html += """
     <div style="margin-top: 30px; padding: 15px; background: #f8f9fa; border-radius: 5px;">
         <h3>说明</h3>
         <ul>
             <li><strong>文本相似度</strong>: 基于TF-IDF和余弦相似度计算</li>
-            <li><strong>代码相似度</strong>: 比较代码块和命令的相似程度</li>
+            <li><strong>代码相似度</strong>: 基于winnowing代码指纹的重合程度</li>
             <li><strong>命令相似度</strong>: 比较Linux命令使用的相似度</li>
             <li><strong>结构相似度</strong>: 比较文档结构和格式的相似度</li>
+            <li><strong>截图相似度</strong>: 基于截图感知哈希的近重复程度</li>
             <li><strong>综合相似度</strong>: 加权平均后的总体相似度</li>
             <li><strong>阈值</strong>: 大于0.7为高相似度，需要人工审查</li>
         </ul>
@@ -571,96 +1648,300 @@ class HomeworkSimilarityChecker:
         
         self.logger.info(f"结果已保存到: {output_file}")
 
-    def plot_similarity_distribution(self, output_file: str = "similarity_distribution.png"):
-        """绘制相似度分布图"""
+    def save_to_database(self, homework_type: str, db_path: str = None):
+        """把本次运行的元数据与全部作业对得分写入结果数据库（逐行读取比较结果文件）"""
         if not self.similarity_results:
             self.logger.error("没有相似度检查结果")
             return
         
-        similarities = [comp['similarities']['overall'] for comp in self.similarity_results['comparisons']]
-        
-        plt.figure(figsize=(12, 8))
-        
-        # 子图1: 直方图
-        plt.subplot(2, 2, 1)
-        plt.hist(similarities, bins=20, alpha=0.7, color='skyblue', edgecolor='black')
-        plt.axvline(x=0.7, color='red', linestyle='--', label='高相似度阈值(0.7)')
-        plt.xlabel('相似度')
-        plt.ylabel('频次')
-        plt.title('相似度分布直方图')
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        
-        # 子图2: 箱线图
-        plt.subplot(2, 2, 2)
-        plt.boxplot(similarities)
-        plt.ylabel('相似度')
-        plt.title('相似度分布箱线图')
-        plt.grid(True, alpha=0.3)
-        
-        # 子图3: 各维度相似度比较
-        plt.subplot(2, 2, 3)
-        dimensions = ['text', 'code', 'command', 'structure']
-        dim_similarities = {dim: [] for dim in dimensions}
-        
-        for comp in self.similarity_results['comparisons']:
-            for dim in dimensions:
-                dim_similarities[dim].append(comp['similarities'][dim])
-        
-        plt.boxplot([dim_similarities[dim] for dim in dimensions], labels=dimensions)
-        plt.ylabel('相似度')
-        plt.title('各维度相似度分布')
-        plt.xticks(rotation=45)
-        plt.grid(True, alpha=0.3)
-        
-        # 子图4: 高相似度对分布
-        plt.subplot(2, 2, 4)
-        high_sim_pairs = self.similarity_results['high_similarity_pairs']
-        if high_sim_pairs:
-            high_similarities = [pair['similarities']['overall'] for pair in high_sim_pairs]
-            plt.hist(high_similarities, bins=10, alpha=0.7, color='red', edgecolor='black')
-            plt.xlabel('相似度')
-            plt.ylabel('频次')
-            plt.title(f'高相似度对分布 (n={len(high_sim_pairs)})')
-            plt.grid(True, alpha=0.3)
+        results = self.similarity_results
+        comparisons_file = results.get('comparisons_file')
+        if comparisons_file and os.path.exists(comparisons_file):
+            comparisons = iter_comparisons(comparisons_file)
         else:
-            plt.text(0.5, 0.5, '无高相似度对', ha='center', va='center', transform=plt.gca().transAxes)
-            plt.title('高相似度对分布')
+            # 没有比较结果文件时只能写入内存中保留的前k名
+            self.logger.warning("比较结果文件不存在，数据库中只写入前k名作业对")
+            comparisons = results['top_comparisons']
+        with ResultsDatabase(db_path or DATABASE_CONFIG['path']) as database:
+            database.add_run(
+                homework_type, comparisons, threshold=results.get('threshold'),
+                weights=results.get('weights', SIMILARITY_WEIGHTS), statistics=results['statistics'],
+                metrics=self.metrics.to_dict()
+            )
+
+    def save_similarity_matrices(self, output_dir: str):
+        """把本次结果的作业对得分写为每个维度一个内存映射的相似度矩阵（见matrix_utils）"""
+        if self.score_archive is None:
+            self.logger.error("没有作业对得分存档，无法生成相似度矩阵（需启用SCORE_ARCHIVE_CONFIG）")
+            return
+        archive = self.score_archive
+        weights = self.similarity_results.get('weights', SIMILARITY_WEIGHTS)
+        write_similarity_matrices(
+            output_dir, archive.students, archive.pairs, dict(archive.scores, overall=archive.overall(weights)),
+            dtype=MATRIX_CONFIG['dtype'],
+            meta={'homework_type': archive.meta.get('homework_type'), 'weights': weights,
+                  'threshold': self.similarity_results.get('threshold')}
+        )
+
+    def save_metrics(self, output_file: str = "similarity_metrics.json"):
+        """保存本次运行的阶段耗时、维度耗时与计数"""
+        self.metrics.save(output_file)
+        self.logger.info(f"运行指标已保存到: {output_file}")
+
+    def plot_similarity_distribution(self, output_file: str = "similarity_distribution.png",
+                                     preview: bool = False):
+        """绘制相似度分布图（基于流式累计的直方图分箱，preview为True时输出低分辨率预览）"""
+        if not self.similarity_results:
+            self.logger.error("没有相似度检查结果")
+            return
+        
+        import matplotlib.pyplot as plt
+        
+        plot_config = REPORT_CONFIG['plot_config']
+        histogram_data = self.similarity_results['score_histograms']
+        dimension_stats = self.similarity_results['statistics']['dimension_statistics']
+        threshold = self.similarity_results.get('threshold', BASE_CONFIG['similarity_threshold'])
+        
+        fine_bins = histogram_data['bins']
+        fine_edges = np.linspace(0.0, 1.0, fine_bins + 1)
+        display_bins = 20 if fine_bins % 20 == 0 else fine_bins
+        display_edges = np.linspace(0.0, 1.0, display_bins + 1)
+        
+        def rebinned(dim):
+            counts = np.asarray(histogram_data['counts'][dim])
+            return counts.reshape(display_bins, fine_bins // display_bins).sum(axis=1)
+        
+        def box_stats(dim, label):
+            # 由分位数摘要构造箱线图，须线为1.5倍四分位距并截断到观测范围
+            stats = dimension_stats[dim]
+            iqr = stats['q3'] - stats['q1']
+            return {
+                'label': label,
+                'med': stats['median'],
+                'q1': stats['q1'],
+                'q3': stats['q3'],
+                'whislo': max(stats['min'], stats['q1'] - 1.5 * iqr),
+                'whishi': min(stats['max'], stats['q3'] + 1.5 * iqr),
+                'fliers': []
+            }
+        
+        figure_size = (6, 4) if preview else plot_config['figure_size']
+        dpi = plot_config['preview_dpi'] if preview else plot_config['dpi']
+        # 中文字体只在绘图期间生效，不修改全局rcParams
+        with plt.rc_context({'font.sans-serif': ['SimHei'], 'axes.unicode_minus': False}):
+            fig, axes = plt.subplots(2, 2, figsize=figure_size)
+        
+            # 子图1: 直方图
+            ax = axes[0, 0]
+            ax.hist(display_edges[:-1], bins=display_edges, weights=rebinned('overall'),
+                    alpha=0.7, color='skyblue', edgecolor='black')
+            ax.axvline(x=threshold, color='red', linestyle='--', label=f'高相似度阈值({threshold})')
+            ax.set_xlabel('相似度')
+            ax.set_ylabel('频次')
+            ax.set_title('相似度分布直方图')
+            ax.legend()
+            ax.grid(True, alpha=0.3)
+        
+            # 子图2: 箱线图
+            ax = axes[0, 1]
+            ax.bxp([box_stats('overall', 'overall')], showfliers=False)
+            ax.set_ylabel('相似度')
+            ax.set_title('相似度分布箱线图')
+            ax.grid(True, alpha=0.3)
+        
+            # 子图3: 各维度相似度比较
+            ax = axes[1, 0]
+            dimensions = ['text', 'code', 'command', 'structure', 'image']
+            ax.bxp([box_stats(dim, dim) for dim in dimensions], showfliers=False)
+            ax.set_ylabel('相似度')
+            ax.set_title('各维度相似度分布')
+            ax.tick_params(axis='x', rotation=45)
+            ax.grid(True, alpha=0.3)
+        
+            # 子图4: 高相似度对分布（取阈值以上的分箱）
+            ax = axes[1, 1]
+            high_count = self.similarity_results['statistics']['high_similarity_count']
+            if high_count:
+                overall_counts = np.asarray(histogram_data['counts']['overall'])
+                start = min(int(threshold * fine_bins), fine_bins - 1)
+                ax.hist(fine_edges[start:-1], bins=fine_edges[start:], weights=overall_counts[start:],
+                        alpha=0.7, color='red', edgecolor='black')
+                ax.set_xlabel('相似度')
+                ax.set_ylabel('频次')
+                ax.set_title(f'高相似度对分布 (n={high_count})')
+                ax.grid(True, alpha=0.3)
+            else:
+                ax.text(0.5, 0.5, '无高相似度对', ha='center', va='center', transform=ax.transAxes)
+                ax.set_title('高相似度对分布')
         
-        plt.tight_layout()
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
-        plt.close()
+            fig.tight_layout()
+            fig.savefig(output_file, dpi=dpi, bbox_inches='tight')
+            plt.close(fig)
         
         self.logger.info(f"相似度分布图已保存: {output_file}")
 
 
+def rescore_archive(checker: HomeworkSimilarityChecker, homework_type: str, weights: Dict[str, float],
+                    thresholds: List[float], plot: bool = True, preview: bool = False, matrices: bool = False):
+    """按新的权重对存档重新加权，为每个阈值生成一组结果、报告和分布图"""
+    archive = ScoreArchive.load(ScoreArchive.directory(SCORE_ARCHIVE_CONFIG['archive_dir'], homework_type))
+    overall = archive.overall(weights)
+    for threshold in thresholds:
+        prefix = f"{homework_type}_rescored" if len(thresholds) == 1 else f"{homework_type}_rescored_t{threshold:g}"
+        checker.rescore_results(homework_type, weights, threshold, thresholds, archive, overall)
+        with checker.metrics.stage('report'):
+            checker.generate_report(f"{prefix}_similarity_report.html",
+                                    chunk_writer=partial(archive.write_report_chunks, overall, threshold))
+        with checker.metrics.stage('save_results'):
+            checker.save_results(f"{prefix}_similarity_results.json")
+        if plot:
+            with checker.metrics.stage('plot'):
+                checker.plot_similarity_distribution(f"{prefix}_similarity_distribution.png", preview=preview)
+        if matrices and threshold == thresholds[0]:
+            # 各阈值下的矩阵相同（阈值只影响疑似标记），只输出一次
+            with checker.metrics.stage('matrices'):
+                checker.save_similarity_matrices(f"{homework_type}_rescored_similarity_matrices")
+        checker.save_metrics(f"{prefix}_similarity_metrics.json")
+    
+    stats = checker.similarity_results['statistics']
+    print(f"\n=== {homework_type} 重新加权完成（{len(archive)} 对） ===")
+    print(f"权重: {', '.join(f'{dim}={weight:g}' for dim, weight in weights.items())}")
+    print(f"平均相似度: {stats['avg_similarity']:.3f}，最高相似度: {stats['max_similarity']:.3f}")
+    for row in stats['threshold_sweep']:
+        print(f"  阈值 {row['threshold']:.3f}: 疑似抄袭 {row['suspicious']} 对 ({row['fraction']:.2%})")
+
+
 def main():
     """主函数"""
-    if len(sys.argv) > 1:
-        homework_type = sys.argv[1]
-    else:
-        homework_type = "H3"
-    
-    if len(sys.argv) > 2:
-        threshold = float(sys.argv[2])
-    else:
-        threshold = 0.7
+    parser = argparse.ArgumentParser(description='Linux作业相似度检查')
+    parser.add_argument('homework_type', nargs='?', default='H3',
+                        help='作业类型，如H3')
+    parser.add_argument('threshold', nargs='?', type=float, default=BASE_CONFIG['similarity_threshold'],
+                        help='高相似度阈值')
+    parser.add_argument('--base-path', type=str, default=BASE_CONFIG['homework_base_path'],
+                        help='作业根目录')
+    parser.add_argument('--candidate-mode', choices=['auto', 'exact', 'lsh'], default=None,
+                        help='候选对生成模式（默认取CANDIDATE_CONFIG）')
+    parser.add_argument('--recall', type=float, default=None,
+                        help='LSH候选对在jaccard_threshold处的目标召回率')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='并行比较的进程数（默认取BATCH_CONFIG）')
+    parser.add_argument('--archive-dir', type=str, default=None,
+                        help='往届作业归档索引目录（指定后与往届作业比对）')
+    parser.add_argument('--no-plot', action='store_true', default=False,
+                        help='不绘制相似度分布图')
+    parser.add_argument('--plot-preview', action='store_true', default=False,
+                        help='只输出低分辨率的分布图预览')
+    parser.add_argument('--incremental', action='store_true', default=False,
+                        help='增量模式：复用未修改作业的特征与作业对得分')
+    parser.add_argument('--db', type=str, default=DATABASE_CONFIG['path'],
+                        help='结果数据库路径（SQLite）')
+    parser.add_argument('--no-db', action='store_true', default=not DATABASE_CONFIG['enabled'],
+                        help='不写入结果数据库')
+    parser.add_argument('--prune', dest='prune', action='store_true', default=None,
+                        help='上界剪枝：综合相似度不可能达到阈值的作业对不再完整计算（统计与分布图只覆盖完整计算的作业对）')
+    parser.add_argument('--no-prune', dest='prune', action='store_false', default=None,
+                        help='不做上界剪枝，完整计算并输出全部候选对（默认取PRUNING_CONFIG）')
+    parser.add_argument('--snapshot-dir', type=str, default=SHARD_CONFIG['snapshot_dir'],
+                        help='分片查重的共享目录（特征快照与各分片输出）')
+    parser.add_argument('--matrices', action='store_true', default=MATRIX_CONFIG['enabled'],
+                        help='另外输出每个维度的相似度矩阵（内存映射的.npy）与学生索引文件')
+    parser.add_argument('--weights', type=str, default=None, metavar='DIM=W,...',
+                        help='重新加权时使用的权重，如 text=0.5,code=0.3（未列出的维度沿用SIMILARITY_WEIGHTS）')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=None, metavar='T',
+                        help='重新加权时依次使用的阈值（默认为threshold参数）')
+    shard_group = parser.add_mutually_exclusive_group()
+    shard_group.add_argument('--rescore', action='store_true', default=False,
+                             help='不重新计算相似度，按新的权重或阈值从作业对得分存档重新生成结果、报告与统计')
+    shard_group.add_argument('--prepare-snapshot', action='store_true', default=False,
+                             help='只提取特征并生成特征快照，供各分片共用')
+    shard_group.add_argument('--shard', type=str, default=None, metavar='K/N',
+                             help='只计算N个分片中的第K个（快照不存在或已过期时先生成）')
+    shard_group.add_argument('--merge-shards', action='store_true', default=False,
+                             help='合并全部分片的输出，生成结果、报告与统计')
+    args = parser.parse_args()
+    homework_type = args.homework_type
+    threshold = args.threshold
     
     # 创建检查器
-    checker = HomeworkSimilarityChecker()
+    checker = HomeworkSimilarityChecker(args.base_path)
+    
+    if args.rescore:
+        rescore_archive(checker, homework_type, parse_weights(args.weights, SIMILARITY_WEIGHTS),
+                        args.thresholds or [threshold], plot=not args.no_plot, preview=args.plot_preview,
+                        matrices=args.matrices)
+        return
+    
+    # 分片查重：生成快照或计算单个分片后直接退出，结果在合并时生成
+    if args.prepare_snapshot:
+        with ShardWorkspace(args.snapshot_dir).snapshot_lock(SHARD_CONFIG['lock_timeout']):
+            snapshot = checker.prepare_snapshot(homework_type, args.snapshot_dir, threshold,
+                                                candidate_mode=args.candidate_mode, recall=args.recall)
+        if snapshot:
+            print(f"特征快照已生成: {args.snapshot_dir}（{len(snapshot['students'])} 份作业，"
+                  f"{snapshot['candidate_count']} 个候选对）")
+        return
+    if args.shard:
+        shard = ShardSpec.parse(args.shard, SHARD_CONFIG['tiles_per_shard'])
+        shard_results = checker.check_similarity_batch(
+            homework_type, threshold,
+            candidate_mode=args.candidate_mode, recall=args.recall,
+            max_workers=args.workers, prune=args.prune,
+            shard=shard, snapshot_dir=args.snapshot_dir
+        )
+        if shard_results:
+            checker.metrics.save(str(ShardWorkspace(args.snapshot_dir).shards_dir / f"{shard.name}_metrics.json"))
+            stats = shard_results['statistics']
+            print(f"\n=== {homework_type} 分片 {shard} 计算完成 ===")
+            print(f"输出作业对: {stats['total_comparisons']} 对，疑似抄袭: {stats['high_similarity_count']} 对")
+        return
     
-    # 批量检查相似度
-    results = checker.check_similarity_batch(homework_type, threshold)
+    if args.merge_shards:
+        # 合并各分片，之后与单机运行一样生成报告和结果
+        results = checker.merge_shards(
+            homework_type, args.snapshot_dir,
+            comparisons_file=f"{homework_type}_similarity_comparisons.jsonl",
+            archive_dir=args.archive_dir
+        )
+    else:
+        # 批量检查相似度
+        results = checker.check_similarity_batch(
+            homework_type, threshold,
+            candidate_mode=args.candidate_mode, recall=args.recall,
+            max_workers=args.workers, incremental=args.incremental,
+            archive_dir=args.archive_dir,
+            comparisons_file=f"{homework_type}_similarity_comparisons.jsonl",
+            prune=args.prune
+        )
     
     if results:
         # 生成报告
-        checker.generate_report(f"{homework_type}_similarity_report.html")
+        with checker.metrics.stage('report'):
+            checker.generate_report(f"{homework_type}_similarity_report.html")
         
         # 保存结果
-        checker.save_results(f"{homework_type}_similarity_results.json")
+        with checker.metrics.stage('save_results'):
+            checker.save_results(f"{homework_type}_similarity_results.json")
         
         # 绘制分布图
-        checker.plot_similarity_distribution(f"{homework_type}_similarity_distribution.png")
+        if not args.no_plot:
+            with checker.metrics.stage('plot'):
+                checker.plot_similarity_distribution(
+                    f"{homework_type}_similarity_distribution.png", preview=args.plot_preview
+                )
+        
+        # 写入结果数据库（供按学生、跨作业类型查询）
+        if not args.no_db:
+            with checker.metrics.stage('database'):
+                checker.save_to_database(homework_type, args.db)
+        
+        # 每个维度的相似度矩阵（供热力图、聚类等分析按行列切片）
+        if args.matrices:
+            with checker.metrics.stage('matrices'):
+                checker.save_similarity_matrices(f"{homework_type}_similarity_matrices")
+        
+        # 运行指标（各阶段耗时与计数）与结果保存在一起
+        checker.save_metrics(f"{homework_type}_similarity_metrics.json")
         
         # 输出统计信息
         stats = results['statistics']
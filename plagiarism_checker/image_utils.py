@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图感知哈希相似度
+
+对每张截图计算感知哈希（pHash/dHash），哈希值按图片文件内容哈希缓存到磁盘，
+未变化的截图不再重复解码。跨学生的近重复截图通过BK树按汉明距离检索，
+不需要对所有图片两两比较。
+"""
+
+import os
+import json
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from index_utils import file_hash
+
+logger = logging.getLogger(__name__)
+
+
+def hamming_distance(hash1: int, hash2: int) -> int:
+    """两个哈希值的汉明距离"""
+    return bin(hash1 ^ hash2).count('1')
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    value = 0
+    for bit in bits.ravel():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _load_gray(image_path: str, width: int, height: int) -> np.ndarray:
+    """读取图片并缩放为灰度矩阵"""
+    from PIL import Image
+
+    with Image.open(image_path) as image:
+        gray = image.convert('L').resize((width, height), Image.LANCZOS)
+        return np.asarray(gray, dtype=np.float64)
+
+
+def dhash(image_path: str, hash_size: int = 8) -> int:
+    """差值哈希：比较相邻像素的明暗"""
+    pixels = _load_gray(image_path, hash_size + 1, hash_size)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image_path: str, hash_size: int = 8) -> int:
+    """感知哈希：取缩略图二维DCT的低频部分与其中位数比较"""
+    from scipy.fft import dctn
+
+    pixels = _load_gray(image_path, hash_size * 4, hash_size * 4)
+    low = dctn(pixels, norm='ortho')[:hash_size, :hash_size]
+    # 直流分量只反映整体亮度，不参与中位数
+    median = np.median(low.ravel()[1:])
+    return _bits_to_int(low > median)
+
+
+_HASH_FUNCTIONS = {'phash': phash, 'dhash': dhash}
+
+
+def compute_image_hash(task: Tuple[str, str, int]) -> Optional[int]:
+    """计算一张图片的感知哈希（供进程池调用），图片无法读取时返回None"""
+    image_path, method, hash_size = task
+    try:
+        return _HASH_FUNCTIONS[method](image_path, hash_size)
+    except Exception as e:
+        logger.warning(f"图片哈希计算失败 {image_path}: {e}")
+        return None
+
+
+class ImageHashCache:
+    """感知哈希缓存（按图片文件内容哈希索引）"""
+
+    def __init__(self, cache_dir: Optional[str] = None, method: str = 'phash', hash_size: int = 8):
+        if method not in _HASH_FUNCTIONS:
+            raise ValueError(f"未知的图片哈希方法: {method}")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.method = method
+        self.hash_size = hash_size
+        self.hashes: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._load()
+
+    @property
+    def cache_file(self) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{self.method}{self.hash_size}.json"
+
+    def _load(self):
+        if self.cache_file is None or not self.cache_file.exists():
+            return
+        try:
+            stored = json.loads(self.cache_file.read_text(encoding='utf-8'))
+            self.hashes = {key: int(value, 16) for key, value in stored.items()}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取图片哈希缓存失败 {self.cache_file}: {e}")
+
+    def save(self):
+        """写出新增的哈希"""
+        if self.cache_file is None or not self._dirty:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp_file.write_text(
+                json.dumps({key: format(value, 'x') for key, value in self.hashes.items()}),
+                encoding='utf-8'
+            )
+            os.replace(tmp_file, self.cache_file)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"写入图片哈希缓存失败 {self.cache_file}: {e}")
+
+    def hash_files(self, image_paths: List[Path], workers: int = 1) -> List[Optional[int]]:
+        """计算一组图片的感知哈希（命中缓存的直接返回，其余可多进程并行计算）"""
+        keys = []
+        for path in image_paths:
+            try:
+                keys.append(file_hash(path))
+            except OSError as e:
+                logger.warning(f"读取图片失败 {path}: {e}")
+                keys.append(None)
+
+        pending = {}
+        for key, path in zip(keys, image_paths):
+            if key is None or key in pending:
+                continue
+            if key in self.hashes:
+                self.hits += 1
+            else:
+                pending[key] = str(path)
+        self.misses += len(pending)
+
+        if pending:
+            tasks = [(path, self.method, self.hash_size) for path in pending.values()]
+            if workers > 1 and len(tasks) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    chunksize = max(1, len(tasks) // (workers * 4))
+                    computed = list(executor.map(compute_image_hash, tasks, chunksize=chunksize))
+            else:
+                computed = [compute_image_hash(task) for task in tasks]
+            for key, value in zip(pending.keys(), computed):
+                if value is not None:
+                    self.hashes[key] = value
+                    self._dirty = True
+
+        return [self.hashes.get(key) if key is not None else None for key in keys]
+
+
+class BKTree:
+    """按汉明距离组织的BK树"""
+
+    def __init__(self):
+        # 节点: [哈希值, 该哈希值对应的条目列表, {距离: 子节点}]
+        self._root = None
+
+    def add(self, value: int, item):
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def query(self, value: int, radius: int) -> List[Tuple[int, object]]:
+        """返回与value距离不超过radius的全部 (距离, 条目)"""
+        if self._root is None:
+            return []
+        matches = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= radius:
+                matches.extend((distance, item) for item in node[1])
+            # 三角不等式：只有边距离在 [d-r, d+r] 内的子树可能包含结果
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return matches
+
+
+def image_similarity(hashes1: List[int], hashes2: List[int], radius: int) -> float:
+    """两组截图的相似度：存在近重复对应图片的截图占双方截图总数的比例"""
+    if not hashes1 or not hashes2:
+        return 0.0
+    matched1 = sum(1 for h1 in hashes1 if any(hamming_distance(h1, h2) <= radius for h2 in hashes2))
+    matched2 = sum(1 for h2 in hashes2 if any(hamming_distance(h1, h2) <= radius for h1 in hashes1))
+    return (matched1 + matched2) / (len(hashes1) + len(hashes2))
+
+
+class ImageIndex:
+    """全体学生截图的近重复索引"""
+
+    def __init__(self, student_hashes: List[List[int]], radius: int):
+        self.radius = radius
+        self.sizes = np.array([len(hashes) for hashes in student_hashes], dtype=np.float64)
+        tree = BKTree()
+        for owner, hashes in enumerate(student_hashes):
+            for local, value in enumerate(hashes):
+                tree.add(value, (owner, local))
+
+        # (学生i, 学生j) -> [(i的图片序号, j的图片序号, 距离)]，i < j
+        self.shared: Dict[Tuple[int, int], List[Tuple[int, int, int]]] = {}
+        for owner, hashes in enumerate(student_hashes):
+            for local, value in enumerate(hashes):
+                for distance, (other, other_local) in tree.query(value, radius):
+                    if other > owner:
+                        self.shared.setdefault((owner, other), []).append((local, other_local, distance))
+
+    def similarity_matrix(self) -> sparse.csr_matrix:
+        """稀疏的两两截图相似度矩阵（没有共享截图的作业对为0）"""
+        n = len(self.sizes)
+        rows, cols, data = [], [], []
+        for (i, j), matches in self.shared.items():
+            matched_i = len({match[0] for match in matches})
+            matched_j = len({match[1] for match in matches})
+            value = (matched_i + matched_j) / (self.sizes[i] + self.sizes[j])
+            rows.extend((i, j))
+            cols.extend((j, i))
+            data.extend((value, value))
+        return sparse.csr_matrix((data, (rows, cols)), shape=(n, n), dtype=np.float64)
+
+    def pair_matches(self, i: int, j: int) -> List[Tuple[int, int, int]]:
+        """作业对 (i, j) 的近重复截图 [(i的图片序号, j的图片序号, 距离)]，按距离升序"""
+        if i < j:
+            matches = self.shared.get((i, j), [])
+        else:
+            matches = [(b, a, d) for a, b, d in self.shared.get((j, i), [])]
+        return sorted(matches, key=lambda match: match[2])
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量查重索引
+
+按作业类型持久化每份作业的内容哈希与已提取特征（分词文本、代码指纹、命令集合、截图哈希等），
+以及已经计算过的作业对相似度。再次运行时只需提取新增或修改的作业，涉及这些作业的作业对
+重新计算全部维度；其余作业对的命令、结构、截图相似度直接复用。文本与代码相似度依赖整个批次
+（IDF、指纹文档频率），批次成员相对得分计算时的变化比例超过容差时，复用的作业对也要按新批次重算这两个维度。
+"""
+
+import json
+import pickle
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 索引格式版本，特征结构变化时递增以使旧索引失效
+INDEX_VERSION = 2
+
+# 持久化的相似度维度
+PAIR_DIMENSIONS = ['text', 'code', 'command', 'structure', 'image', 'overall']
+
+# 依赖整个批次的维度（文本TF-IDF的IDF、代码指纹的文档频率过滤），批次成员变化后须重新计算
+COHORT_DIMENSIONS = ['text', 'code']
+
+
+def settings_hash(settings: Dict[str, Any]) -> str:
+    """影响已存特征的配置项的哈希（配置变化后已存特征不再复用）"""
+    payload = json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def content_hash(data: bytes) -> str:
+    """计算已读入内容的哈希（与file_hash对同一文件的结果一致）"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def file_hash(file_path: Path) -> str:
+    """计算文件内容哈希"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FeatureStore:
+    """单个作业类型的特征与作业对得分存储"""
+
+    def __init__(self, index_dir: str, homework_type: str):
+        self.path = Path(index_dir) / homework_type
+        self.features: Dict[str, Dict[str, Any]] = {}
+        self.pair_scores: Dict[Tuple[str, str], Dict[str, float]] = {}
+        # 已存的文本、代码得分按哪个批次 {学生: 内容哈希} 计算
+        self.cohort: Dict[str, str] = {}
+
+    @property
+    def features_file(self) -> Path:
+        return self.path / 'features.pkl'
+
+    @property
+    def pairs_file(self) -> Path:
+        return self.path / 'pairs.npz'
+
+    @property
+    def students_file(self) -> Path:
+        return self.path / 'students.json'
+
+    def load(self, weights: Dict[str, float] = None, settings: str = None) -> 'FeatureStore':
+        """加载已有索引（不存在、版本或特征配置不符时返回空索引；权重变化时不复用作业对得分）"""
+        if not self.features_file.exists():
+            return self
+        try:
+            with open(self.features_file, 'rb') as f:
+                stored = pickle.load(f)
+            if stored.get('version') != INDEX_VERSION:
+                logger.info(f"增量索引版本不符，将重新构建: {self.path}")
+                return self
+            if stored.get('settings') != settings:
+                logger.info(f"特征相关配置已变化，将重新提取全部作业: {self.path}")
+                return self
+            self.features = stored['features']
+            self.cohort = stored.get('cohort') or {student: entry['hash'] for student, entry in self.features.items()}
+
+            if weights is not None and stored.get('weights') != weights:
+                logger.info("相似度权重已变化，不复用已存的作业对得分")
+            elif self.pairs_file.exists() and self.students_file.exists():
+                students = json.loads(self.students_file.read_text(encoding='utf-8'))
+                arrays = np.load(self.pairs_file)
+                pairs = arrays['pairs']
+                columns = {dim: arrays[dim].tolist() for dim in PAIR_DIMENSIONS}
+                for k, (i, j) in enumerate(pairs.tolist()):
+                    self.pair_scores[(students[i], students[j])] = {
+                        dim: columns[dim][k] for dim in PAIR_DIMENSIONS
+                    }
+        except (OSError, KeyError, ValueError, pickle.UnpicklingError) as e:
+            logger.warning(f"增量索引读取失败，将重新构建 {self.path}: {e}")
+            self.features = {}
+            self.pair_scores = {}
+            self.cohort = {}
+        return self
+
+    def lookup(self, student: str, content_hash: str) -> Optional[Dict[str, Any]]:
+        """返回内容未变化的作业的已存特征"""
+        entry = self.features.get(student)
+        if entry and entry['hash'] == content_hash:
+            return entry['content']
+        return None
+
+    def cohort_drift(self, hashes: Dict[str, str]) -> float:
+        """当前批次 {学生: 内容哈希} 相对已存得分所依据批次的变化比例（新增、删除或修改的作业数 / 两批次学生总数）
+
+        每个词或指纹的文档频率至多改变这么多份作业，可用作IDF与文档频率漂移的上界。
+        """
+        students = set(self.cohort) | set(hashes)
+        if not students:
+            return 0.0
+        changed = sum(1 for student in students if self.cohort.get(student) != hashes.get(student))
+        return changed / len(students)
+
+    def pair(self, student1: str, student2: str) -> Optional[Dict[str, float]]:
+        """返回已存的作业对相似度（与学生顺序无关）"""
+        score = self.pair_scores.get((student1, student2))
+        if score is None:
+            score = self.pair_scores.get((student2, student1))
+        return score
+
+    def save(self, features: Dict[str, Dict[str, Any]], students: List[str],
+             pairs: List[Tuple[int, int]], scores: Dict[str, np.ndarray],
+             weights: Dict[str, float] = None, settings: str = None, cohort: Dict[str, str] = None):
+        """保存当前批次的特征与作业对得分；cohort为文本、代码得分所依据的批次（默认为当前批次）"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        if cohort is None:
+            cohort = {student: entry['hash'] for student, entry in features.items()}
+        with open(self.features_file, 'wb') as f:
+            pickle.dump({'version': INDEX_VERSION, 'weights': weights, 'settings': settings, 'features': features,
+                         'cohort': cohort}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.students_file.write_text(json.dumps(students, ensure_ascii=False), encoding='utf-8')
+        arrays = {'pairs': np.asarray(pairs, dtype=np.int32).reshape(len(pairs), 2)}
+        for dim in PAIR_DIMENSIONS:
+            arrays[dim] = np.asarray(scores[dim], dtype=np.float64)
+        np.savez(self.pairs_file, **arrays)
+        logger.info(f"增量索引已保存: {self.path} ({len(features)} 份作业, {len(pairs)} 对得分)")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+作业发现与文件读取
+
+学生目录用 os.scandir 并发扫描；Markdown文件只读取一次为字节串，
+由字节内容判断编码后再解码。读取在有界的线程池中预取，
+调用方在主线程中提取特征的同时，后续文件的读取已在进行，网络存储上不再逐个等待I/O。
+"""
+
+import os
+import codecs
+import logging
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 按顺序尝试的编码（gb18030兼容gbk）
+_FALLBACK_ENCODINGS = ['utf-8', 'gb18030']
+
+_BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def decode_bytes(data: bytes) -> Tuple[str, str]:
+    """根据字节内容判断编码并解码，返回 (文本, 编码)"""
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return data.decode(encoding), encoding
+    for encoding in _FALLBACK_ENCODINGS:
+        try:
+            return data.decode(encoding), encoding
+        except UnicodeDecodeError:
+            continue
+    # 都无法严格解码时按utf-8替换非法字节，保证不会整份作业丢失
+    return data.decode('utf-8', errors='replace'), 'utf-8-replace'
+
+
+def _scandir(path: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(path) as entries:
+            return list(entries)
+    except OSError:
+        return []
+
+
+def scan_student(student_dir: str, homework_type: str) -> Optional[Dict]:
+    """扫描单个学生目录，布局为 学生/作业类型/仓库/作业类型/*.md"""
+    homework_dir = os.path.join(student_dir, homework_type)
+    found = None
+    for subdir in sorted(_scandir(homework_dir), key=lambda entry: entry.name):
+        if not subdir.is_dir():
+            continue
+        actual_homework_dir = os.path.join(subdir.path, homework_type)
+        entries = sorted(_scandir(actual_homework_dir), key=lambda entry: entry.name)
+        md_files = [Path(entry.path) for entry in entries if entry.name.endswith('.md') and entry.is_file()]
+        if md_files:
+            # 多个仓库目录都有报告时以最后一个为准
+            found = {
+                'md_file': md_files[0],
+                'image_files': [Path(entry.path) for entry in entries
+                                if entry.name.endswith('.png') and entry.is_file()],
+                'other_files': [Path(entry.path) for entry in entries],
+                'dir_path': Path(actual_homework_dir)
+            }
+    return found
+
+
+def discover_submissions(base_path: Path, homework_type: str, workers: int = 8) -> Dict[str, Dict]:
+    """并发扫描全部学生目录，返回 {学生: 文件信息}（按学生目录名排序，与文件系统遍历顺序无关）"""
+    student_dirs = sorted((entry for entry in _scandir(str(base_path)) if entry.is_dir()),
+                          key=lambda entry: entry.name)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        found = executor.map(lambda entry: scan_student(entry.path, homework_type), student_dirs)
+        return {entry.name: files for entry, files in zip(student_dirs, found) if files}
+
+
+def _read_bytes(path: Path) -> Optional[bytes]:
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError as e:
+        logger.error(f"无法读取文件 {path}: {e}")
+        return None
+
+
+def iter_file_bytes(paths: List[Path], workers: int = 8) -> Iterator[Tuple[Path, Optional[bytes]]]:
+    """按输入顺序产出 (路径, 字节内容)，最多预取 2*workers 个文件；读取失败时内容为None"""
+    if workers <= 1:
+        for path in paths:
+            yield path, _read_bytes(path)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        remaining = iter(paths)
+        for path in remaining:
+            pending.append((path, executor.submit(_read_bytes, path)))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(remaining, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(_read_bytes, next_path)))
+            yield path, future.result()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MinHash/LSH候选对生成
+
+为每份作业的字符shingle计算MinHash签名，再用LSH分桶只挑出可能相似的作业对，
+避免对全部 n² 对作业进行完整的相似度计算。
+"""
+
+import re
+import zlib
+from collections import defaultdict
+from typing import Iterable, List, Set, Tuple
+
+import numpy as np
+
+# 大于2^32的最小素数，保证 (a*x+b) mod p 不会在uint64中溢出
+_MERSENNE_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def normalize_for_shingles(content: str) -> str:
+    """标准化文本：小写并合并空白"""
+    return re.sub(r'\s+', ' ', content.lower()).strip()
+
+
+def shingle_hashes(content: str, shingle_size: int = 5) -> np.ndarray:
+    """计算文本的字符shingle哈希集合"""
+    text = normalize_for_shingles(content)
+    if not text:
+        return np.empty(0, dtype=np.uint64)
+    if len(text) <= shingle_size:
+        shingles = {text}
+    else:
+        shingles = {text[k:k + shingle_size] for k in range(len(text) - shingle_size + 1)}
+    return np.fromiter(
+        (zlib.crc32(s.encode('utf-8')) for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+
+
+class MinHasher:
+    """MinHash签名生成器"""
+
+    def __init__(self, num_perm: int = 128, seed: int = 42):
+        self.num_perm = num_perm
+        rng = np.random.RandomState(seed)
+        # a < 2^31 保证 a*x (x < 2^32) 不超过uint64
+        self.a = rng.randint(1, 2 ** 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        """计算一组shingle哈希的MinHash签名"""
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME
+        return permuted.min(axis=0) & _MAX_HASH
+
+
+def estimate_jaccard(sig1: np.ndarray, sig2: np.ndarray) -> float:
+    """由两个签名估计Jaccard相似度"""
+    return float(np.mean(sig1 == sig2))
+
+
+def choose_band_params(num_perm: int, threshold: float, recall: float) -> Tuple[int, int]:
+    """选择LSH分带参数(bands, rows)
+
+    在保证Jaccard为threshold的作业对以不低于recall的概率成为候选的前提下，
+    选取每带行数最多（误报最少）的组合。
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if bands == 0:
+            break
+        probability = 1.0 - (1.0 - threshold ** rows) ** bands
+        if probability >= recall:
+            best = (bands, rows)
+    return best
+
+
+def lsh_candidate_pairs(signatures: np.ndarray, bands: int, rows: int) -> Set[Tuple[int, int]]:
+    """LSH分桶，返回至少在一个带中落入同一桶的作业对 (i, j), i < j"""
+    candidates = set()
+    n = signatures.shape[0]
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_slice = signatures[:, band * rows:(band + 1) * rows]
+        for idx in range(n):
+            buckets[band_slice[idx].tobytes()].append(idx)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    candidates.add((members[x], members[y]))
+    return candidates
+
+
+def all_pairs(n: int) -> Iterable[Tuple[int, int]]:
+    """全部作业对 (i, j), i < j"""
+    for i in range(n):
+        for j in range(i + 1, n):
+            yield i, j
+
+
+def generate_candidate_pairs(contents: List[str], num_perm: int = 128, shingle_size: int = 5,
+                             threshold: float = 0.3, recall: float = 0.95,
+                             seed: int = 42) -> List[Tuple[int, int]]:
+    """基于MinHash/LSH生成候选作业对（按 (i, j) 排序）"""
+    hasher = MinHasher(num_perm, seed)
+    signatures = np.vstack([
+        hasher.signature(shingle_hashes(content, shingle_size)) for content in contents
+    ]) if contents else np.empty((0, num_perm), dtype=np.uint64)
+    bands, rows = choose_band_params(num_perm, threshold, recall)
+    # 空文档的签名全部相同，不应被视为候选
+    empty = {idx for idx, content in enumerate(contents) if not normalize_for_shingles(content)}
+    candidates = lsh_candidate_pairs(signatures, bands, rows)
+    return sorted(pair for pair in candidates if pair[0] not in empty and pair[1] not in empty)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单次扫描的Markdown特征提取器
+
+用一个组合正则对文档做一次扫描，同时得到纯文本、代码块（围栏/行内）、命令、
+URL、标题和各类元素数量。命令前缀由 CODE_CONFIG['command_patterns'] 合并为
+一个模式，以行首的零宽前瞻嵌入扫描中，与其他标记互不遮挡；只识别位于行首
+（可带缩进、列表标记、引用符或 $ 提示符）的命令，不截取句中的命令片段。
+"""
+
+import re
+from collections import defaultdict
+from typing import Any, Dict, List
+
+# 标记类型（按优先级排列，同一位置上靠前的先匹配）
+_TOKEN_PATTERNS = [
+    ('fence', r'```(?P<fence_body>[\s\S]*?)```'),
+    ('heading', r'^(?P<heading_mark>#+)[ \t]+(?=(?P<heading_title>[^\n]+))'),
+    ('list_item', r'^[ \t]*[-*+][ \t]+'),
+    ('image', r'!\[[^\]\n]*\]\((?P<image_target>[^)\n]*)\)'),
+    ('link', r'\[[^\]\n]*\]\((?P<link_target>[^)\n]*)\)'),
+    ('inline_code', r'`(?P<inline_body>[^`\n]*)`'),
+    ('url', r'https?://[^\s\)]+'),
+    ('emphasis', r'[*_]+'),
+]
+
+_URL_PATTERN = re.compile(r'https?://[^\s\)]+')
+
+# 行首命令之前允许出现的列表标记、引用符和shell提示符
+_LINE_PREFIX = r'(?:(?:[-*+]|\d+\.)[ \t]+|>[ \t]*|\$[ \t]+)?'
+
+
+def combine_command_patterns(command_patterns: List[str]) -> str:
+    """将多个命令模式合并为一个分支模式"""
+    return '|'.join(f'(?:{pattern})' for pattern in command_patterns)
+
+
+class MarkdownFeatureExtractor:
+    """Markdown特征提取器（正则只在构造时编译一次）"""
+
+    def __init__(self, command_patterns: List[str], ignore_prefixes: List[str] = None):
+        combined = combine_command_patterns(command_patterns)
+        self.ignore_prefixes = tuple(ignore_prefixes or ['#'])
+        # 命令以行首的零宽前瞻匹配：不吞掉同一行的列表标记、链接、行内代码等标记
+        alternatives = [f'^(?=[ \t]*{_LINE_PREFIX}(?P<command>{combined}))'] + [
+            f'(?P<{name}>{pattern})' for name, pattern in _TOKEN_PATTERNS
+        ]
+        self.token_pattern = re.compile('|'.join(alternatives), re.MULTILINE | re.IGNORECASE)
+
+    def _code_lines(self, code: str) -> List[str]:
+        """代码中的有效命令行"""
+        lines = []
+        for line in code.split('\n'):
+            line = line.strip()
+            if line and not line.startswith(self.ignore_prefixes):
+                lines.append(line)
+        return lines
+
+    def extract(self, content: str) -> Dict[str, Any]:
+        """单次扫描提取全部特征"""
+        text_parts = []
+        code_blocks = []
+        commands = []
+        urls = []
+        structure = {
+            'headings': [],
+            'heading_counts': defaultdict(int),
+            'sections': [],
+            'list_items': 0,
+            'code_block_count': 0,
+            'image_count': 0,
+            'link_count': 0
+        }
+
+        position = 0
+        for match in self.token_pattern.finditer(content):
+            kind = match.lastgroup
+            if kind == 'command':
+                commands.append(match.group('command'))
+                continue
+
+            text_parts.append(content[position:match.start()])
+            position = match.end()
+
+            if kind == 'fence':
+                structure['code_block_count'] += 1
+                body = match.group('fence_body')
+                # 去掉首行的语言标记
+                code = body.split('\n', 1)[1] if '\n' in body else body
+                code = code.strip()
+                if code:
+                    code_blocks.append(code)
+                urls.extend(_URL_PATTERN.findall(body))
+            elif kind == 'heading':
+                level = len(match.group('heading_mark'))
+                structure['headings'].append((level, match.group('heading_title').strip()))
+                structure['heading_counts'][level] += 1
+            elif kind == 'list_item':
+                structure['list_items'] += 1
+            elif kind in ('image', 'link'):
+                # 图片语法同样计入链接数
+                structure['link_count'] += 1
+                if kind == 'image':
+                    structure['image_count'] += 1
+                urls.extend(_URL_PATTERN.findall(match.group(f'{kind}_target')))
+            elif kind == 'inline_code':
+                body = match.group('inline_body')
+                if body:
+                    code_blocks.append(body)
+            elif kind == 'url':
+                urls.append(match.group())
+        text_parts.append(content[position:])
+
+        # 代码块中的每一行都视为命令
+        for code in code_blocks:
+            commands.extend(self._code_lines(code))
+
+        return {
+            'text_content': ' '.join(''.join(text_parts).split()),
+            'code_blocks': code_blocks,
+            'commands': list(dict.fromkeys(commands)),  # 去重并保持顺序
+            'urls': urls,
+            'structure': structure
+        }
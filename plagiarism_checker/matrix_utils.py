@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按维度的相似度矩阵（内存映射的float16 .npy）
+
+每个维度（文本、代码、命令、结构、截图、综合）输出一个 n×n 的对称矩阵，
+按学生索引文件中的顺序排列，对角线为1，未比较的作业对（候选筛选或剪枝去掉的）为NaN。
+矩阵以标准 .npy 格式保存，可用 np.load(..., mmap_mode='r') 内存映射后按行列切片，
+热力图、聚类、按学生排名等分析不必解析比较结果JSON；5000名学生每个维度约50MB。
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 矩阵格式版本，格式变化时递增
+MATRIX_VERSION = 1
+
+
+def write_similarity_matrices(output_dir: str, students: List[str], pairs: np.ndarray,
+                              scores: Dict[str, np.ndarray], dtype: str = 'float16',
+                              meta: Dict[str, Any] = None) -> Path:
+    """把作业对得分写为每个维度一个内存映射矩阵，并写出学生索引文件"""
+    path = Path(output_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    n = len(students)
+    rows, cols = pairs[:, 0], pairs[:, 1]
+    for dim, values in scores.items():
+        matrix = np.lib.format.open_memmap(path / f"{dim}.npy", mode='w+', dtype=dtype, shape=(n, n))
+        matrix[:] = np.nan
+        np.fill_diagonal(matrix, 1.0)
+        matrix[rows, cols] = values
+        matrix[cols, rows] = values
+        matrix.flush()
+        del matrix
+    index = dict(meta or {}, version=MATRIX_VERSION, dtype=dtype, dimensions=list(scores.keys()),
+                 students=students)
+    (path / 'students.json').write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding='utf-8')
+    logger.info(f"相似度矩阵已保存: {path} ({n}×{n}, {len(scores)} 个维度, {dtype})")
+    return path
+
+
+class SimilarityMatrices:
+    """只读地内存映射一组相似度矩阵，按学生名切片（切片为矩阵的视图，不复制数据）"""
+
+    def __init__(self, directory: str):
+        self.path = Path(directory)
+        index = json.loads((self.path / 'students.json').read_text(encoding='utf-8'))
+        if index.get('version') != MATRIX_VERSION:
+            raise RuntimeError(f"相似度矩阵版本不符，请重新生成: {self.path}")
+        self.meta = index
+        self.students: List[str] = index['students']
+        self.dimensions: List[str] = index['dimensions']
+        self.position = {student: k for k, student in enumerate(self.students)}
+        self._matrices: Dict[str, np.ndarray] = {}
+
+    def matrix(self, dim: str = 'overall') -> np.ndarray:
+        if dim not in self._matrices:
+            if dim not in self.dimensions:
+                raise KeyError(f"没有 {dim} 维度的矩阵，可用维度: {', '.join(self.dimensions)}")
+            self._matrices[dim] = np.load(self.path / f"{dim}.npy", mmap_mode='r')
+        return self._matrices[dim]
+
+    def row(self, student: str, dim: str = 'overall') -> np.ndarray:
+        """该学生与全部学生的相似度（按students顺序）"""
+        return self.matrix(dim)[self.position[student]]
+
+    def pair(self, student1: str, student2: str, dim: str = 'overall') -> float:
+        return float(self.matrix(dim)[self.position[student1], self.position[student2]])
+
+    def submatrix(self, students: List[str], dim: str = 'overall') -> np.ndarray:
+        """若干学生之间的相似度子矩阵（如聚类或热力图的一组学生）"""
+        index = np.array([self.position[student] for student in students])
+        return np.asarray(self.matrix(dim)[np.ix_(index, index)])
+
+    def most_similar(self, student: str, dim: str = 'overall', k: int = 10) -> List[Tuple[str, float]]:
+        """与该学生最相似的k名学生（不含自己，未比较的作业对不计）"""
+        row = self.row(student, dim).astype(np.float32)
+        row[self.position[student]] = np.nan
+        candidates = np.flatnonzero(~np.isnan(row))
+        order = candidates[np.argsort(-row[candidates], kind='stable')[:k]]
+        return [(self.students[i], float(row[i])) for i in order]
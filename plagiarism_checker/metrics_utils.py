@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标收集
+
+记录批量检查各阶段、各相似度维度的墙钟时间与CPU时间，以及缓存命中、
+被剪枝的作业对、完整计算的作业对等计数，随结果一起导出为JSON，
+不借助性能分析器也能看出一次较慢的运行把时间花在了哪里。
+"""
+
+import json
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict
+
+
+def _timing_entry() -> Dict[str, float]:
+    return {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0}
+
+
+class RunMetrics:
+    """一次运行的计时与计数
+
+    CPU时间为当前进程的CPU时间（time.process_time）；多进程评分时主进程的
+    scoring阶段主要在等待，各维度的评分耗时由工作进程测得后汇总到dimensions中。
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now().isoformat()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.dimensions: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self.counters: Dict[str, int] = {}
+
+    @staticmethod
+    def _record(entries: Dict[str, Dict[str, float]], name: str, wall: float, cpu: float, calls: int = 1):
+        entry = entries.setdefault(name, _timing_entry())
+        entry['wall_seconds'] += wall
+        entry['cpu_seconds'] += cpu
+        entry['calls'] += calls
+
+    @contextmanager
+    def stage(self, name: str):
+        """为一个阶段计时（同名阶段多次进入时累加）"""
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self._record(self.stages, name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    @contextmanager
+    def dimension(self, name: str, phase: str = 'build'):
+        """为一个相似度维度的某个阶段（build构建 / score评分）计时"""
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add_dimension_time(name, phase, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add_dimension_time(self, name: str, phase: str, wall: float, cpu: float, calls: int = 1):
+        """累加在其他位置（如工作进程中）测得的维度耗时"""
+        self._record(self.dimensions.setdefault(name, {}), phase, wall, cpu, calls)
+
+    def count(self, name: str, value: int = 1):
+        """累加计数器"""
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def set_count(self, name: str, value: int):
+        """直接设置计数器（用于取自缓存对象的累计值）"""
+        self.counters[name] = int(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'started_at': self.started_at,
+            'total_wall_seconds': time.perf_counter() - self._wall_start,
+            'total_cpu_seconds': time.process_time() - self._cpu_start,
+            'stages': self.stages,
+            'dimensions': self.dimensions,
+            'counters': self.counters
+        }
+
+    def summary(self, top: int = 5) -> str:
+        """耗时最多的几个阶段（用于日志）"""
+        slowest = sorted(self.stages.items(), key=lambda item: item[1]['wall_seconds'], reverse=True)[:top]
+        return ', '.join(f"{name} {entry['wall_seconds']:.2f}s" for name, entry in slowest)
+
+    def save(self, output_file: str):
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+class ProgressLog:
+    """按百分比节流的进度日志：每跨过step%记一条INFO，其余进度只记DEBUG"""
+
+    def __init__(self, logger: logging.Logger, label: str, total: int, step: int = 10):
+        self.logger = logger
+        self.label = label
+        self.total = total
+        self.step = max(1, step)
+        self.done = 0
+        self._next_percent = self.step
+
+    def advance(self, count: int, detail: str = ''):
+        self.done += count
+        percent = 100 * self.done // self.total if self.total else 100
+        message = f"{self.label}: {self.done}/{self.total} ({percent}%)" + (f" {detail}" if detail else '')
+        if percent >= self._next_percent:
+            self.logger.info(message)
+            self._next_percent = (percent // self.step + 1) * self.step
+        else:
+            self.logger.debug(message)
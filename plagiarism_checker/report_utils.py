@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分页加载的HTML报告
+
+完整比较表不再内联到HTML中，而是按综合相似度全局降序、按固定行数切分为数据分块文件。
+作业对较多时分段排序后归并（外部排序），内存占用以分段行数为限，归并时每个分段只读入一块。
+报告页面中的小型表格脚本按页加载分块，并在当前页内按列排序、筛选。
+分块以 <script> 方式加载，直接双击打开本地HTML文件即可使用。
+"""
+
+import json
+import heapq
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# 分块中每行的列顺序
+CHUNK_COLUMNS = ['student1', 'student2', 'overall', 'text', 'code', 'command', 'structure', 'image', 'is_suspicious']
+
+
+# 分段排序时每行的记录结构（学生下标、各列得分、疑似标记，约60字节）
+_ROW_DTYPE = np.dtype(
+    [('student1', 'i4'), ('student2', 'i4')]
+    + [(column, 'f8') for column in CHUNK_COLUMNS[2:-1]]
+    + [('is_suspicious', 'i1')]
+)
+
+
+def _write_chunk(data_dir: Path, number: int, rows: list):
+    payload = json.dumps(rows, ensure_ascii=False, separators=(',', ':'))
+    chunk_file = data_dir / f'chunk_{number:05d}.js'
+    chunk_file.write_text(f'similarityReport.loaded({number},{payload});\n', encoding='utf-8')
+
+
+def _write_index(data_dir: Path, chunk_count: int, total: int, chunk_size: int, students: List[str]):
+    index = {
+        'chunks': chunk_count,
+        'total': total,
+        'chunk_size': chunk_size,
+        'students': students
+    }
+    (data_dir / 'index.js').write_text(
+        f'similarityReport.index({json.dumps(index, ensure_ascii=False)});\n', encoding='utf-8'
+    )
+
+
+def _clear_chunks(data_dir: Path):
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for old_chunk in data_dir.glob('chunk_*.js'):
+        old_chunk.unlink()
+
+
+def _sorted_records(records: np.ndarray) -> np.ndarray:
+    """按综合相似度降序排列（相同时保持原顺序）"""
+    return records[np.argsort(-records['overall'], kind='stable')]
+
+
+def _write_record_chunk(data_dir: Path, number: int, records: np.ndarray):
+    columns = [records['student1'].tolist(), records['student2'].tolist()]
+    columns += [np.round(records[column], 3).tolist() for column in CHUNK_COLUMNS[2:-1]]
+    columns.append(records['is_suspicious'].tolist())
+    _write_chunk(data_dir, number, [list(row) for row in zip(*columns)])
+
+
+def _iter_run(path: Path, block_rows: int) -> Iterable[tuple]:
+    """逐块读出一个已排序分段的记录"""
+    run = np.load(path, mmap_mode='r')
+    for start in range(0, len(run), block_rows):
+        yield from np.asarray(run[start:start + block_rows]).tolist()
+
+
+def write_report_chunks(comparisons: Iterable[Dict], data_dir: Path, chunk_size: int = 2000,
+                        run_rows: int = 1000000) -> Tuple[int, int]:
+    """将比较结果写入分块数据文件（按综合相似度全局降序），返回 (分块数, 总行数)
+
+    比较结果逐条读入紧凑的记录数组，不保留结果字典。每累积run_rows行排序后写为临时分段文件，
+    最后逐块归并各分段写出分块，内存占用以run_rows行为限；结果与整体稳定排序一致。
+    """
+    _clear_chunks(data_dir)
+    students: Dict[str, int] = {}
+    run_rows = max(1, run_rows)
+    buffer = np.empty(min(run_rows, 4096), dtype=_ROW_DTYPE)
+    filled = 0
+    total = 0
+    with tempfile.TemporaryDirectory(prefix='.sort_', dir=data_dir) as run_dir:
+        runs = []
+        for comp in comparisons:
+            sim = comp['similarities']
+            buffer[filled] = (
+                students.setdefault(comp['student1'], len(students)),
+                students.setdefault(comp['student2'], len(students)),
+                *[sim[column] for column in CHUNK_COLUMNS[2:-1]],
+                1 if comp['is_suspicious'] else 0
+            )
+            filled += 1
+            total += 1
+            if filled == len(buffer) < run_rows:
+                # 按需扩大缓冲区，最多run_rows行
+                grow = min(len(buffer), run_rows - len(buffer))
+                buffer = np.concatenate([buffer, np.empty(grow, dtype=_ROW_DTYPE)])
+            elif filled == len(buffer):
+                runs.append(Path(run_dir) / f'run_{len(runs):05d}.npy')
+                np.save(runs[-1], _sorted_records(buffer))
+                filled = 0
+
+        if not runs:
+            # 全部作业对一次放得下时直接在内存中排序
+            records = _sorted_records(buffer[:filled])
+            chunks = (records[start:start + chunk_size] for start in range(0, total, chunk_size))
+        else:
+            if filled:
+                runs.append(Path(run_dir) / f'run_{len(runs):05d}.npy')
+                np.save(runs[-1], _sorted_records(buffer[:filled]))
+            del buffer
+            # 各分段内已稳定排序，heapq.merge对相同键保持分段先后，整体仍为稳定排序
+            overall_index = CHUNK_COLUMNS.index('overall')
+            merged = heapq.merge(*[_iter_run(path, chunk_size) for path in runs],
+                                 key=lambda row: -row[overall_index])
+
+            def merged_chunks():
+                rows = []
+                for row in merged:
+                    rows.append(row)
+                    if len(rows) == chunk_size:
+                        yield np.array(rows, dtype=_ROW_DTYPE)
+                        rows = []
+                if rows:
+                    yield np.array(rows, dtype=_ROW_DTYPE)
+            chunks = merged_chunks()
+
+        chunk_count = 0
+        for chunk in chunks:
+            _write_record_chunk(data_dir, chunk_count, chunk)
+            chunk_count += 1
+    _write_index(data_dir, chunk_count, total, chunk_size, list(students.keys()))
+    return chunk_count, total
+
+
+def write_report_chunks_from_arrays(students: List[str], pairs: np.ndarray, scores: Dict[str, np.ndarray],
+                                    suspicious: np.ndarray, data_dir: Path,
+                                    chunk_size: int = 2000) -> Tuple[int, int]:
+    """由作业对下标与各列得分数组写入分块数据（逐块向量化取整）
+
+    各行按综合相似度全局降序排列（相同时保持原顺序），第一页即全体作业对中最相似的部分。
+    排序在内存中进行，供得分已在内存中的场合（如得分存档）使用。
+    """
+    _clear_chunks(data_dir)
+    total = len(pairs)
+    order = np.argsort(-scores['overall'], kind='stable')
+    chunk_count = 0
+    for start in range(0, total, chunk_size):
+        rows = order[start:start + chunk_size]
+        columns = [pairs[rows, 0].tolist(), pairs[rows, 1].tolist()]
+        columns += [np.round(scores[column][rows], 3).tolist() for column in CHUNK_COLUMNS[2:-1]]
+        columns.append(suspicious[rows].astype(np.int8).tolist())
+        _write_chunk(data_dir, chunk_count, [list(row) for row in zip(*columns)])
+        chunk_count += 1
+    _write_index(data_dir, chunk_count, total, chunk_size, list(students))
+    return chunk_count, total
+
+
+def paginated_table_html(data_dir_name: str) -> str:
+    """分页表格的HTML与脚本"""
+    return """
+    <h2>全部比较结果（分页加载）</h2>
+    <p class="pager-note">各页按综合相似度全局降序排列；点击列标题与按学生筛选只作用于当前页。</p>
+    <div class="pager">
+        <button id="page-prev">上一页</button>
+        <span id="page-info">加载中...</span>
+        <button id="page-next">下一页</button>
+        <input id="page-filter" placeholder="按学生筛选当前页">
+    </div>
+    <table id="all-comparisons">
+        <thead>
+            <tr>
+                <th data-col="0">学生1</th>
+                <th data-col="1">学生2</th>
+                <th data-col="2">综合相似度</th>
+                <th data-col="3">文本</th>
+                <th data-col="4">代码</th>
+                <th data-col="5">命令</th>
+                <th data-col="6">结构</th>
+                <th data-col="7">截图</th>
+                <th data-col="8">状态</th>
+            </tr>
+        </thead>
+        <tbody></tbody>
+    </table>
+    <script>
+    var similarityReport = (function () {
+        var dataDir = "__DATA_DIR__";
+        var meta = null, page = 0, rows = [], sortCol = 2, sortDesc = true;
+        function load(src) {
+            var script = document.createElement('script');
+            script.src = dataDir + '/' + src;
+            document.body.appendChild(script);
+        }
+        function esc(text) {
+            return String(text).replace(/[&<>"]/g, function (c) {
+                return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c];
+            });
+        }
+        function statusOf(row) {
+            return row[8] ? '🚨 疑似抄袭' : (row[2] < 0.3 ? '✅ 正常' : '⚠️ 需关注');
+        }
+        function cssOf(value) {
+            return value >= 0.7 ? 'high-sim' : (value >= 0.5 ? 'medium-sim' : 'low-sim');
+        }
+        function render() {
+            var filter = document.getElementById('page-filter').value.trim();
+            var view = rows.slice();
+            if (filter) {
+                view = view.filter(function (row) {
+                    return meta.students[row[0]].indexOf(filter) >= 0 || meta.students[row[1]].indexOf(filter) >= 0;
+                });
+            }
+            view.sort(function (a, b) {
+                var x = sortCol < 2 ? meta.students[a[sortCol]] : a[sortCol];
+                var y = sortCol < 2 ? meta.students[b[sortCol]] : b[sortCol];
+                return (x < y ? -1 : x > y ? 1 : 0) * (sortDesc ? -1 : 1);
+            });
+            var html = [];
+            view.forEach(function (row) {
+                html.push('<tr class="' + cssOf(row[2]) + '"><td>' + esc(meta.students[row[0]]) + '</td><td>' +
+                    esc(meta.students[row[1]]) + '</td><td>' + row.slice(2, 8).map(function (v) {
+                        return v.toFixed(3);
+                    }).join('</td><td>') + '</td><td>' + statusOf(row) + '</td></tr>');
+            });
+            document.querySelector('#all-comparisons tbody').innerHTML = html.join('');
+            document.getElementById('page-info').textContent =
+                '第 ' + (page + 1) + ' / ' + Math.max(meta.chunks, 1) + ' 页（共 ' + meta.total + ' 对）';
+        }
+        function show(k) {
+            if (!meta || k < 0 || k >= meta.chunks) { return; }
+            page = k;
+            document.getElementById('page-info').textContent = '加载中...';
+            load('chunk_' + ('0000' + k).slice(-5) + '.js');
+        }
+        document.getElementById('page-prev').onclick = function () { show(page - 1); };
+        document.getElementById('page-next').onclick = function () { show(page + 1); };
+        document.getElementById('page-filter').oninput = render;
+        document.querySelectorAll('#all-comparisons th').forEach(function (th) {
+            th.onclick = function () {
+                var col = parseInt(th.getAttribute('data-col'), 10);
+                sortDesc = col === sortCol ? !sortDesc : col >= 2;
+                sortCol = col;
+                render();
+            };
+        });
+        return {
+            index: function (data) { meta = data; if (meta.chunks) { show(0); } else { render(); } },
+            loaded: function (k, data) { if (k === page) { rows = data; render(); } }
+        };
+    })();
+    </script>
+    <script src="__DATA_DIR__/index.js"></script>
+""".replace('__DATA_DIR__', data_dir_name)
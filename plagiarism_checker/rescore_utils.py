@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+作业对得分存档与重新加权
+
+批量检查时把每个作业对各维度（文本、代码、命令、结构、截图）的得分保存为紧凑的数组
+（作业对为int32下标，得分为float64，与原运行的综合相似度和疑似判定逐位一致）。调整权重或阈值时直接在存档上向量化地重新计算
+综合相似度、疑似标记、统计信息和直方图，不必重新计算任何一个维度的相似度。
+"""
+
+import json
+import logging
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from stream_utils import ScoreHistogram
+from report_utils import write_report_chunks_from_arrays
+
+logger = logging.getLogger(__name__)
+
+# 存档格式版本，存档内容变化时递增
+ARCHIVE_VERSION = 1
+
+# 存档的相似度维度（综合相似度由权重重新计算，不存档）
+SCORE_DIMENSIONS = ['text', 'code', 'command', 'structure', 'image']
+
+
+class ScoreArchiveWriter:
+    """边计算边累积作业对得分（紧凑数组，不为每一对保留字典）"""
+
+    def __init__(self):
+        self.pairs = array('i')
+        self.scores = {dim: array('d') for dim in SCORE_DIMENSIONS}
+
+    def __len__(self) -> int:
+        return len(self.pairs) // 2
+
+    def add(self, pairs: List[Tuple[int, int]], scores: List[Dict[str, float]]):
+        for (i, j), similarities in zip(pairs, scores):
+            self.pairs.append(i)
+            self.pairs.append(j)
+            for dim in SCORE_DIMENSIONS:
+                self.scores[dim].append(similarities[dim])
+
+    def extend(self, archive: 'ScoreArchive'):
+        """追加另一份存档的全部作业对（学生下标须一致，如同一快照的各分片）"""
+        self.pairs.extend(archive.pairs.astype(np.int32).ravel().tolist())
+        for dim in SCORE_DIMENSIONS:
+            self.scores[dim].extend(archive.scores[dim].tolist())
+
+    def to_archive(self, students: List[str], meta: Dict[str, Any]) -> 'ScoreArchive':
+        return ScoreArchive(
+            students,
+            np.frombuffer(self.pairs, dtype=np.int32).reshape(-1, 2),
+            {dim: np.frombuffer(values, dtype=np.float64) for dim, values in self.scores.items()},
+            meta
+        )
+
+
+class ScoreArchive:
+    """一次运行的全部作业对维度得分及其运行参数（权重、阈值、是否剪枝等）"""
+
+    def __init__(self, students: List[str], pairs: np.ndarray, scores: Dict[str, np.ndarray],
+                 meta: Dict[str, Any] = None):
+        self.students = students
+        self.pairs = pairs
+        self.scores = scores
+        self.meta = meta or {}
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    @staticmethod
+    def directory(archive_dir: str, homework_type: str) -> Path:
+        return Path(archive_dir) / homework_type
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.savez(path / 'scores.npz', pairs=self.pairs, **self.scores)
+        (path / 'students.json').write_text(json.dumps(self.students, ensure_ascii=False), encoding='utf-8')
+        meta = dict(self.meta, version=ARCHIVE_VERSION, pair_count=len(self), saved_at=datetime.now().isoformat())
+        (path / 'meta.json').write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding='utf-8')
+        logger.info(f"作业对得分存档已保存: {path} ({len(self)} 对)")
+
+    @classmethod
+    def load(cls, path: Path) -> 'ScoreArchive':
+        path = Path(path)
+        if not (path / 'meta.json').exists():
+            raise FileNotFoundError(f"没有找到作业对得分存档: {path}")
+        meta = json.loads((path / 'meta.json').read_text(encoding='utf-8'))
+        if meta.get('version') != ARCHIVE_VERSION:
+            raise RuntimeError(f"作业对得分存档版本不符，请重新运行批量检查: {path}")
+        students = json.loads((path / 'students.json').read_text(encoding='utf-8'))
+        with np.load(path / 'scores.npz') as arrays:
+            pairs = arrays['pairs']
+            scores = {dim: arrays[dim] for dim in SCORE_DIMENSIONS}
+        return cls(students, pairs, scores, meta)
+
+    def overall(self, weights: Dict[str, float]) -> np.ndarray:
+        """按给定权重向量化地计算全部作业对的综合相似度"""
+        overall = np.zeros(len(self), dtype=np.float64)
+        # 与评分时相同的累加顺序，权重不变时结果与原运行一致
+        for dim, weight in weights.items():
+            overall += self.scores[dim] * weight
+        return overall
+
+    def similarities(self, k: int, overall: np.ndarray) -> Dict[str, float]:
+        similarities = {dim: float(self.scores[dim][k]) for dim in SCORE_DIMENSIONS}
+        similarities['overall'] = float(overall[k])
+        return similarities
+
+    def comparison(self, k: int, overall: np.ndarray, threshold: float) -> Dict[str, Any]:
+        """第k对的比较结果（与流式比较结果字段一致）"""
+        i, j = self.pairs[k]
+        return {
+            'student1': self.students[i],
+            'student2': self.students[j],
+            'similarities': self.similarities(k, overall),
+            'is_suspicious': bool(overall[k] >= threshold)
+        }
+
+    def write_report_chunks(self, overall: np.ndarray, threshold: float, data_dir: Path,
+                            chunk_size: int = 2000) -> Tuple[int, int]:
+        """把全部作业对直接由数组写为报告的分块数据（不逐对构造比较结果字典）"""
+        return write_report_chunks_from_arrays(
+            self.students, self.pairs, dict(self.scores, overall=overall), overall >= threshold,
+            data_dir, chunk_size
+        )
+
+
+def dimension_summary(values: np.ndarray, histogram: ScoreHistogram) -> Dict[str, float]:
+    """与ComparisonStream统计字段一致的单维度摘要（分位数同样由直方图估计）"""
+    if not len(values):
+        return {'count': 0, 'mean': 0.0, 'std': 0.0, 'min': 0.0, 'max': 0.0,
+                'q1': 0.0, 'median': 0.0, 'q3': 0.0}
+    values = values.astype(np.float64)
+    summary = {'count': int(len(values)), 'mean': float(values.mean()), 'std': float(values.std()),
+               'min': float(values.min()), 'max': float(values.max())}
+    quantiles = histogram.quantiles([0.25, 0.5, 0.75])
+    q1, median, q3 = [min(max(value, summary['min']), summary['max']) for value in quantiles]
+    summary.update({'q1': q1, 'median': median, 'q3': q3})
+    return summary
+
+
+def histogram_of(values: np.ndarray, bins: int = 200) -> ScoreHistogram:
+    """向量化地构建与ScoreHistogram.add逐个累加相同的直方图"""
+    histogram = ScoreHistogram(bins)
+    index = np.clip((values.astype(np.float64) * bins).astype(np.int64), 0, bins - 1)
+    histogram.counts = np.bincount(index, minlength=bins).astype(np.int64)
+    return histogram
+
+
+def rescore(archive: ScoreArchive, weights: Dict[str, float], threshold: float,
+            top_k: int = 500, overall: np.ndarray = None) -> Dict[str, Any]:
+    """在存档上按新的权重与阈值重新计算疑似对、前k名、统计信息与直方图"""
+    if overall is None:
+        overall = archive.overall(weights)
+    columns = dict(archive.scores, overall=overall)
+    histograms = {dim: histogram_of(values) for dim, values in columns.items()}
+    dimension_statistics = {dim: dimension_summary(values, histograms[dim]) for dim, values in columns.items()}
+
+    # 疑似对与流式结果一样按作业对顺序列出，前k名按综合相似度降序
+    suspicious = np.flatnonzero(overall >= threshold)
+    top = np.argpartition(-overall, top_k - 1)[:top_k] if len(overall) > top_k else np.arange(len(overall))
+    top = top[np.lexsort((top, -overall[top]))]
+
+    overall_summary = dimension_statistics['overall']
+    return {
+        'high_similarity_pairs': [archive.comparison(k, overall, threshold) for k in suspicious],
+        'top_comparisons': [archive.comparison(k, overall, threshold) for k in top],
+        'statistics': {
+            'total_pairs': archive.meta.get('total_pairs', len(archive)),
+            'total_comparisons': int(len(overall)),
+            'high_similarity_count': int(len(suspicious)),
+            'avg_similarity': overall_summary['mean'],
+            'max_similarity': overall_summary['max'],
+            'min_similarity': overall_summary['min'],
+            'std_similarity': overall_summary['std'],
+            'dimension_statistics': dimension_statistics
+        },
+        'score_histograms': {
+            'bins': histograms['overall'].bins,
+            'counts': {dim: histogram.counts.tolist() for dim, histogram in histograms.items()}
+        }
+    }
+
+
+def threshold_sweep(overall: np.ndarray, thresholds: List[float]) -> List[Dict[str, Any]]:
+    """各阈值下的疑似对数量与占比（排序后二分查找）"""
+    ordered = np.sort(overall)
+    total = len(ordered)
+    sweep = []
+    for threshold in thresholds:
+        count = int(total - np.searchsorted(ordered, threshold, side='left'))
+        sweep.append({'threshold': threshold, 'suspicious': count,
+                      'fraction': count / total if total else 0.0})
+    return sweep
+
+
+def parse_weights(spec: Optional[str], base: Dict[str, float]) -> Dict[str, float]:
+    """解析 "text=0.5,code=0.3" 形式的权重（未列出的维度沿用base中的权重）"""
+    weights = dict(base)
+    if not spec:
+        return weights
+    for item in spec.split(','):
+        name, _, value = item.partition('=')
+        name = name.strip()
+        if name not in SCORE_DIMENSIONS or not value.strip():
+            raise ValueError(f"无效的权重项 {item!r}，应为 维度=权重，维度取 {', '.join(SCORE_DIMENSIONS)}")
+        weights[name] = float(value)
+    return weights
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中文分词缓存层
+
+每份文本在一次运行中只分词一次，结果按“文本哈希 + jieba词典版本”持久化到磁盘，
+后续运行中未修改的作业可直接复用分词结果。
+
+jieba只在确实需要分词时才导入；词典前缀表以pickle形式保存在缓存目录中，
+加载速度明显快于jieba自带的marshal缓存，且不受系统临时目录清理的影响。
+"""
+
+import os
+import sys
+import gc
+import pickle
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_DICT_VERSION = None
+
+
+def _jieba():
+    """延迟导入jieba"""
+    import jieba
+    return jieba
+
+
+def _load_dictionary_cache(cache_file: Path) -> bool:
+    """从序列化缓存加载jieba前缀词典，成功返回True"""
+    jieba = _jieba()
+    try:
+        # 反序列化会创建大量小对象，期间关闭循环垃圾回收
+        gc.disable()
+        try:
+            with open(cache_file, 'rb') as f:
+                freq, total = pickle.load(f)
+        finally:
+            gc.enable()
+    except (OSError, ValueError, pickle.UnpicklingError) as e:
+        logger.warning(f"读取jieba词典缓存失败 {cache_file}: {e}")
+        return False
+    jieba.dt.FREQ, jieba.dt.total = freq, total
+    jieba.dt.initialized = True
+    return True
+
+
+def _save_dictionary_cache(cache_file: Path):
+    """将已加载的jieba前缀词典写入序列化缓存"""
+    jieba = _jieba()
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, 'wb') as f:
+            pickle.dump((jieba.dt.FREQ, jieba.dt.total), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.warning(f"写入jieba词典缓存失败 {cache_file}: {e}")
+
+
+def warm_up_jieba(cache_dir: Optional[str] = None):
+    """预加载jieba词典（进程内只加载一次，提供cache_dir时优先使用序列化缓存）"""
+    jieba = _jieba()
+    if jieba.dt.initialized:
+        return
+    cache_file = Path(cache_dir) / f"jieba-{get_dictionary_version()}.pkl" if cache_dir else None
+    if cache_file is not None and cache_file.exists() and _load_dictionary_cache(cache_file):
+        return
+    jieba.initialize()
+    if cache_file is not None:
+        _save_dictionary_cache(cache_file)
+
+
+def _jieba_version_and_dictionary():
+    """jieba版本与自定义词典路径（未导入jieba时只读取包元数据，不触发导入）"""
+    if 'jieba' in sys.modules:
+        jieba = sys.modules['jieba']
+        return jieba.__version__, jieba.dt.dictionary
+    from importlib.metadata import version
+    return version('jieba'), None
+
+
+def get_dictionary_version() -> str:
+    """返回当前jieba词典版本标识（jieba版本 + 词典文件摘要）"""
+    global _DICT_VERSION
+    if _DICT_VERSION is None:
+        jieba_version, dict_path = _jieba_version_and_dictionary()
+        digest = hashlib.md5(jieba_version.encode('utf-8'))
+        if dict_path and os.path.exists(dict_path):
+            with open(dict_path, 'rb') as f:
+                digest.update(f.read())
+        else:
+            digest.update(b'default')
+        _DICT_VERSION = digest.hexdigest()[:12]
+    return _DICT_VERSION
+
+
+def segment_text(text: str) -> str:
+    """对单段文本分词，返回以空格连接的结果"""
+    warm_up_jieba()
+    return ' '.join(_jieba().cut(text))
+
+
+class SegmentCache:
+    """分词结果缓存（内存 + 可选的磁盘持久化）"""
+
+    def __init__(self, cache_dir: Optional[str] = None, workers: int = 1):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.workers = max(1, workers)
+        self.memory: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def text_key(self, text: str) -> str:
+        """生成缓存键：文本哈希 + 词典版本"""
+        text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        return f"{text_hash}-{get_dictionary_version()}"
+
+    def _cache_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.txt"
+
+    def _load(self, key: str) -> Optional[str]:
+        if key in self.memory:
+            return self.memory[key]
+        if self.cache_dir is None:
+            return None
+        path = self._cache_path(key)
+        if not path.exists():
+            return None
+        try:
+            segmented = path.read_text(encoding='utf-8')
+        except OSError as e:
+            logger.warning(f"读取分词缓存失败 {path}: {e}")
+            return None
+        self.memory[key] = segmented
+        return segmented
+
+    def _store(self, key: str, segmented: str):
+        self.memory[key] = segmented
+        if self.cache_dir is None:
+            return
+        path = self._cache_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再替换，避免并发运行读到半截内容
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(segmented, encoding='utf-8')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入分词缓存失败 {path}: {e}")
+
+    def segment(self, text: str) -> str:
+        """分词单段文本（命中缓存时直接返回）"""
+        if not text:
+            return ''
+        key = self.text_key(text)
+        segmented = self._load(key)
+        if segmented is not None:
+            self.hits += 1
+            return segmented
+        self.misses += 1
+        warm_up_jieba(self.cache_dir)
+        segmented = segment_text(text)
+        self._store(key, segmented)
+        return segmented
+
+    def segment_many(self, texts: List[str]) -> List[str]:
+        """批量分词，相同文本只处理一次，未命中部分可在多进程中并行分词"""
+        keys = [self.text_key(text) if text else None for text in texts]
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key is None or key in pending:
+                continue
+            if self._load(key) is not None:
+                self.hits += 1
+            else:
+                pending[key] = text
+        self.misses += len(pending)
+
+        if pending:
+            # 主进程先加载词典，fork出的子进程直接继承已加载的词典
+            warm_up_jieba(self.cache_dir)
+            pending_keys = list(pending.keys())
+            pending_texts = [pending[key] for key in pending_keys]
+            if self.workers > 1 and len(pending_texts) > 1:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up_jieba,
+                                         initargs=(self.cache_dir,)) as executor:
+                    chunksize = max(1, len(pending_texts) // (self.workers * 4))
+                    segmented_list = list(executor.map(segment_text, pending_texts, chunksize=chunksize))
+            else:
+                segmented_list = [segment_text(text) for text in pending_texts]
+            for key, segmented in zip(pending_keys, segmented_list):
+                self._store(key, segmented)
+
+        return [self.memory[key] if key is not None else '' for key in keys]
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分片查重
+
+把全体作业两两组成的上三角作业对矩阵按学生切成 blocks×blocks 的块，
+上三角的每个块（含对角块）为一个分片任务，按编号轮流分给各分片。
+所有分片从共享文件系统上的同一份特征快照计算，各自写出比较结果与流式统计，
+最后由合并步骤汇总为与单机运行相同的结果、报告和统计。
+"""
+
+import os
+import re
+import math
+import time
+import pickle
+import socket
+import hashlib
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 快照格式版本，快照内容变化时递增
+SNAPSHOT_VERSION = 1
+
+_SHARD_PATTERN = re.compile(r'^shard-(\d+)-of-(\d+)\.pkl$')
+
+
+class ShardSpec:
+    """分片规格 "k/n"：共n个分片中的第k个（从1开始）"""
+
+    def __init__(self, index: int, count: int, tiles_per_shard: int = 4):
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"无效的分片规格: {index}/{count}")
+        self.index = index
+        self.count = count
+        self.tiles_per_shard = tiles_per_shard
+
+    @classmethod
+    def parse(cls, spec: str, tiles_per_shard: int = 4) -> 'ShardSpec':
+        match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', spec)
+        if not match:
+            raise ValueError(f"分片规格应为 k/n 形式（如 3/8）: {spec}")
+        return cls(int(match.group(1)), int(match.group(2)), tiles_per_shard)
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    @property
+    def name(self) -> str:
+        return f"shard-{self.index:04d}-of-{self.count:04d}"
+
+    def blocks(self, n: int) -> int:
+        """学生切分的块数：上三角块数不少于 tiles_per_shard×分片数（便于各分片负载均衡）"""
+        target = self.tiles_per_shard * self.count
+        blocks = max(1, math.ceil((math.sqrt(8 * target + 1) - 1) / 2))
+        return min(blocks, max(1, n))
+
+    def tiles(self, n: int) -> List[Tuple[int, int, int, int]]:
+        """本分片负责的块 [(行起点, 行终点, 列起点, 列终点)]"""
+        blocks = self.blocks(n)
+        bounds = np.linspace(0, n, blocks + 1).astype(np.int64).tolist()
+        tiles = [(a, b) for a in range(blocks) for b in range(a, blocks)]
+        return [
+            (bounds[a], bounds[a + 1], bounds[b], bounds[b + 1])
+            for t, (a, b) in enumerate(tiles) if t % self.count == self.index - 1
+        ]
+
+    def tile_pairs(self, n: int, candidates: Optional[np.ndarray] = None) -> Iterator[List[Tuple[int, int]]]:
+        """逐块产出本分片的作业对 (i, j), i < j（内存占用以单个块为限）
+
+        candidates为None时为块内全部作业对，否则只取落在块内的候选对。
+        """
+        if candidates is not None:
+            candidates = np.asarray(candidates, dtype=np.int64).reshape(-1, 2)
+        for row_start, row_end, col_start, col_end in self.tiles(n):
+            if candidates is None:
+                yield [(i, j) for i in range(row_start, row_end) for j in range(max(col_start, i + 1), col_end)]
+                continue
+            inside = _inside_tile(candidates, row_start, row_end, col_start, col_end)
+            yield [tuple(pair) for pair in candidates[inside].tolist()]
+
+    def pair_count(self, n: int, candidates: Optional[np.ndarray] = None) -> int:
+        """本分片的作业对数（与tile_pairs产出的总数一致，不生成作业对）"""
+        if candidates is not None:
+            candidates = np.asarray(candidates, dtype=np.int64).reshape(-1, 2)
+        total = 0
+        for row_start, row_end, col_start, col_end in self.tiles(n):
+            if candidates is None:
+                rows = np.arange(row_start, row_end)
+                total += int(np.clip(col_end - np.maximum(col_start, rows + 1), 0, None).sum())
+            else:
+                total += int(_inside_tile(candidates, row_start, row_end, col_start, col_end).sum())
+        return total
+
+
+def _inside_tile(candidates: np.ndarray, row_start: int, row_end: int, col_start: int, col_end: int) -> np.ndarray:
+    """落在块内的候选对掩码"""
+    return ((candidates[:, 0] >= row_start) & (candidates[:, 0] < row_end)
+            & (candidates[:, 1] >= col_start) & (candidates[:, 1] < col_end))
+
+
+def snapshot_id(students: List[str], hashes: List[str], settings: Dict[str, Any]) -> str:
+    """由学生、作业内容与相关配置得到的快照标识（输入相同则相同）"""
+    digest = hashlib.sha1()
+    digest.update(repr(sorted(settings.items())).encode('utf-8'))
+    for student, value in zip(students, hashes):
+        digest.update(f"{student}\0{value}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _atomic_pickle(obj: Any, path: Path):
+    """先写临时文件再改名，其他机器不会读到写了一半的文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+class ShardWorkspace:
+    """共享目录中的特征快照与各分片输出"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    @property
+    def snapshot_file(self) -> Path:
+        return self.directory / 'snapshot.pkl'
+
+    @property
+    def shards_dir(self) -> Path:
+        return self.directory / 'shards'
+
+    @property
+    def lock_file(self) -> Path:
+        return self.directory / 'snapshot.lock'
+
+    def has_snapshot(self) -> bool:
+        return self.snapshot_file.exists()
+
+    @contextmanager
+    def snapshot_lock(self, timeout: float, poll: float = 1.0):
+        """独占生成快照的锁：以O_EXCL创建锁文件，同时启动的其他分片等待锁释放"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + timeout
+        waiting = False
+        while True:
+            try:
+                fd = os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(
+                        f"等待特征快照锁超时: {self.lock_file}（若没有分片正在生成快照，请删除该文件）"
+                    )
+                if not waiting:
+                    logger.info(f"特征快照正由其他分片生成，等待锁释放: {self.lock_file}")
+                    waiting = True
+                time.sleep(poll)
+        try:
+            os.write(fd, f"{socket.gethostname()} {os.getpid()}\n".encode('utf-8'))
+            os.close(fd)
+            yield
+        finally:
+            self.lock_file.unlink(missing_ok=True)
+
+    def save_snapshot(self, snapshot: Dict[str, Any]):
+        snapshot = dict(snapshot, version=SNAPSHOT_VERSION)
+        _atomic_pickle(snapshot, self.snapshot_file)
+        logger.info(f"特征快照已保存: {self.snapshot_file}")
+
+    def load_snapshot(self) -> Dict[str, Any]:
+        with open(self.snapshot_file, 'rb') as f:
+            snapshot = pickle.load(f)
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise RuntimeError(f"特征快照版本不符，请重新生成: {self.snapshot_file}")
+        return snapshot
+
+    def comparisons_file(self, shard: ShardSpec) -> Path:
+        return self.shards_dir / f"{shard.name}.jsonl"
+
+    def scores_dir(self, shard: ShardSpec) -> Path:
+        return self.shards_dir / f"{shard.name}_scores"
+
+    def save_shard(self, shard: ShardSpec, output: Dict[str, Any]):
+        """分片完成后写出其状态文件（比较结果文件应已写完，状态文件存在即表示分片完成）"""
+        _atomic_pickle(output, self.shards_dir / f"{shard.name}.pkl")
+
+    def load_shards(self, snapshot: str) -> List[Tuple[ShardSpec, Dict[str, Any]]]:
+        """读取当前快照的全部分片输出并检查完整性（分片数一致、无缺失）；其他快照留下的输出被忽略"""
+        found = {}
+        if self.shards_dir.exists():
+            for path in sorted(self.shards_dir.iterdir()):
+                match = _SHARD_PATTERN.match(path.name)
+                if not match:
+                    continue
+                with open(path, 'rb') as f:
+                    output = pickle.load(f)
+                if output.get('snapshot_id') != snapshot:
+                    logger.warning(f"忽略来自另一份特征快照的分片输出: {path.name}")
+                    continue
+                found[(int(match.group(1)), int(match.group(2)))] = output
+        if not found:
+            raise RuntimeError(f"没有找到当前特征快照的分片输出: {self.shards_dir}")
+        counts = {count for _, count in found}
+        if len(counts) > 1:
+            raise RuntimeError(f"分片输出的分片数不一致: {sorted(counts)}")
+        count = counts.pop()
+        missing = [index for index in range(1, count + 1) if (index, count) not in found]
+        if missing:
+            raise RuntimeError(f"缺少分片 {', '.join(f'{index}/{count}' for index in missing)} 的输出")
+        return [(ShardSpec(index, count), found[(index, count)]) for index in range(1, count + 1)]
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式比较结果输出
+
+作业对结果边计算边按行写入文件，内存中只保留疑似抄袭的作业对和有界的前k名，
+统计量（均值、标准差、最值）用增量累加器计算，内存占用与作业对数量无关。
+"""
+
+import json
+import heapq
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class RunningStats:
+    """增量统计（Welford算法）"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'RunningStats'):
+        """合并另一个累加器（Chan等人的并行合并公式）"""
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self._m2 = other.count, other.mean, other._m2
+            self.min, self.max = other.min, other.max
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        """总体标准差（与np.std一致）"""
+        return math.sqrt(self._m2 / self.count) if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        if not self.count:
+            return {'count': 0, 'mean': 0.0, 'std': 0.0, 'min': 0.0, 'max': 0.0}
+        return {'count': self.count, 'mean': self.mean, 'std': self.std,
+                'min': self.min, 'max': self.max}
+
+
+class ScoreHistogram:
+    """[0, 1] 区间上的定宽直方图，用于流式估计分位数和绘图"""
+
+    def __init__(self, bins: int = 200):
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def add(self, value: float):
+        index = int(value * self.bins)
+        self.counts[min(max(index, 0), self.bins - 1)] += 1
+
+    def merge(self, other: 'ScoreHistogram'):
+        if other.bins != self.bins:
+            raise ValueError(f"直方图分箱数不同: {self.bins} != {other.bins}")
+        self.counts += other.counts
+
+    @property
+    def edges(self) -> np.ndarray:
+        return np.linspace(0.0, 1.0, self.bins + 1)
+
+    def quantiles(self, qs: List[float]) -> List[float]:
+        """由累计频次估计分位数（精度为一个分箱宽度）"""
+        total = self.counts.sum()
+        if total == 0:
+            return [0.0 for _ in qs]
+        cumulative = np.cumsum(self.counts)
+        edges = self.edges
+        result = []
+        for q in qs:
+            index = int(np.searchsorted(cumulative, q * total, side='left'))
+            index = min(index, self.bins - 1)
+            # 在分箱内线性插值
+            before = cumulative[index - 1] if index > 0 else 0
+            inside = self.counts[index]
+            fraction = (q * total - before) / inside if inside else 0.0
+            result.append(float(edges[index] + fraction * (edges[index + 1] - edges[index])))
+        return result
+
+
+class TopK:
+    """按综合相似度保留前k个作业对（最小堆）"""
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap = []
+        self._counter = 0
+
+    def add(self, score: float, item: Any):
+        # 计数器保证分数相同时按到达顺序比较，不比较item本身
+        self._counter += 1
+        entry = (score, -self._counter, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def merge(self, other: 'TopK'):
+        for score, _, item in sorted(other._heap, reverse=True):
+            self.add(score, item)
+
+    def items(self) -> List[Any]:
+        """按分数降序返回"""
+        return [item for _, _, item in sorted(self._heap, reverse=True)]
+
+
+class ComparisonWriter:
+    """按行（JSON Lines）写出作业对比较结果"""
+
+    def __init__(self, output_file: Optional[str]):
+        self.output_file = output_file
+        self._file = open(output_file, 'w', encoding='utf-8') if output_file else None
+        self.count = 0
+
+    def write(self, comparison: Dict[str, Any]):
+        self.count += 1
+        if self._file is not None:
+            self._file.write(json.dumps(comparison, ensure_ascii=False))
+            self._file.write('\n')
+
+    def append_file(self, comparisons_file: str):
+        """把另一个结果文件的全部行原样追加到本文件"""
+        with open(comparisons_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    self.count += 1
+                    if self._file is not None:
+                        self._file.write(line if line.endswith('\n') else line + '\n')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'ComparisonWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_comparisons(comparisons_file: str):
+    """逐行读取比较结果文件"""
+    with open(comparisons_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ComparisonStream:
+    """汇总流式比较结果：写出每一对、保留疑似对与前k名、累计各维度统计"""
+
+    def __init__(self, threshold: float, output_file: Optional[str] = None, top_k: int = 500,
+                 dimensions: List[str] = None):
+        self.threshold = threshold
+        self.writer = ComparisonWriter(output_file)
+        self.top = TopK(top_k)
+        self.dimensions = dimensions or ['text', 'code', 'command', 'structure', 'image', 'overall']
+        self.stats = {dim: RunningStats() for dim in self.dimensions}
+        self.histograms = {dim: ScoreHistogram() for dim in self.dimensions}
+        self.suspicious: List[Dict[str, Any]] = []
+
+    def add(self, student1: str, student2: str, similarities: Dict[str, float]) -> Dict[str, Any]:
+        """记录一对作业的比较结果，返回结果字典"""
+        comparison = {
+            'student1': student1,
+            'student2': student2,
+            'similarities': similarities,
+            'is_suspicious': bool(similarities['overall'] >= self.threshold)
+        }
+        self.writer.write(comparison)
+        self.top.add(similarities['overall'], comparison)
+        for dim, stats in self.stats.items():
+            if dim in similarities:
+                stats.add(similarities[dim])
+                self.histograms[dim].add(similarities[dim])
+        if comparison['is_suspicious']:
+            self.suspicious.append(comparison)
+        return comparison
+
+    def close(self):
+        self.writer.close()
+
+    def merge(self, other: 'ComparisonStream', comparisons_file: str = None):
+        """合并另一段（如另一个分片）的流式结果；comparisons_file为其比较结果文件，行会追加到本文件"""
+        if comparisons_file:
+            self.writer.append_file(comparisons_file)
+        else:
+            self.writer.count += other.writer.count
+        self.top.merge(other.top)
+        for dim in self.dimensions:
+            if dim in other.stats:
+                self.stats[dim].merge(other.stats[dim])
+                self.histograms[dim].merge(other.histograms[dim])
+        self.suspicious.extend(other.suspicious)
+
+    def statistics(self) -> Dict[str, Any]:
+        """与原批量统计字段保持一致的统计信息"""
+        overall = self.stats['overall'].summary()
+        return {
+            'total_comparisons': self.writer.count,
+            'high_similarity_count': len(self.suspicious),
+            'avg_similarity': overall['mean'],
+            'max_similarity': overall['max'],
+            'min_similarity': overall['min'],
+            'std_similarity': overall['std'],
+            'dimension_statistics': {dim: self._dimension_summary(dim) for dim in self.dimensions}
+        }
+
+    def _dimension_summary(self, dim: str) -> Dict[str, float]:
+        summary = self.stats[dim].summary()
+        quantiles = self.histograms[dim].quantiles([0.25, 0.5, 0.75])
+        # 分箱内插值的估计值不应超出实际观测范围
+        q1, median, q3 = [min(max(value, summary['min']), summary['max']) for value in quantiles]
+        summary.update({'q1': q1, 'median': median, 'q3': q3})
+        return summary
+
+    def histogram_counts(self) -> Dict[str, Any]:
+        """各维度的直方图分箱计数（绘图使用，无需保留原始得分）"""
+        return {
+            'bins': self.histograms[self.dimensions[0]].bins,
+            'counts': {dim: histogram.counts.tolist() for dim, histogram in self.histograms.items()}
+        }
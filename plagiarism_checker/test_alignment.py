@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试共同段落对齐：后缀自动机匹配与暴力求解的最长公共子串一致
+"""
+
+import random
+
+import pytest
+
+from alignment_utils import SuffixAutomaton, normalize_with_offsets, shared_passages
+
+
+def _suffix_lengths(text, other):
+    """暴力求other每个位置结尾、在text中出现的最长子串长度"""
+    lengths = []
+    for end in range(len(other)):
+        length = 0
+        while length <= end and other[end - length:end + 1] in text:
+            length += 1
+        lengths.append(length)
+    return lengths
+
+
+def _random_pair(rng, size):
+    # 小字母表并拼入公共片段，保证存在较长的共同子串
+    alphabet = 'abc '
+    common = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+    text = ''.join(rng.choice(alphabet) for _ in range(size)) + common
+    other = common + ''.join(rng.choice(alphabet) for _ in range(size))
+    return text, other
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_maximal_matches_match_brute_force(seed):
+    rng = random.Random(seed)
+    text, other = _random_pair(rng, rng.randint(1, 40))
+    min_length = rng.randint(1, 4)
+    lengths = _suffix_lengths(text, other)
+    expected = {(end, length) for end, length in enumerate(lengths)
+                if length >= min_length and (end + 1 == len(lengths) or lengths[end + 1] != length + 1)}
+
+    matches = SuffixAutomaton(text).maximal_matches(other, min_length)
+    assert {(end2, length) for _, end2, length in matches} == expected
+    for end1, end2, length in matches:
+        assert text[end1 - length + 1:end1 + 1] == other[end2 - length + 1:end2 + 1]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_shared_passages_are_greedy_longest(seed):
+    rng = random.Random(seed)
+    text, other = _random_pair(rng, rng.randint(1, 40))
+    passages = shared_passages(SuffixAutomaton(text), text, list(range(len(text))),
+                               other, list(range(len(other))), min_length=2)
+    lengths = _suffix_lengths(text, other)
+    if max(lengths, default=0) < 2:
+        assert passages == []
+        return
+    # 第一段即最长公共子串，各段长度不增且在other中互不重叠
+    assert passages[0]['length'] == max(lengths)
+    assert [p['length'] for p in passages] == sorted((p['length'] for p in passages), reverse=True)
+    covered = set()
+    for passage in passages:
+        start1, end1 = passage['offset1']
+        start2, end2 = passage['offset2']
+        assert text[start1:end1] == other[start2:end2]
+        assert covered.isdisjoint(range(start2, end2))
+        covered.update(range(start2, end2))
+
+
+def test_offsets_map_back_to_original():
+    original1 = "实验步骤：\n\n使用  PVCREATE /dev/sdb1 创建物理卷"
+    original2 = "首先：使用 pvcreate\t/dev/sdb1 创建物理卷。"
+    text1, offsets1 = normalize_with_offsets(original1)
+    text2, offsets2 = normalize_with_offsets(original2)
+    passages = shared_passages(SuffixAutomaton(text1), text1, offsets1, text2, offsets2, min_length=10)
+    assert len(passages) == 1
+    start1, end1 = passages[0]['offset1']
+    start2, end2 = passages[0]['offset2']
+    assert original1[start1:end1] == "使用  PVCREATE /dev/sdb1 创建物理卷"
+    assert original2[start2:end2] == "使用 pvcreate\t/dev/sdb1 创建物理卷"
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试往届作业归档（按作业类型过滤、重复归档去重）
+"""
+
+from archive_utils import ArchiveIndex
+
+REPORT = ("使用 pvcreate 创建物理卷，vgcreate 创建卷组，lvcreate 创建逻辑卷，"
+          "mkfs.ext4 格式化后挂载到 /data，并在 /etc/fstab 中配置开机自动挂载。"
+          "最后用 lvextend 与 resize2fs 在线扩容，df -h 检查磁盘空间。")
+
+
+def _document(term, student, homework_type):
+    return {'term': term, 'student': student, 'homework_type': homework_type, 'md_file': f'{student}.md'}
+
+
+def test_query_filters_by_homework_type(tmp_path):
+    archive = ArchiveIndex(str(tmp_path))
+    archive.add([_document('2024-spring', 'stu1', 'H3'), _document('2024-spring', 'stu2', 'H4')],
+                [REPORT, REPORT])
+    archive.save()
+
+    archive = ArchiveIndex(str(tmp_path)).load()
+    assert {match['student'] for match in archive.query(REPORT)} == {'stu1', 'stu2'}
+    matches = archive.query(REPORT, 'H3')
+    assert [match['student'] for match in matches] == ['stu1']
+    assert archive.query(REPORT, 'H5') == []
+
+
+def test_rearchiving_replaces_documents(tmp_path):
+    archive = ArchiveIndex(str(tmp_path))
+    documents = [_document('2024-spring', 'stu1', 'H3'), _document('2024-spring', 'stu2', 'H3')]
+    archive.add(documents, [REPORT, REPORT])
+    archive.save()
+
+    archive = ArchiveIndex(str(tmp_path)).load()
+    archive.add(documents + [_document('2024-spring', 'stu1', 'H3')], [REPORT, REPORT, REPORT])
+    archive.save()
+
+    archive = ArchiveIndex(str(tmp_path)).load()
+    assert len(archive.documents) == 2
+    assert len(archive.signatures) == 2
+    assert sorted(match['student'] for match in archive.query(REPORT, 'H3')) == ['stu1', 'stu2']
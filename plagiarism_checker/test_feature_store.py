@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试增量索引的失效条件（特征配置变化、批次成员变化）
+"""
+
+import numpy as np
+import pytest
+
+from index_utils import FeatureStore, PAIR_DIMENSIONS, settings_hash
+
+WEIGHTS = {'text': 0.4, 'code': 0.2, 'command': 0.2, 'structure': 0.2, 'image': 0.0}
+
+
+def _save(index_dir, settings):
+    store = FeatureStore(str(index_dir), 'H3')
+    features = {
+        'stu1': {'hash': 'a', 'content': {'segmented_text': 'x'}},
+        'stu2': {'hash': 'b', 'content': {'segmented_text': 'y'}}
+    }
+    scores = {dim: np.array([0.5]) for dim in PAIR_DIMENSIONS}
+    store.save(features, ['stu1', 'stu2'], [(0, 1)], scores, WEIGHTS, settings)
+
+
+def test_settings_change_invalidates_features(tmp_path):
+    settings = settings_hash({'code': {'winnow_kgram': 5}})
+    _save(tmp_path, settings)
+    assert FeatureStore(str(tmp_path), 'H3').load(WEIGHTS, settings).lookup('stu1', 'a') is not None
+
+    changed = settings_hash({'code': {'winnow_kgram': 6}})
+    store = FeatureStore(str(tmp_path), 'H3').load(WEIGHTS, changed)
+    assert store.lookup('stu1', 'a') is None
+    assert store.pair('stu1', 'stu2') is None
+
+
+def test_cohort_drift(tmp_path):
+    settings = settings_hash({})
+    _save(tmp_path, settings)
+    store = FeatureStore(str(tmp_path), 'H3').load(WEIGHTS, settings)
+    assert store.cohort_drift({'stu1': 'a', 'stu2': 'b'}) == 0.0
+    assert store.cohort_drift({'stu1': 'a', 'stu2': 'b', 'stu3': 'c'}) == pytest.approx(1 / 3)
+    assert store.cohort_drift({'stu1': 'a', 'stu2': 'changed'}) == pytest.approx(1 / 2)
+    assert store.cohort_drift({'stu1': 'a'}) == pytest.approx(1 / 2)
+
+
+def test_saved_cohort_is_kept(tmp_path):
+    settings = settings_hash({})
+    store = FeatureStore(str(tmp_path), 'H3')
+    features = {student: {'hash': value, 'content': {}} for student, value in [('stu1', 'a'), ('stu2', 'new')]}
+    scores = {dim: np.array([0.5]) for dim in PAIR_DIMENSIONS}
+    store.save(features, ['stu1', 'stu2'], [(0, 1)], scores, WEIGHTS, settings, {'stu1': 'a', 'stu2': 'b'})
+    store = FeatureStore(str(tmp_path), 'H3').load(WEIGHTS, settings)
+    # 漂移相对得分所依据的批次计算，而不是上次保存的特征
+    assert store.cohort_drift({'stu1': 'a', 'stu2': 'new'}) == pytest.approx(1 / 2)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试代码winnowing指纹：指纹选取、Dice相似度与倒排索引结果
+"""
+
+import random
+
+import pytest
+
+from fingerprint_utils import FingerprintIndex, fingerprint_similarity, kgram_hashes, normalize_code, winnow
+
+SCRIPT = ["pvcreate /dev/sdb1\nvgcreate vg0 /dev/sdb1\nlvcreate -L 2G -n data vg0",
+          "mkfs.ext4 /dev/vg0/data\nmount /dev/vg0/data /data"]
+
+
+def _brute_force_winnow(text, k, window):
+    """逐个窗口取最右侧的最小哈希，连续窗口选中同一位置时只记一次"""
+    hashes = kgram_hashes(text, k)
+    selected = []
+    for start in range(max(1, len(hashes) - window + 1)):
+        positions = range(start, min(start + window, len(hashes)))
+        pos = min(positions, key=lambda p: (hashes[p], -p))
+        if not selected or selected[-1][1] != pos:
+            selected.append((hashes[pos], pos))
+    return selected
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_winnow_matches_brute_force(seed):
+    rng = random.Random(seed)
+    text = ''.join(rng.choice('ab /-') for _ in range(rng.randint(1, 80)))
+    assert winnow(text, k=3, window=4) == _brute_force_winnow(text, 3, 4)
+
+
+def test_dice_on_known_fingerprints():
+    assert fingerprint_similarity([(1, 0), (2, 5), (3, 9)], [(2, 0), (3, 4), (4, 8)]) == pytest.approx(2 / 3)
+    # 重复的哈希只计一次
+    assert fingerprint_similarity([(1, 0), (1, 7)], [(1, 3)]) == 1.0
+    assert fingerprint_similarity([], [(1, 0)]) == 0.0
+
+
+def test_shared_passage_is_always_detected():
+    code = normalize_code(SCRIPT)
+    rng = random.Random(0)
+    for _ in range(20):
+        # 长度为 window + k - 1 的共同片段，前后是互不相同的内容
+        start = rng.randint(0, len(code) - 19)
+        shared = code[start:start + 19]
+        text1 = ''.join(rng.choice('xyz') for _ in range(30)) + shared
+        text2 = shared + ''.join(rng.choice('uvw') for _ in range(30))
+        assert fingerprint_similarity(winnow(text1), winnow(text2)) > 0
+
+
+def test_index_matches_pairwise_dice():
+    rng = random.Random(1)
+    codes = [normalize_code(SCRIPT)]
+    for _ in range(5):
+        cut = rng.randint(10, len(codes[0]))
+        codes.append(codes[0][:cut] + ''.join(rng.choice('qrstu ') for _ in range(40)))
+    fingerprints = [winnow(code) for code in codes]
+    matrix = FingerprintIndex(fingerprints).similarity_matrix().toarray()
+    for i in range(len(codes)):
+        for j in range(len(codes)):
+            assert matrix[i, j] == pytest.approx(fingerprint_similarity(fingerprints[i], fingerprints[j]))
+    assert matrix[0, 0] == pytest.approx(1.0)
+
+
+def test_common_fingerprints_are_ignored():
+    template = normalize_code(SCRIPT[:1])
+    extras = ['echo one two three', 'ls -la /data/x', 'df -h /mnt/y', 'echo one two three']
+    codes = [template + ' ' + extra for extra in extras]
+    index = FingerprintIndex([winnow(code) for code in codes], max_df=0.5)
+    matrix = index.similarity_matrix().toarray()
+    # 课程模板中的指纹出现在全部学生中，只有第0与第3份作业额外共享的内容计入
+    assert matrix[0, 1] == 0 and matrix[0, 2] == 0
+    assert matrix[0, 3] > 0
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试增量模式：批次成员变化时的重算、容差内沿用已存得分、无变化时不构建批次维度
+"""
+
+import json
+
+import pytest
+
+from config import INCREMENTAL_CONFIG
+from homework_similarity_checker import HomeworkSimilarityChecker
+from index_utils import FeatureStore
+
+EXTRA = "# 实验三\n\n卸载并删除逻辑卷。\n\n```\numount /data\nlvremove /dev/vg/lv\n```\n"
+
+
+def _run(base, incremental, comparisons_file):
+    checker = HomeworkSimilarityChecker(str(base))
+    checker.check_similarity_batch('H3', 0.7, max_workers=1, incremental=incremental,
+                                   comparisons_file=str(comparisons_file))
+    with open(comparisons_file, encoding='utf-8') as f:
+        comparisons = [json.loads(line) for line in f]
+    scores = {(item['student1'], item['student2']): item['similarities'] for item in comparisons}
+    return checker.metrics, scores
+
+
+def test_added_student_matches_full_run(checker, homework, write_report, tmp_path):
+    _run(homework, True, tmp_path / 'first.jsonl')
+    write_report(homework, 'stu3', EXTRA)
+    metrics, incremental = _run(homework, True, tmp_path / 'incremental.jsonl')
+    _, full = _run(homework, False, tmp_path / 'full.jsonl')
+    assert metrics.counters['pairs_cohort_rescored'] == metrics.counters['pairs_reused'] == 3
+    assert incremental == full
+
+
+def test_unchanged_cohort_skips_dimension_build(checker, homework, tmp_path):
+    _run(homework, True, tmp_path / 'first.jsonl')
+    metrics, _ = _run(homework, True, tmp_path / 'second.jsonl')
+    assert metrics.counters['pairs_reused'] == 3
+    assert 'dimensions' not in metrics.stages
+    assert 'pairs_cohort_rescored' not in metrics.counters
+
+
+def test_drift_within_tolerance_keeps_stored_scores(checker, homework, write_report, tmp_path, monkeypatch):
+    monkeypatch.setitem(INCREMENTAL_CONFIG, 'cohort_drift_tolerance', 0.3)
+    _, first = _run(homework, True, tmp_path / 'first.jsonl')
+    store = FeatureStore(INCREMENTAL_CONFIG['index_dir'], 'H3').load(settings=checker.feature_settings())
+    cohort = dict(store.cohort)
+    assert len(cohort) == 3
+
+    write_report(homework, 'stu3', EXTRA)
+    metrics, second = _run(homework, True, tmp_path / 'second.jsonl')
+    assert 'pairs_cohort_rescored' not in metrics.counters
+    assert all(second[pair] == scores for pair, scores in first.items())
+    # 沿用得分时保留其依据的批次，下次漂移仍相对它计算
+    store = FeatureStore(INCREMENTAL_CONFIG['index_dir'], 'H3').load(settings=checker.feature_settings())
+    assert store.cohort == cohort
+    assert store.cohort_drift({student: entry['hash'] for student, entry in store.features.items()}) == \
+        pytest.approx(1 / 4)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试MinHash/LSH候选对：分带参数的推导与候选对的召回率
+"""
+
+import random
+
+import pytest
+
+from lsh_utils import (MinHasher, choose_band_params, estimate_jaccard, generate_candidate_pairs,
+                       shingle_hashes)
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz物理卷组逻辑格式化挂载扩容'
+
+
+def _candidate_probability(threshold, bands, rows):
+    return 1.0 - (1.0 - threshold ** rows) ** bands
+
+
+@pytest.mark.parametrize('num_perm,threshold,recall', [(128, 0.3, 0.95), (128, 0.5, 0.9), (64, 0.7, 0.99)])
+def test_band_params_take_most_rows_meeting_recall(num_perm, threshold, recall):
+    bands, rows = choose_band_params(num_perm, threshold, recall)
+    assert bands == num_perm // rows
+    assert _candidate_probability(threshold, bands, rows) >= recall
+    # 行数更多的组合都达不到召回率要求
+    assert all(_candidate_probability(threshold, num_perm // more, more) < recall
+               for more in range(rows + 1, num_perm + 1))
+
+
+def test_band_params_known_values():
+    assert choose_band_params(128, 0.3, 0.95) == (64, 2)
+    assert choose_band_params(128, 0.5, 0.9) == (42, 3)
+    # 无法达到召回率时退化为每带一行
+    assert choose_band_params(8, 0.01, 0.99) == (8, 1)
+
+
+def _report(rng, length=120):
+    # 随机词组成的报告，互不相关的报告几乎没有共同shingle
+    return ' '.join(''.join(rng.choice(LETTERS) for _ in range(rng.randint(3, 8))) for _ in range(length))
+
+
+def _jaccard(content1, content2):
+    set1, set2 = set(shingle_hashes(content1).tolist()), set(shingle_hashes(content2).tolist())
+    return len(set1 & set2) / len(set1 | set2)
+
+
+def test_signature_estimates_jaccard():
+    rng = random.Random(0)
+    hasher = MinHasher(256)
+    for _ in range(10):
+        base = _report(rng)
+        variant = base[:rng.randint(200, len(base))] + _report(rng, 40)
+        estimate = estimate_jaccard(hasher.signature(shingle_hashes(base)), hasher.signature(shingle_hashes(variant)))
+        assert estimate == pytest.approx(_jaccard(base, variant), abs=0.1)
+
+
+def test_candidate_recall_at_threshold():
+    rng = random.Random(1)
+    contents = []
+    for _ in range(40):
+        base = _report(rng)
+        # 保留约一半内容，真实Jaccard略高于阈值0.3
+        keep = len(base) // 2
+        contents.extend([base, base[:keep] + ' ' + _report(rng, 50)])
+    similar = [(2 * k, 2 * k + 1) for k in range(40)]
+    assert min(_jaccard(contents[i], contents[j]) for i, j in similar) >= 0.3
+
+    candidates = set(generate_candidate_pairs(contents, threshold=0.3, recall=0.95))
+    recalled = sum(pair in candidates for pair in similar) / len(similar)
+    assert recalled >= 0.9
+    # 互不相关的作业很少成为候选
+    unrelated = len(contents) * (len(contents) - 1) // 2 - len(similar)
+    assert len(candidates - set(similar)) < 0.05 * unrelated
+
+
+def test_empty_documents_are_not_candidates():
+    assert generate_candidate_pairs(['', '  ', 'pvcreate /dev/sdb1 创建物理卷']) == []
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试单次扫描的命令提取与原逐模式提取结果一致（不截取句中的命令片段）
+"""
+
+import re
+
+from config import CODE_CONFIG
+from cohort_utils import normalize_command_set
+from markdown_utils import MarkdownFeatureExtractor
+
+DOCUMENT = """# 实验三 逻辑卷管理
+
+首先查看磁盘空间，分区完成后执行 `partprobe /dev/sdb` 即可：
+
+df -h
+
+```
+cd /tmp && mkdir x
+pvcreate /dev/sdb1
+vgcreate vg /dev/sdb1
+lvcreate -L 1G -n lv vg
+# 注释行不计入
+```
+
+- mount /dev/vg/lv /mnt
+- 然后检查挂载结果
+
+运行 lvcreate -L 1G -n lv vg 结束。
+"""
+
+
+def baseline_commands(content):
+    """原实现：每个命令模式在全文上findall，再加上代码块中的每一行"""
+    commands = []
+    for pattern in CODE_CONFIG['command_patterns']:
+        commands.extend(re.findall(pattern, content, re.IGNORECASE))
+    blocks = [re.sub(r'^```.*?\n|```$', '', block, flags=re.MULTILINE).strip()
+              for block in re.findall(r'```[\s\S]*?```', content)]
+    blocks.extend(re.findall(r'`([^`]+)`', content))
+    for block in blocks:
+        for line in block.split('\n'):
+            line = line.strip()
+            if line and not line.startswith(tuple(CODE_CONFIG['ignore_prefixes'])):
+                commands.append(line)
+    return set(commands)
+
+
+def _extractor():
+    return MarkdownFeatureExtractor(CODE_CONFIG['command_patterns'], CODE_CONFIG['ignore_prefixes'])
+
+
+def test_command_set_matches_baseline():
+    commands = _extractor().extract(DOCUMENT)['commands']
+    assert normalize_command_set(commands) == normalize_command_set(baseline_commands(DOCUMENT))
+
+
+def test_commands_are_anchored_to_line_start():
+    content = "```\ncd /tmp && mkdir x\nlvcreate -L 1G -n lv vg\n```\n运行 lvcreate -L 1G -n lv vg 结束。\n"
+    assert _extractor().extract(content)['commands'] == ['cd /tmp && mkdir x', 'lvcreate -L 1G -n lv vg']
+
+
+def test_list_item_commands_keep_structure():
+    features = _extractor().extract("- sudo apt install lvm2\n- 检查版本\n")
+    assert features['commands'] == ['sudo apt install lvm2']
+    assert features['structure']['list_items'] == 2
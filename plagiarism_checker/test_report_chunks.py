@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试报告分块：分段排序归并与整体稳定排序一致，学生名在HTML中转义
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from report_utils import write_report_chunks, CHUNK_COLUMNS
+
+
+def _comparisons(count, seed=0):
+    rng = np.random.default_rng(seed)
+    comparisons = []
+    for k in range(count):
+        # 得分取两位小数，制造大量相同的综合相似度
+        similarities = {column: float(np.round(rng.random(), 2)) for column in CHUNK_COLUMNS[2:-1]}
+        comparisons.append({'student1': f'stu{k % 17}', 'student2': f'stu{k % 13 + 17}',
+                            'similarities': similarities, 'is_suspicious': similarities['overall'] >= 0.7})
+    return comparisons
+
+
+def _read_chunks(data_dir):
+    rows = []
+    for path in sorted(data_dir.glob('chunk_*.js')):
+        text = path.read_text(encoding='utf-8')
+        rows.extend(json.loads(text[text.index(',') + 1:text.rindex(')')]))
+    return rows
+
+
+@pytest.mark.parametrize('run_rows', [7, 64, 1000])
+def test_external_sort_matches_in_memory_sort(tmp_path, run_rows):
+    comparisons = _comparisons(500)
+    reference_dir, merged_dir = tmp_path / 'reference', tmp_path / 'merged'
+    assert write_report_chunks(comparisons, reference_dir, 40, run_rows=10 ** 6) == (13, 500)
+    assert write_report_chunks(comparisons, merged_dir, 40, run_rows=run_rows) == (13, 500)
+
+    rows = _read_chunks(merged_dir)
+    assert rows == _read_chunks(reference_dir)
+    overall = [comparisons[k]['similarities']['overall'] for k in np.argsort(
+        [-comp['similarities']['overall'] for comp in comparisons], kind='stable')]
+    assert [row[2] for row in rows] == overall
+    # 临时分段文件已清理
+    assert [path.name for path in merged_dir.iterdir() if path.name.startswith('.sort_')] == []
+
+
+def test_html_report_escapes_student_names(checker, tmp_path):
+    name = '<img src=x onerror=alert(1)>'
+    comparison = {'student1': name, 'student2': 'stu2', 'is_suspicious': True,
+                  'similarities': {'overall': 0.9, 'text': 0.9, 'code': 0.9, 'command': 0.9,
+                                   'structure': 0.9, 'image': 0.9}}
+    checker.similarity_results = {
+        'high_similarity_pairs': [comparison], 'top_comparisons': [comparison], 'comparisons_file': None,
+        'timestamp': 'now', 'threshold': 0.7,
+        'statistics': {'total_comparisons': 1, 'high_similarity_count': 1, 'avg_similarity': 0.9,
+                       'max_similarity': 0.9, 'min_similarity': 0.9, 'std_similarity': 0.0}
+    }
+    output = tmp_path / 'report.html'
+    checker.generate_report(str(output), paginated=False)
+    html = output.read_text(encoding='utf-8')
+    assert name not in html
+    assert '&lt;img src=x onerror=alert(1)&gt;' in html
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试作业对得分存档：按原权重重新加权与原运行结果一致
+"""
+
+import json
+
+import pytest
+
+from config import SIMILARITY_WEIGHTS
+from homework_similarity_checker import HomeworkSimilarityChecker
+from rescore_utils import ScoreArchive, parse_weights
+
+
+def _run(homework, tmp_path, threshold):
+    checker = HomeworkSimilarityChecker(str(homework))
+    comparisons_file = tmp_path / 'comparisons.jsonl'
+    results = checker.check_similarity_batch('H3', threshold, max_workers=1, comparisons_file=str(comparisons_file))
+    with open(comparisons_file, encoding='utf-8') as f:
+        comparisons = [json.loads(line) for line in f]
+    return checker, results, comparisons
+
+
+def _by_pair(comparisons):
+    return {(comp['student1'], comp['student2']): (comp['similarities'], comp['is_suspicious'])
+            for comp in comparisons}
+
+
+def test_original_weights_reproduce_run(checker, homework, tmp_path):
+    batch_checker, original, comparisons = _run(homework, tmp_path, 0.3)
+    assert original['high_similarity_pairs'], "测试数据应至少有一对疑似作业"
+
+    # 从磁盘重新加载存档，而不是用内存中的对象
+    rescored = HomeworkSimilarityChecker(str(homework)).rescore_results('H3', dict(SIMILARITY_WEIGHTS), 0.3)
+    archive = ScoreArchive.load(ScoreArchive.directory('.plagiarism_scores', 'H3'))
+    overall = archive.overall(SIMILARITY_WEIGHTS)
+    # 综合相似度与疑似判定逐位一致
+    assert _by_pair(archive.comparison(k, overall, 0.3) for k in range(len(archive))) == _by_pair(comparisons)
+    assert _by_pair(rescored['high_similarity_pairs']) == _by_pair(original['high_similarity_pairs'])
+    assert _by_pair(rescored['top_comparisons']) == _by_pair(original['top_comparisons'])
+
+    expected, statistics = original['statistics'], rescored['statistics']
+    for key in ('total_pairs', 'total_comparisons', 'high_similarity_count', 'max_similarity', 'min_similarity'):
+        assert statistics[key] == expected[key]
+    for key in ('avg_similarity', 'std_similarity'):
+        assert statistics[key] == pytest.approx(expected[key], abs=1e-12)
+    for dim, summary in expected['dimension_statistics'].items():
+        assert statistics['dimension_statistics'][dim] == pytest.approx(summary, abs=1e-12)
+    assert rescored['score_histograms'] == batch_checker.similarity_results['score_histograms']
+
+
+def test_new_weights_reweight_stored_scores(checker, homework, tmp_path):
+    _, _, comparisons = _run(homework, tmp_path, 0.3)
+    weights = parse_weights('text=1,code=0,command=0,structure=0,image=0', SIMILARITY_WEIGHTS)
+    rescored = HomeworkSimilarityChecker(str(homework)).rescore_results('H3', weights, 0.0)
+    expected = {(comp['student1'], comp['student2']): comp['similarities']['text'] for comp in comparisons}
+    assert {(comp['student1'], comp['student2']): comp['similarities']['overall']
+            for comp in rescored['top_comparisons']} == expected
+    assert rescored['statistics']['high_similarity_count'] == len(comparisons)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试查重结果数据库：写入后读出的运行与作业对得分与原结果一致
+"""
+
+import pytest
+
+from database_utils import ResultsDatabase
+from index_utils import PAIR_DIMENSIONS
+
+WEIGHTS = {'text': 0.4, 'code': 0.2, 'command': 0.2, 'structure': 0.1, 'image': 0.1}
+
+
+def _comparisons(offset=0.0):
+    students = ['stu0', 'stu1', 'stu2', 'stu3']
+    comparisons = []
+    for i in range(len(students)):
+        for j in range(i + 1, len(students)):
+            scores = {dim: round(0.1 * (i + j) + 0.01 * k + offset, 4) for k, dim in enumerate(PAIR_DIMENSIONS)}
+            comparisons.append({'student1': students[i], 'student2': students[j], 'similarities': scores,
+                                'is_suspicious': scores['overall'] >= 0.5})
+    return comparisons
+
+
+def test_run_round_trip(tmp_path):
+    comparisons = _comparisons()
+    statistics = {'total_comparisons': len(comparisons), 'avg_similarity': 0.3}
+    with ResultsDatabase(str(tmp_path / 'results.db')) as database:
+        run_id = database.add_run('H3', iter(comparisons), threshold=0.5, weights=WEIGHTS,
+                                  statistics=statistics, metrics={'stages': {'scoring': 1.5}}, batch_size=4)
+
+    # 重新打开数据库后读出
+    with ResultsDatabase(str(tmp_path / 'results.db')) as database:
+        assert [(run['id'], run['homework_type'], run['pair_count'], run['weights']) for run in database.runs()] == \
+            [(run_id, 'H3', len(comparisons), WEIGHTS)]
+        details = database.run_details(run_id)
+        assert details['threshold'] == 0.5
+        assert details['statistics'] == statistics
+        assert details['metrics'] == {'stages': {'scoring': 1.5}}
+
+        stored = database.top_pairs(['H3'], limit=100)
+        assert len(stored) == len(comparisons)
+        expected = {(comp['student1'], comp['student2']): comp for comp in comparisons}
+        for row in stored:
+            comparison = expected[(row['student1'], row['student2'])]
+            assert {dim: row[dim] for dim in PAIR_DIMENSIONS} == comparison['similarities']
+            assert row['is_suspicious'] == comparison['is_suspicious']
+            assert row['homework_type'] == 'H3'
+        assert [row['overall'] for row in stored] == sorted((row['overall'] for row in stored), reverse=True)
+
+
+def test_queries_see_both_directions(tmp_path):
+    comparisons = _comparisons()
+    with ResultsDatabase(str(tmp_path / 'results.db')) as database:
+        database.add_run('H3', comparisons, threshold=0.5)
+        pairs = database.student_pairs('stu2', ['H3'], limit=10)['H3']
+        assert sorted(item['other'] for item in pairs) == ['stu0', 'stu1', 'stu3']
+        pair = database.pair('stu3', 'stu1')
+        assert len(pair) == 1
+        assert pair[0]['overall'] == next(comp['similarities']['overall'] for comp in comparisons
+                                          if (comp['student1'], comp['student2']) == ('stu1', 'stu3'))
+        similar = database.most_similar('stu0', limit=1)
+        assert similar[0]['other'] == 'stu3' and similar[0]['types'] == ['H3']
+
+
+def test_latest_run_replaces_older_runs(tmp_path):
+    with ResultsDatabase(str(tmp_path / 'results.db')) as database:
+        first = database.add_run('H3', _comparisons(), keep_runs=2)
+        database.add_run('H4', _comparisons(), keep_runs=2)
+        second = database.add_run('H3', _comparisons(0.05), keep_runs=2)
+        third = database.add_run('H3', _comparisons(0.1), keep_runs=2)
+
+        assert database.latest_runs() == [('H3', third), ('H4', second - 1)]
+        assert [run['id'] for run in database.runs() if run['homework_type'] == 'H3'] == [third, second]
+        assert database.run_details(first) is None
+        # 查询只使用最近一次运行
+        assert database.pair('stu0', 'stu1', ['H3'])[0]['overall'] == pytest.approx(
+            _comparisons(0.1)[0]['similarities']['overall'])
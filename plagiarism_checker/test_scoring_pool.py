@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试一次运行共用的评分进程池与节流的进度日志
+"""
+
+import logging
+
+import numpy as np
+import pytest
+
+from config import BATCH_CONFIG
+from cohort_utils import MatrixDimension
+from metrics_utils import ProgressLog
+from shard_utils import ShardSpec
+
+WEIGHTS = {'text': 0.6, 'code': 0.4}
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    # 分块足够小，使作业对分布到多个分块
+    monkeypatch.setitem(BATCH_CONFIG, 'batch_size', 7)
+
+
+def _dimensions(n):
+    rng = np.random.default_rng(0)
+    return {dim: MatrixDimension(rng.random((n, n))) for dim in WEIGHTS}
+
+
+def test_shared_pool_matches_serial(checker):
+    dimensions = _dimensions(12)
+    pairs = [(i, j) for i in range(12) for j in range(i + 1, 12)]
+    serial = checker.score_pairs(dimensions, pairs, max_workers=1, weights=WEIGHTS)
+
+    with checker.scoring_pool(dimensions, max_workers=2) as executor:
+        pooled = [score for _, scores in checker.iter_pair_scores(
+            dimensions, pairs, weights=WEIGHTS, executor=executor) for score in scores]
+        # 同一进程池中只取部分维度
+        subset = [score for _, scores in checker.iter_pair_scores(
+            {'code': dimensions['code']}, pairs, weights={'code': 1.0}, executor=executor) for score in scores]
+    assert pooled == serial
+    assert [score['code'] for score in subset] == [score['code'] for score in serial]
+
+
+def test_progress_log_is_throttled(caplog):
+    progress = ProgressLog(logging.getLogger('progress'), '比较进度', 1000, step=10)
+    with caplog.at_level(logging.INFO, logger='progress'):
+        for _ in range(100):
+            progress.advance(10)
+    assert len(caplog.records) == 10
+    assert caplog.records[-1].getMessage() == '比较进度: 1000/1000 (100%)'
+
+
+def test_shard_pair_count_matches_tiles():
+    candidates = np.array([(i, j) for i in range(30) for j in range(i + 1, 30) if (i + j) % 3 == 0])
+    for index in range(1, 4):
+        shard = ShardSpec(index, 3)
+        assert shard.pair_count(30) == sum(len(tile) for tile in shard.tile_pairs(30))
+        assert shard.pair_count(30, candidates) == sum(len(tile) for tile in shard.tile_pairs(30, candidates))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试句子SimHash置换表：检出的近重复对与两两暴力比较一致
+"""
+
+import numpy as np
+import pytest
+
+from sentence_utils import SimHashIndex, hamming_distance, popcount64, sentence_overlap
+
+
+def _hashes(seed, count=300):
+    """随机哈希，并在部分哈希上翻转若干位制造不同距离的近邻"""
+    rng = np.random.default_rng(seed)
+    values = [int(value) for value in rng.integers(0, 2 ** 63, count, dtype=np.uint64) << np.uint64(1)]
+    for k in range(count // 3):
+        value = values[rng.integers(len(values))]
+        for bit in rng.choice(64, rng.integers(0, 9), replace=False):
+            value ^= 1 << int(bit)
+        values.append(value)
+    return np.unique(np.array(values, dtype=np.uint64))
+
+
+def _brute_force(values, radius):
+    return {(i, j) for i in range(len(values)) for j in range(i + 1, len(values))
+            if hamming_distance(int(values[i]), int(values[j])) <= radius}
+
+
+@pytest.mark.parametrize('radius,blocks', [(3, 4), (6, 8), (2, 8), (0, 4)])
+def test_near_duplicate_pairs_match_brute_force(radius, blocks):
+    values = _hashes(radius * 10 + blocks)
+    pairs = SimHashIndex(values, radius, blocks).near_duplicate_pairs()
+    assert {tuple(pair) for pair in pairs.tolist()} == _brute_force(values, radius)
+    assert len(pairs) > 0 or radius == 0
+
+
+def test_popcount_matches_python():
+    values = _hashes(1, 50)
+    assert popcount64(values).tolist() == [bin(int(value)).count('1') for value in values]
+
+
+def test_sentence_overlap_skips_template_sentences():
+    base = [0x0F0F0F0F0F0F0F0F, 0x123456789ABCDEF0, 0x7766554433221100]
+    students = [[base[0], base[1]], [base[0] ^ 0b101, base[2]], [base[0] ^ 0b11], [base[1] ^ 1 << 40]]
+    overlap = sentence_overlap(students, radius=6, blocks=8, max_share=0.5)
+    # base[0]的近重复出现在3/4的学生中，视为模板；只有base[1]计入
+    assert [item['near_duplicates'] for item in overlap] == [1, 0, 0, 1]
+    assert overlap[0]['sources'] == {3: 1} and overlap[3]['sources'] == {0: 1}
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分片查重的特征快照（过期检测与独占生成）
+"""
+
+import threading
+
+import pytest
+
+from homework_similarity_checker import HomeworkSimilarityChecker
+from shard_utils import ShardSpec, ShardWorkspace
+
+REMOVAL = "# 实验三\n\n卸载并删除逻辑卷。\n\n```\numount /data\nlvremove /dev/vg/lv\n```\n"
+
+
+def _snapshot(base, snapshot_dir):
+    checker = HomeworkSimilarityChecker(str(base))
+    return checker.shared_snapshot('H3', str(snapshot_dir), 0.7)
+
+
+def test_snapshot_lock_is_exclusive(tmp_path):
+    workspace = ShardWorkspace(str(tmp_path))
+    with workspace.snapshot_lock(timeout=1):
+        assert workspace.lock_file.exists()
+        with pytest.raises(TimeoutError):
+            with workspace.snapshot_lock(timeout=0):
+                pass
+    assert not workspace.lock_file.exists()
+
+
+def test_stale_snapshot_is_rebuilt(checker, homework, write_report, tmp_path):
+    snapshot_dir = tmp_path / 'shards'
+    first = _snapshot(homework, snapshot_dir)
+    assert _snapshot(homework, snapshot_dir)['snapshot_id'] == first['snapshot_id']
+
+    write_report(homework, 'stu1', REMOVAL)
+    changed = _snapshot(homework, snapshot_dir)
+    assert changed['snapshot_id'] != first['snapshot_id']
+
+    write_report(homework, 'stu3', REMOVAL)
+    added = _snapshot(homework, snapshot_dir)
+    assert added['students'] == ['stu0', 'stu1', 'stu2', 'stu3']
+
+    HomeworkSimilarityChecker(str(homework)).check_similarity_shard(
+        'H3', ShardSpec(1, 1), str(snapshot_dir), 0.7, max_workers=1
+    )
+    assert len(ShardWorkspace(str(snapshot_dir)).load_shards(added['snapshot_id'])) == 1
+
+
+def test_concurrent_shards_build_one_snapshot(checker, homework, tmp_path, monkeypatch):
+    calls = []
+    prepare = HomeworkSimilarityChecker.prepare_snapshot
+
+    def counting_prepare(self, *args, **kwargs):
+        calls.append(threading.get_ident())
+        return prepare(self, *args, **kwargs)
+
+    monkeypatch.setattr(HomeworkSimilarityChecker, 'prepare_snapshot', counting_prepare)
+    snapshot_dir = tmp_path / 'shards'
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.append(_snapshot(homework, snapshot_dir)['snapshot_id']))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(set(ids)) == 1 and len(ids) == 3
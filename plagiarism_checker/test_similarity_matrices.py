@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试相似度矩阵：对称、对角线为1、未比较的作业对为NaN
+"""
+
+import numpy as np
+import pytest
+
+from matrix_utils import SimilarityMatrices, write_similarity_matrices
+
+STUDENTS = ['stu0', 'stu1', 'stu2', 'stu3', 'stu4']
+
+
+def _write(tmp_path, dtype='float16'):
+    # 只比较了部分作业对（如候选筛选后），其中一对下标为 (大, 小)
+    pairs = np.array([(0, 1), (0, 3), (2, 1), (3, 4)], dtype=np.int32)
+    scores = {'text': np.array([0.9, 0.25, 0.5, 0.125]), 'overall': np.array([0.8, 0.3, 0.6, 0.1])}
+    write_similarity_matrices(str(tmp_path / 'matrices'), STUDENTS, pairs, scores, dtype=dtype,
+                              meta={'homework_type': 'H3'})
+    return SimilarityMatrices(str(tmp_path / 'matrices')), pairs, scores
+
+
+@pytest.mark.parametrize('dtype', ['float16', 'float32'])
+def test_matrices_are_symmetric_with_nan_for_uncompared(tmp_path, dtype):
+    matrices, pairs, scores = _write(tmp_path, dtype)
+    for dim, values in scores.items():
+        matrix = np.asarray(matrices.matrix(dim), dtype=np.float64)
+        assert matrices.matrix(dim).dtype == np.dtype(dtype)
+        assert np.array_equal(matrix, matrix.T, equal_nan=True)
+        assert np.all(np.diag(matrix) == 1.0)
+        compared = np.zeros(matrix.shape, dtype=bool)
+        for (i, j), value in zip(pairs.tolist(), values):
+            assert matrix[i, j] == pytest.approx(value, abs=1e-3)
+            compared[i, j] = compared[j, i] = True
+        np.fill_diagonal(compared, True)
+        assert np.isnan(matrix[~compared]).all()
+        assert not np.isnan(matrix[compared]).any()
+
+
+def test_slicing_by_student(tmp_path):
+    matrices, _, _ = _write(tmp_path)
+    assert matrices.meta['homework_type'] == 'H3'
+    assert matrices.pair('stu1', 'stu2') == matrices.pair('stu2', 'stu1') == pytest.approx(0.6, abs=1e-3)
+    assert np.isnan(matrices.pair('stu1', 'stu4'))
+    assert matrices.submatrix(['stu3', 'stu0'], 'text') == pytest.approx(np.array([[1.0, 0.25], [0.25, 1.0]]))
+    # 未比较的作业对与自己不计入
+    assert [student for student, _ in matrices.most_similar('stu1')] == ['stu0', 'stu2']
+    with pytest.raises(KeyError):
+        matrices.matrix('code')
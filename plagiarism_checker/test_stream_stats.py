@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试流式统计：分段累加后合并与一次遍历全部得分的结果一致
+"""
+
+import numpy as np
+import pytest
+
+from stream_utils import ComparisonStream, RunningStats, ScoreHistogram, TopK
+
+
+def _scores(seed=0, count=1000):
+    return np.random.default_rng(seed).beta(2, 5, count)
+
+
+@pytest.mark.parametrize('splits', [[0, 1000], [0, 1, 1000], [0, 333, 334, 900, 1000], [0, 0, 500, 1000]])
+def test_merged_running_stats_match_single_pass(splits):
+    scores = _scores()
+    single = RunningStats()
+    for value in scores:
+        single.add(value)
+    merged = RunningStats()
+    for start, end in zip(splits[:-1], splits[1:]):
+        part = RunningStats()
+        for value in scores[start:end]:
+            part.add(value)
+        merged.merge(part)
+
+    assert merged.count == single.count == len(scores)
+    assert merged.mean == pytest.approx(single.mean, abs=1e-12) and merged.mean == pytest.approx(np.mean(scores))
+    assert merged.std == pytest.approx(single.std, abs=1e-12) and merged.std == pytest.approx(np.std(scores))
+    assert (merged.min, merged.max) == (single.min, single.max) == (scores.min(), scores.max())
+
+
+def test_merged_histogram_matches_single_pass():
+    scores = _scores(1)
+    single, first, second = ScoreHistogram(50), ScoreHistogram(50), ScoreHistogram(50)
+    for value in scores:
+        single.add(value)
+    for value in scores[:400]:
+        first.add(value)
+    for value in scores[400:]:
+        second.add(value)
+    first.merge(second)
+    assert first.counts.tolist() == single.counts.tolist()
+    assert first.counts.tolist() == np.histogram(scores, bins=50, range=(0, 1))[0].tolist()
+    # 分位数估计误差不超过一个分箱宽度
+    assert single.quantiles([0.5]) == pytest.approx([np.median(scores)], abs=1 / 50)
+    with pytest.raises(ValueError):
+        first.merge(ScoreHistogram(20))
+
+
+def test_merged_streams_match_single_stream():
+    scores = _scores(2, 200)
+    single = ComparisonStream(0.5, top_k=10, dimensions=['overall'])
+    parts = [ComparisonStream(0.5, top_k=10, dimensions=['overall']) for _ in range(3)]
+    for k, value in enumerate(scores):
+        single.add(f'stu{k}', f'stu{k + 1}', {'overall': float(value)})
+        parts[k % 3].add(f'stu{k}', f'stu{k + 1}', {'overall': float(value)})
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+
+    expected, statistics = single.statistics(), merged.statistics()
+    assert statistics.pop('dimension_statistics')['overall'] == \
+        pytest.approx(expected.pop('dimension_statistics')['overall'])
+    assert statistics == pytest.approx(expected)
+    assert [item['student1'] for item in merged.top.items()] == [item['student1'] for item in single.top.items()]
+    assert sorted(item['student1'] for item in merged.suspicious) == \
+        sorted(item['student1'] for item in single.suspicious)
+
+
+def test_top_k_keeps_highest_scores():
+    top = TopK(3)
+    for k, score in enumerate([0.2, 0.9, 0.5, 0.9, 0.1, 0.7]):
+        top.add(score, k)
+    # 分数相同时先到达的排在前面
+    assert top.items() == [1, 3, 5]
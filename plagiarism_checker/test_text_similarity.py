@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试小批次下的文本相似度（文档频率上限不应滤掉两份作业共有的全部词）
+"""
+
+import pytest
+
+from config import TEXT_CONFIG
+
+REPORT = "挂载 逻辑卷 文件系统 扩容 分区 格式化 配置 开机 自动 挂载 检查 磁盘 空间"
+
+
+@pytest.mark.parametrize('vectorizer', ['tfidf', 'hashing'])
+def test_identical_pair_is_fully_similar(checker, monkeypatch, vectorizer):
+    monkeypatch.setitem(TEXT_CONFIG, 'vectorizer', vectorizer)
+    similarity = checker.calculate_text_similarity_matrix([REPORT, REPORT])
+    assert similarity[0, 1] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('vectorizer', ['tfidf', 'hashing'])
+def test_three_reports_keep_shared_terms(checker, monkeypatch, vectorizer):
+    monkeypatch.setitem(TEXT_CONFIG, 'vectorizer', vectorizer)
+    other = "编译 内核 模块 加载 驱动 调试 日志"
+    similarity = checker.calculate_text_similarity_matrix([REPORT, REPORT, other])
+    assert similarity[0, 1] == pytest.approx(1.0)
+    assert similarity[0, 2] < 0.5
+
+
+def test_document_frequency_limits(checker):
+    for n_docs in range(2, 6):
+        min_count, max_count = checker.document_frequency_limits(n_docs)
+        assert max_count >= 2
+        assert min_count <= max_count
+    assert checker.document_frequency_limits(100)[1] == int(TEXT_CONFIG['tfidf_max_df'] * 100)
+    assert checker.document_frequency_limits(2)[1] == 2